@@ -1,25 +1,111 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
-from pydantic import BaseModel
-import joblib
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query, Request
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+import asyncio
+import time
+import datetime
 import numpy as np
 import json
-from .utils import fetch_5day_forecast, sum_tomorrow_rain
+from .utils import sum_tomorrow_rain
+from .forecast_features import XGB_FEATURES, tomorrow_features
+from .backtest_results import load_results
+from .drying_windows import SLOT_RAIN_MM, drying_windows
+from .forecast_cache import forecast_cache, get_forecast
+from .forecast_provider import forecast_archive, forecast_provider
+from .weather_client import weather_client
 from .config import settings
+from .model_registry import ModelRegistry
+from .model_router import ModelRouter
+from .metrics import span
+from .profiler import SamplingProfiler
+from .prophet_fast import ProphetEvaluator
+from .lstm_runtime import LSTMRuntime, MicroBatcher
+from .snapshots import SnapshotStore
+from .streaming import stream_format, stream_response
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 import os
 
 router = APIRouter()
 
-# Load models lazily
+# Models are loaded once per worker by the registry and reloaded when the file changes
 BASE_DIR = os.path.dirname(__file__)
 PROP_PATH = os.path.join(BASE_DIR, "models", "prophet_model.joblib")
+# Exported by training/train_prophet.py; evaluated with NumPy only
+PROP_FAST_PATH = os.path.join(BASE_DIR, "models", "prophet_model.npz")
 XGB_PATH = os.path.join(BASE_DIR, "models", "xgb_model.joblib")
+# History for lag/rolling features (written by data_pipeline/update_dataset.py and ingest.py)
+DAILY_STORE_DIR = settings.DAILY_STORE_DIR or os.path.normpath(os.path.join(BASE_DIR, "..", "..", "data", "daily"))
 LSTM_PATH = os.path.join(BASE_DIR, "models", "lstm_model.h5")
+# Written by training/train_lstm.py or `python -m app.lstm_runtime`; read without TensorFlow
+LSTM_FAST_PATH = os.path.join(BASE_DIR, "models", "lstm_model.npz")
+# Per-city models: training/train_xgboost_search.py output, and Prophet exports named city-<name>.npz
+XGB_DIR = os.path.join(BASE_DIR, "models", "xgb")
+PROPHET_DIR = os.path.join(BASE_DIR, "models", "prophet")
+# Preferred artifact for a model name when it exists
+FAST_VARIANTS = {"prophet": "prophet_fast", "lstm": "lstm_fast"}
+BATCH_MODELS = ("rule", "prophet", "xgboost", "lstm")
+MODEL_LABELS = {"prophet": "Prophet", "xgboost": "XGBoost", "lstm": "LSTM"}
+# Models that can have a per-city artifact (see ModelRouter)
+ROUTED_MODELS = ("prophet", "xgboost")
 
 
-def load_model(path):
-    if os.path.exists(path):
-        return joblib.load(path)
-    return None
+def _load_prophet(path):
+    """Unpickle a Prophet model and, where possible, swap in the NumPy evaluator."""
+    import joblib
+
+    model = joblib.load(path)
+    if hasattr(model, "predict_total_from_baseline"):
+        return model
+    try:
+        return ProphetEvaluator.from_prophet(model)
+    except (AttributeError, KeyError, ValueError):
+        return model
+
+
+def _warm_prophet(model):
+    if hasattr(model, "predict_total_from_baseline"):
+        model.predict_total_from_baseline(0.0)
+    elif isinstance(model, ProphetEvaluator):
+        model.predict(np.array([np.datetime64("today")]))
+
+
+def _load_xgboost(path):
+    """Load the model with the feature schema saved next to it; refuse it if the two disagree."""
+    import joblib
+
+    from .feature_builder import check_model, load_schema
+
+    model = joblib.load(path)
+    schema = load_schema(path)
+    check_model(schema, model)
+    model.feature_schema = schema
+    return model
+
+
+def _warm_xgboost(model):
+    model.predict(np.zeros((1, len(model.feature_schema["features"])), dtype=float))
+
+
+def _warm_lstm(model):
+    model.predict(np.zeros((1, model.window or 1, model.n_features), dtype=np.float32))
+
+
+model_registry = ModelRegistry(check_interval_s=settings.MODEL_CHECK_INTERVAL_S,
+                               max_bytes=int(settings.MODEL_CACHE_MAX_MB * 1024 * 1024))
+# The pickled Prophet and h5 LSTM (and their heavy imports) are only loaded when the fast file is missing
+model_registry.register("prophet", PROP_PATH, warmup=_warm_prophet, loader=_load_prophet,
+                        superseded_by=FAST_VARIANTS["prophet"])
+model_registry.register("prophet_fast", PROP_FAST_PATH, warmup=_warm_prophet, loader=ProphetEvaluator.load)
+model_registry.register("xgboost", XGB_PATH, warmup=_warm_xgboost, loader=_load_xgboost)
+model_registry.register("lstm", LSTM_PATH, warmup=_warm_lstm, loader=LSTMRuntime.from_h5,
+                        superseded_by=FAST_VARIANTS["lstm"])
+model_registry.register("lstm_fast", LSTM_FAST_PATH, warmup=_warm_lstm, loader=LSTMRuntime.load)
+model_router = ModelRouter(model_registry, XGB_DIR, PROPHET_DIR,
+                           loaders={"xgboost": _load_xgboost, "prophet": ProphetEvaluator.load},
+                           warmups={"xgboost": _warm_xgboost, "prophet": _warm_prophet},
+                           check_interval_s=settings.MODEL_CHECK_INTERVAL_S)
+lstm_batcher = MicroBatcher(settings.LSTM_BATCH_MAX, settings.LSTM_BATCH_WAIT_MS / 1000)
 
 
 class CityRequest(BaseModel):
@@ -28,16 +114,27 @@ class CityRequest(BaseModel):
     lon: float | None = None
 
 
+def _resolve_city(payload: CityRequest) -> str:
+    """Strip a "City, CC" suffix and check that some location was given."""
+    city = (payload.city or "").strip()
+    if "," in city:
+        city = city.split(",")[0].strip()
+    if not city and (payload.lat is None or payload.lon is None):
+        raise HTTPException(status_code=422, detail="City or lat/lon required")
+    return city
+
+
 @router.post("/predict/rule")
 async def predict_rule(payload: CityRequest):
+    snap = _from_snapshot(payload, "rule")
+    if snap is not None:
+        return snap
     try:
-        city = (payload.city or "").strip()
-        if "," in city:
-            city = city.split(",")[0].strip()
-        if not city and (payload.lat is None or payload.lon is None):
-            raise HTTPException(status_code=422, detail="City or lat/lon required")
-        f = fetch_5day_forecast(city if city else None, payload.lat, payload.lon)
-        total = sum_tomorrow_rain(f)
+        city = _resolve_city(payload)
+        with span("fetch"):
+            f = await get_forecast(city if city else None, payload.lat, payload.lon)
+        with span("predict"):
+            total = sum_tomorrow_rain(f)
         safe = total <= settings.RAIN_THRESHOLD_MM
         meta_city = f.get("city", {}).get("name") or city
         return {"city": meta_city, "tomorrow_rain_mm": total, "safe_to_dry_outside": safe}
@@ -47,135 +144,569 @@ async def predict_rule(payload: CityRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+async def _get_model(name):
+    """Resolve a model name to the object that serves it (None for the rule)."""
+    if name == "rule":
+        return None
+    if name in FAST_VARIANTS:
+        fast = await model_registry.aget(FAST_VARIANTS[name])
+        if fast is not None:
+            return fast
+    return await model_registry.aget(name)
+
+
+async def _get_city_model(name, city):
+    """``(model, route)``: ``city``'s own model when it has one, else the global model (route = ``name``)."""
+    route = model_router.route(name, city) if name in ROUTED_MODELS else None
+    try:
+        if route is not None:
+            model = await model_registry.aget(route)
+            if model is not None:
+                return model, route
+        return await _get_model(name), name
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=f"{MODEL_LABELS[name]} model rejected: {e}")
+    except OSError as e:
+        # Removed or unreadable between the stat and the load
+        raise HTTPException(status_code=500, detail=f"{MODEL_LABELS[name]} model could not be loaded: {e}")
+
+
+def _prophet_predict(model, totals):
+    """Tomorrow's rain from a Prophet-style model, one value per forecast total.
+
+    A ``ProphetEvaluator`` is one city's daily rain series: the global one
+    (trained on London) gives every city the same value, which responses
+    flag with ``"global": true`` (see ``_prophet_is_global``).
+    """
+    if hasattr(model, "predict_total_from_baseline"):
+        return np.asarray(model.predict_total_from_baseline(totals), dtype=float).reshape(-1)
+    if isinstance(model, ProphetEvaluator):
+        tomorrow = np.datetime64(datetime.date.today() + datetime.timedelta(days=1))
+        # The model is a single daily rain series, so every city gets the same value; rain can't go negative
+        yhat = max(float(model.predict(np.array([tomorrow]))[0]), 0.0)
+        return np.full(len(totals), yhat)
+    return np.asarray(totals, dtype=float)
+
+
+def _prophet_is_global(model, route):
+    """True when ``model`` is the global Prophet series, i.e. its prediction ignores the city."""
+    return (route == "prophet" and isinstance(model, ProphetEvaluator)
+            and not hasattr(model, "predict_total_from_baseline"))
+
+
 @router.post("/predict/prophet")
 async def predict_prophet(payload: CityRequest):
-    model = load_model(PROP_PATH)
+    snap = _from_snapshot(payload, "prophet")
+    if snap is not None:
+        return snap
+    city = _resolve_city(payload)
+    with span("fetch"):
+        f = await get_forecast(city if city else None, payload.lat, payload.lon)
+    meta_city = f.get("city", {}).get("name") or city
+    with span("model"):
+        model, route = await _get_city_model("prophet", meta_city)
     if not model:
         raise HTTPException(status_code=404, detail="Prophet model not found. Train first.")
 
-    city = (payload.city or "").strip()
-    if "," in city:
-        city = city.split(",")[0].strip()
-    if not city and (payload.lat is None or payload.lon is None):
-        raise HTTPException(status_code=422, detail="City or lat/lon required")
-    f = fetch_5day_forecast(city if city else None, payload.lat, payload.lon)
-    total = sum_tomorrow_rain(f)
-    pred = model.predict_total_from_baseline(total) if hasattr(model, "predict_total_from_baseline") else float(total)
+    with span("predict"):
+        total = sum_tomorrow_rain(f)
+        pred = float(_prophet_predict(model, np.array([total]))[0])
     safe = pred <= settings.RAIN_THRESHOLD_MM
-    meta_city = f.get("city", {}).get("name") or city
-    return {"city": meta_city, "predicted_rain_mm": pred, "safe_to_dry_outside": safe}
+    result = {"city": meta_city, "predicted_rain_mm": pred, "safe_to_dry_outside": safe, "model": route}
+    if _prophet_is_global(model, route):
+        result["global"] = True  # same value for every city without its own Prophet model
+    return result
 
 
 @router.post("/predict/xgboost")
 async def predict_xgboost(payload: CityRequest):
-    model = load_model(XGB_PATH)
+    snap = _from_snapshot(payload, "xgboost")
+    if snap is not None:
+        return snap
+    city = _resolve_city(payload)
+    with span("fetch"):
+        f = await get_forecast(city if city else None, payload.lat, payload.lon)
+    meta_city = f.get("city", {}).get("name") or city
+    with span("model"):
+        model, route = await _get_city_model("xgboost", meta_city)
     if not model:
         raise HTTPException(status_code=404, detail="XGBoost model not found. Train first.")
-    city = (payload.city or "").strip()
-    if "," in city:
-        city = city.split(",")[0].strip()
-    if not city and (payload.lat is None or payload.lon is None):
-        raise HTTPException(status_code=422, detail="City or lat/lon required")
-    # Build feature vector to match training order: [temp, humidity, wind_speed, rain_lag_1, dayofyear]
-    f = fetch_5day_forecast(city if city else None, payload.lat, payload.lon)
-    temps = []
-    hums = []
-    winds = []
-    import datetime
-    today = datetime.date.today()
-    tomorrow_date = today + datetime.timedelta(days=1)
-    # Aggregate for tomorrow
-    for item in f.get("list", []):
-        ts = datetime.datetime.fromtimestamp(item["dt"]) 
-        if ts.date() == tomorrow_date:
-            temps.append(item.get("main", {}).get("temp") or 0.0)
-            hums.append(item.get("main", {}).get("humidity") or 0.0)
-            winds.append(item.get("wind", {}).get("speed") or 0.0)
-    temp_mean = float(np.mean(temps)) if temps else 0.0
-    hum_mean = float(np.mean(hums)) if hums else 0.0
-    wind_mean = float(np.mean(winds)) if winds else 0.0
-    # Approximate lag-1 using today's total rain from forecast (fallback to 0.0)
-    today_total = 0.0
-    for item in f.get("list", []):
-        ts = datetime.datetime.fromtimestamp(item["dt"]) 
-        if ts.date() == today:
-            today_total += item.get("rain", {}).get("3h", 0.0)
-    rain_lag_1 = float(today_total)
-    dayofyear = float(tomorrow_date.timetuple().tm_yday)
-
-    feat = np.array([[temp_mean, hum_mean, wind_mean, rain_lag_1, dayofyear]], dtype=float)
-    pred = float(model.predict(feat)[0])
+    with span("features"):
+        feat, _ = tomorrow_features(f)
+        rows = await _xgboost_rows(model, feat, [meta_city])
+    with span("predict"):
+        pred = float(model.predict(rows)[0])
+    safe = pred <= settings.RAIN_THRESHOLD_MM
+    return {"city": meta_city, "predicted_rain_mm": pred, "safe_to_dry_outside": safe, "model": route}
+
+
+async def _xgboost_rows(model, rows, cities):
+    """``tomorrow_features`` rows rearranged into the model's schema (history read from the daily store)."""
+    from .feature_builder import LEGACY_SCHEMA, serving_matrix  # already imported by _load_xgboost
+
+    schema = model.feature_schema
+    if schema["features"] == LEGACY_SCHEMA["features"]:
+        return rows  # same columns in the same order
+    try:
+        return await run_in_threadpool(serving_matrix, schema, rows, cities, DAILY_STORE_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=f"Could not build XGBoost features: {e}")
+
+
+class LSTMRequest(CityRequest):
+    # Observed daily rain (mm) before today, oldest first; missing days count as dry
+    history: list[float] | None = None
+
+
+# Column of today's forecast rain in the tomorrow_features matrix
+TODAY_RAIN_COL = XGB_FEATURES.index("rain_lag_1")
+
+
+def _lstm_windows(model, today_rain, history=None):
+    """Input windows ending today: ``history`` then today's forecast rain, left-padded with 0.0."""
+    window = model.window or len(history or []) + 1
+    today_rain = np.asarray(today_rain, dtype=np.float32).reshape(-1)
+    X = np.zeros((len(today_rain), window), dtype=np.float32)
+    X[:, -1] = today_rain
+    past = np.asarray(history or [], dtype=np.float32)[-(window - 1):] if window > 1 else []
+    if len(past):
+        X[:, window - 1 - len(past):window - 1] = past
+    return X
+
+
+@router.post("/predict/lstm")
+async def predict_lstm(payload: LSTMRequest):
+    """LSTM prediction from a NumPy forward pass; concurrent calls share one batch."""
+    if payload.history is None:
+        snap = _from_snapshot(payload, "lstm")
+        if snap is not None:
+            return snap
+    with span("model"):
+        model = await _get_model("lstm")
+    if not model:
+        raise HTTPException(status_code=404, detail="LSTM model not found. Train first.")
+
+    city = _resolve_city(payload)
+    with span("fetch"):
+        f = await get_forecast(city if city else None, payload.lat, payload.lon)
+    with span("features"):
+        feat, _ = tomorrow_features(f)
+        window = _lstm_windows(model, feat[:, TODAY_RAIN_COL], payload.history)
+    # Rain can't be negative; the regression output can dip just below zero
+    with span("predict"):  # includes waiting for the micro-batch to fill
+        pred = max(float(np.asarray(await lstm_batcher.predict(model, window[0])).reshape(-1)[0]), 0.0)
     safe = pred <= settings.RAIN_THRESHOLD_MM
     meta_city = f.get("city", {}).get("name") or city
-    return {"city": meta_city, "predicted_rain_mm": pred, "safe_to_dry_outside": safe}
+    return {"city": meta_city, "predicted_rain_mm": pred, "safe_to_dry_outside": safe,
+            "input_window": window[0].tolist()}
+
+
+
+
+class BatchRequest(BaseModel):
+    locations: list[CityRequest] = []
+    cities: list[str] = []
+    models: list[str] = list(BATCH_MODELS)
+
+
+def _predict_column(name, model, totals, rows):
+    """Run one vectorized prediction for every fetched city; returns (preds, error)."""
+    if name == "rule":
+        return totals, None
+    if not model:
+        return None, f"{MODEL_LABELS[name]} model not found. Train first."
+    if name == "prophet":
+        return _prophet_predict(model, totals), None
+    if name == "lstm":
+        preds = np.asarray(model.predict(_lstm_windows(model, rows[:, TODAY_RAIN_COL])), dtype=float).reshape(-1)
+        return np.maximum(preds, 0.0), None
+    return np.asarray(model.predict(rows), dtype=float).reshape(-1), None
+
+
+async def _fetch_entry(loc, gate):
+    """``(entry, payload)`` for one location; on failure the entry carries ``error`` and payload is None."""
+    entry = {"query": loc.model_dump(exclude_none=True)}
+    try:
+        city = _resolve_city(loc)
+        async with gate:
+            f = await get_forecast(city if city else None, loc.lat, loc.lon)
+    except HTTPException as e:
+        entry["error"] = e.detail
+        return entry, None
+    except Exception as e:
+        entry["error"] = str(e)
+        return entry, None
+    entry["city"] = f.get("city", {}).get("name") or city
+    return entry, f
+
+
+async def fetch_locations(locations):
+    """Fetch every location's forecast once, concurrently (bounded by BATCH_FETCH_CONCURRENCY).
+
+    Returns ``(results, ok)``: one entry per location, failures reported
+    inline with ``error``, and ``(entry, payload)`` for the fetched ones.
+    """
+    gate = asyncio.Semaphore(settings.BATCH_FETCH_CONCURRENCY)
+    with span("fetch"):
+        fetched = await asyncio.gather(*(_fetch_entry(loc, gate) for loc in locations))
+    return [entry for entry, _ in fetched], [(entry, f) for entry, f in fetched if f is not None]
+
+
+async def iter_fetched(locations):
+    """Yield groups of ``(index, entry, payload)`` as forecasts arrive, for streaming responses.
+
+    Each group is whatever finished while the previous one was processed (at
+    most STREAM_GROUP_MAX), so fast cities are not held back by slow ones yet
+    cities that arrive together still share one vectorized pass. Fetches
+    still pending when the consumer stops (client gone) are cancelled.
+    """
+    gate = asyncio.Semaphore(settings.BATCH_FETCH_CONCURRENCY)
+    arrived = asyncio.Queue()
+
+    async def fetch(i, loc):
+        arrived.put_nowait((i, *await _fetch_entry(loc, gate)))
+
+    tasks = [asyncio.create_task(fetch(i, loc)) for i, loc in enumerate(locations)]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            group = [await arrived.get()]
+            while len(group) < settings.STREAM_GROUP_MAX and not arrived.empty():
+                group.append(arrived.get_nowait())
+            remaining -= len(group)
+            yield group
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _check_batch(locations):
+    if not locations:
+        raise HTTPException(status_code=422, detail="At least one city or location required")
+    if len(locations) > settings.BATCH_MAX_LOCATIONS:
+        raise HTTPException(status_code=422, detail=f"At most {settings.BATCH_MAX_LOCATIONS} locations per batch")
+
+
+async def _score_fetched(ok, models):
+    """Run each model once over the fetched ``(entry, payload)`` pairs, filling in each entry's predictions.
+
+    An async generator yielding ``(name, entries)`` after each model so a
+    stream can send predictions as they are made.
+    """
+    # Feature building and the predictions run in the threadpool: a snapshot refresh or a large batch
+    # would otherwise hold the event loop for every other request
+    with span("features"):
+        rows, totals = await run_in_threadpool(tomorrow_features, [f for _, f in ok])
+    cities = [entry["city"] for entry, _ in ok]
+    for entry, total in zip((e for e, _ in ok), totals):
+        entry["tomorrow_rain_mm"] = float(total)
+        entry["predictions"] = {}
+    for name in models:
+        # One predict per serving model: cities routed to the same (or the global) model share it
+        groups = {}
+        for j, city in enumerate(cities):
+            route = model_router.route(name, city) if name in ROUTED_MODELS else None
+            groups.setdefault(route, []).append(j)
+        for route, idx in groups.items():
+            try:
+                with span("model"):
+                    model = await model_registry.aget(route) if route is not None else None
+                    if model is None:
+                        model, route = await _get_model(name), name
+                sub = rows[idx]
+                if name == "xgboost" and model:
+                    with span("features"):
+                        sub = await _xgboost_rows(model, sub, [cities[j] for j in idx])
+                with span(f"predict_{name}"):
+                    preds, error = await run_in_threadpool(_predict_column, name, model, totals[idx], sub)
+            except HTTPException as e:
+                preds, error = None, e.detail
+            except Exception as e:
+                preds, error = None, str(e)
+            for k, j in enumerate(idx):
+                entry = ok[j][0]
+                if error is not None:
+                    entry["predictions"][name] = {"error": error}
+                else:
+                    pred = float(preds[k])
+                    entry["predictions"][name] = {
+                        "predicted_rain_mm": pred,
+                        "safe_to_dry_outside": pred <= settings.RAIN_THRESHOLD_MM,
+                    }
+                    if name in ROUTED_MODELS:
+                        entry["predictions"][name]["model"] = route
+                    if name == "prophet" and _prophet_is_global(model, route):
+                        entry["predictions"][name]["global"] = True
+            yield name, [ok[j][0] for j in idx]
+
+
+async def score_locations(locations, models):
+    """Fetch forecasts for ``locations`` and run each model once over all of them.
+
+    Each model runs one predict over the stacked feature matrix, and
+    per-location failures are reported inline in the returned entries.
+    """
+    results, ok = await fetch_locations(locations)
+    if ok:
+        async for _ in _score_fetched(ok, models):
+            pass
+    return results
+
+
+async def _stream_batch(locations, models):
+    """Events for a streamed /predict/batch: ``prediction`` per location and model as soon as that model has
+    run, ``result`` per location once complete (or failed), then ``end``."""
+    yield {"event": "start", "models": models, "count": len(locations)}
+    errors = 0
+    async for group in iter_fetched(locations):
+        index = {id(entry): i for i, entry, _ in group}
+        ok = [(entry, f) for _, entry, f in group if f is not None]
+        if ok:
+            async for name, entries in _score_fetched(ok, models):
+                for entry in entries:
+                    yield {"event": "prediction", "index": index[id(entry)], "city": entry["city"], "model": name,
+                           "prediction": entry["predictions"][name]}
+        for i, entry, _ in group:
+            errors += "error" in entry
+            yield {"event": "result", "index": i, **entry}
+    yield {"event": "end", "count": len(locations), "errors": errors}
+
+
+@router.post("/predict/batch")
+async def predict_batch(payload: BatchRequest, request: Request, stream: str | None = None):
+    """Score many cities and/or coordinates with several models in one call.
+
+    Per-city failures are reported inline instead of failing the batch. With
+    ``?stream=ndjson|sse`` (or the matching Accept header) each city's
+    predictions are sent as soon as they are made, in arrival order.
+    """
+    locations = [CityRequest(city=c) for c in payload.cities] + list(payload.locations)
+    _check_batch(locations)
+    unknown = sorted(set(payload.models) - set(BATCH_MODELS))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown models: {', '.join(unknown)}")
+
+    models = list(dict.fromkeys(payload.models))
+    fmt = stream_format(request, stream)
+    if fmt:
+        return stream_response(_stream_batch(locations, models), fmt)
+    results = await score_locations(locations, models)
+    errors = sum(1 for r in results if "error" in r)
+    return {"models": models, "count": len(results), "errors": errors, "results": results}
+
+
+class WindowOptions(BaseModel):
+    min_hours: float = Field(6.0, gt=0)
+    min_score: float = Field(0.5, ge=0, le=1)
+    top: int = Field(5, ge=1)
+    max_rain_mm: float = Field(SLOT_RAIN_MM, ge=0)
+    slots: bool = False
+
+    def kwargs(self):
+        return self.model_dump(include={"min_hours", "min_score", "top", "max_rain_mm", "slots"})
+
+
+class WindowRequest(CityRequest, WindowOptions):
+    pass
+
+
+class WindowBatchRequest(WindowOptions):
+    locations: list[CityRequest] = []
+    cities: list[str] = []
+
+
+@router.post("/plan/windows")
+async def plan_windows(payload: WindowRequest):
+    """Ranked drying windows over the whole forecast horizon for one location."""
+    city = _resolve_city(payload)
+    with span("fetch"):
+        f = await get_forecast(city if city else None, payload.lat, payload.lon)
+    with span("score"):
+        planned = drying_windows([f], **payload.kwargs())[0]
+    return {"city": f.get("city", {}).get("name") or city, **planned}
+
+
+def _plan_fetched(ok, options):
+    with span("score"):
+        planned = drying_windows([f for _, f in ok], **options)
+    for (entry, _), windows in zip(ok, planned):
+        entry.update(windows)
+
+
+async def _stream_windows(locations, options):
+    yield {"event": "start", "count": len(locations)}
+    errors = 0
+    async for group in iter_fetched(locations):
+        ok = [(entry, f) for _, entry, f in group if f is not None]
+        if ok:
+            _plan_fetched(ok, options)
+        for i, entry, _ in group:
+            errors += "error" in entry
+            yield {"event": "result", "index": i, **entry}
+    yield {"event": "end", "count": len(locations), "errors": errors}
+
+
+@router.post("/plan/windows/batch")
+async def plan_windows_batch(payload: WindowBatchRequest, request: Request, stream: str | None = None):
+    """Drying windows for many locations: one fetch each, then one scoring pass over all slots.
+
+    Streams one ``result`` event per location with ``?stream=ndjson|sse``.
+    """
+    locations = [CityRequest(city=c) for c in payload.cities] + list(payload.locations)
+    _check_batch(locations)
+    fmt = stream_format(request, stream)
+    if fmt:
+        return stream_response(_stream_windows(locations, payload.kwargs()), fmt)
+    results, ok = await fetch_locations(locations)
+    if ok:
+        _plan_fetched(ok, payload.kwargs())
+    errors = sum(1 for r in results if "error" in r)
+    return {"count": len(results), "errors": errors, "results": results}
+
+
+snapshot_store = SnapshotStore(settings.SNAPSHOT_MAX_AGE_S)
+
+
+async def refresh_snapshots():
+    """Recompute rule/XGBoost/Prophet/LSTM predictions for every configured hot city."""
+    cities = settings.hot_cities
+    if not cities:
+        return
+    entries = await score_locations([CityRequest(city=c) for c in cities], BATCH_MODELS)
+    for city, entry in zip(cities, entries):
+        if "error" not in entry:
+            snapshot_store.put(city, entry)
+    snapshot_store.last_refresh = time.time()
+
+
+def _from_snapshot(payload: CityRequest, model: str):
+    """Prediction for ``model`` from a fresh snapshot of the requested city, if any."""
+    if not payload.city:
+        return None
+    hit = snapshot_store.get(_resolve_city(payload))
+    if hit is None:
+        return None
+    entry, meta = hit
+    result = entry["predictions"].get(model)
+    if result is None or "error" in result:
+        return None
+    if model == "rule":
+        return {"city": entry["city"], "tomorrow_rain_mm": entry["tomorrow_rain_mm"],
+                "safe_to_dry_outside": result["safe_to_dry_outside"], "snapshot": meta}
+    return {"city": entry["city"], **result, "snapshot": meta}
+
+
+@router.get("/snapshots")
+async def snapshot_status():
+    """Hot-city snapshot ages and hit/miss counters."""
+    return snapshot_store.status()
+
+
+def _best(results):
+    scored = {name: m for name, m in results.items() if "MAE" in m}
+    best = min(scored, key=lambda name: scored[name]["MAE"]) if scored else None
+    return {"best": best, "best_mae": scored[best]["MAE"] if best else None}
+
+
+async def _stream_evaluation(response, cities):
+    yield {"event": "summary", **response, "cities": sorted(cities)}
+    for city in sorted(cities):
+        yield {"event": "city", "city": city, "results": cities[city], **_best(cities[city])}
+    yield {"event": "end", "count": len(cities)}
 
 
 @router.get("/evaluate")
-async def evaluate_models():
-    """Evaluate available models on held-out split of daily_London.csv.
-    Returns MAE and RMSE for baseline rule and XGBoost (if available).
+async def evaluate_models(request: Request, city: str | None = None, stream: str | None = None):
+    """Walk-forward backtest results for every model (MAE, RMSE, safe/unsafe accuracy).
+
+    Computed offline by ``python -m app.backtest`` (or ``POST /backtest``) and
+    re-read only when the results file changes; ``city`` narrows the metrics
+    to one city; ``?stream=ndjson|sse`` sends the overall metrics and then
+    one event per city.
     """
-    import pandas as pd
-    from sklearn.model_selection import train_test_split
-    from sklearn.metrics import mean_absolute_error, mean_squared_error
-    import numpy as np
-    import datetime
-
-    data_path = os.path.join(os.path.dirname(__file__), "..", "..", "data", "daily_London.csv")
-    data_path = os.path.normpath(data_path)
-    if not os.path.exists(data_path):
-        raise HTTPException(status_code=404, detail="daily_London.csv not found")
-
-    df = pd.read_csv(data_path)
-    if "date" not in df.columns or "rain_mm" not in df.columns:
-        raise HTTPException(status_code=400, detail="daily_London.csv missing required columns")
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values("date").copy()
-    # Simple features similar to training
-    df["rain_lag_1"] = df["rain_mm"].shift(1)
-    df["dayofyear"] = df["date"].dt.dayofyear
-    df = df.dropna().reset_index(drop=True)
-    if len(df) < 20:
-        raise HTTPException(status_code=400, detail="Not enough data to evaluate")
-    X = df[[c for c in df.columns if c not in ["date", "rain_mm"]]]
-    y = df["rain_mm"]
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    results = {}
-    # Baseline rule: predict mean of yesterday rain (lag1)
-    baseline_pred = X_test["rain_lag_1"].fillna(y_train.mean())
-    results["rule"] = {
-        "MAE": float(mean_absolute_error(y_test, baseline_pred)),
-        "RMSE": float(np.sqrt(mean_squared_error(y_test, baseline_pred))),
-    }
-
-    # XGBoost if available
-    xgb_model = load_model(XGB_PATH)
-    if xgb_model is not None:
-        try:
-            xgb_pred = xgb_model.predict(X_test)
-            results["xgboost"] = {
-                "MAE": float(mean_absolute_error(y_test, xgb_pred)),
-                "RMSE": float(np.sqrt(mean_squared_error(y_test, xgb_pred))),
-            }
-        except Exception as e:
-            results["xgboost"] = {"error": str(e)}
-    else:
-        results["xgboost"] = {"error": "model not found"}
+    with span("load"):
+        summary = await run_in_threadpool(load_results)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No backtest results yet; run `python -m app.backtest` in backend/")
+    response = {k: summary[k] for k in ("results", "best", "best_mae", "config", "generated_at", "rule_sources")}
+    if city is not None:
+        if city not in summary["cities"]:
+            raise HTTPException(status_code=404, detail=f"{city} is not in the backtest")
+        results = summary["cities"][city]
+        return {**response, "city": city, "results": results, **_best(results)}
+    fmt = stream_format(request, stream)
+    if fmt:
+        return stream_response(_stream_evaluation(response, summary["cities"]), fmt)
+    return {**response, "cities": sorted(summary["cities"])}
+
+
+class BacktestRequest(BaseModel):
+    cities: list[str] | None = None
+    models: list[str] = list(BATCH_MODELS)
+    start: datetime.date | None = None
+    end: datetime.date | None = None
+    min_train_days: int = Field(60, ge=1)
+    workers: int | None = Field(None, ge=1)
+    # Replace the results served by GET /evaluate once the run completes
+    save: bool = False
+
+
+_backtest_lock = asyncio.Lock()
+
+
+async def _stream_backtest(payload, release):
+    from starlette.concurrency import iterate_in_threadpool
+
+    from .backtest import iter_backtest
+    from .backtest_results import save_results
+
+    events = iter_backtest(cities=payload.cities, models=payload.models, start=payload.start, end=payload.end,
+                           min_train_days=payload.min_train_days, threshold=settings.RAIN_THRESHOLD_MM,
+                           workers=payload.workers)
+    try:
+        async for event in iterate_in_threadpool(events):
+            if event["event"] == "done":
+                if payload.save:
+                    await run_in_threadpool(save_results, event["summary"], event["predictions"])
+                # The predictions frame stays on disk (with save), not in the stream
+                event = {"event": "done", "saved": payload.save, "summary": event["summary"]}
+            yield event
+    except (FileNotFoundError, ValueError) as e:
+        yield {"event": "error", "error": str(e)}
+    finally:
+        # Client gone: closing cancels the queued fits and returns without waiting for the running ones,
+        # so it is safe here without an await (which a cancelled task could not finish)
+        events.close()
+        release()
+
+
+@router.post("/backtest")
+async def stream_backtest(payload: BacktestRequest, request: Request, stream: str | None = None):
+    """Run a walk-forward backtest and stream its progress: ``frames``, ``block`` per fit, ``city`` per city as
+    soon as its fits are done, then ``done`` with the summary. NDJSON unless SSE is asked for."""
+    unknown = sorted(set(payload.models) - set(BATCH_MODELS))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown models: {', '.join(unknown)}")
+    fmt = stream_format(request, stream, default="ndjson")
+    if _backtest_lock.locked():
+        raise HTTPException(status_code=409, detail="A backtest is already running")
+    # Taken here, not when the body starts streaming, so a second request arriving meanwhile gets the 409;
+    # uncontended, so this returns without yielding to another request
+    await _backtest_lock.acquire()
+    released = False
 
-    # Choose best by MAE
-    def best_model(res):
-        best = None
-        best_mae = None
-        for name, metrics in res.items():
-            if "MAE" in metrics:
-                if best is None or metrics["MAE"] < best_mae:
-                    best = name
-                    best_mae = metrics["MAE"]
-        return best, best_mae
+    def release():
+        # Whichever comes first: the stream ending, or the response finishing without ever starting it
+        nonlocal released
+        if not released:
+            released = True
+            _backtest_lock.release()
 
-    best, best_mae = best_model(results)
-    return {"results": results, "best": best, "best_mae": best_mae}
+    async def release_after_response():
+        release()  # async, so it runs on the loop that owns the lock rather than in the threadpool
+
+    return stream_response(_stream_backtest(payload, release), fmt,
+                           background=BackgroundTask(release_after_response))
 
 
 @router.post("/upload/model/{model_name}")
@@ -183,65 +714,107 @@ async def upload_model(model_name: str, file: UploadFile = File(...)):
     # Accept zipped or joblib file and store in models/
     dest = os.path.join(BASE_DIR, "models", model_name)
     content = await file.read()
-    with open(dest, "wb") as f:
+    # Write beside the target and rename so readers never see a partial file
+    tmp = dest + ".uploading"
+    with open(tmp, "wb") as f:
         f.write(content)
-    return {"ok": True, "saved_to": dest}
+    os.replace(tmp, dest)
+    reloaded = {}
+    for name in model_registry.names_for_path(dest):
+        try:
+            entry = await run_in_threadpool(model_registry.reload, name)
+            reloaded[name] = entry.version if entry else None
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Saved {dest} but failed to load {name}: {e}")
+    return {"ok": True, "saved_to": dest, "reloaded": reloaded}
+
+
+@router.get("/models")
+async def loaded_models():
+    """Loaded model versions, file mtimes, load and warm-up times."""
+    return model_registry.info()
 
 
 @router.post("/features")
 async def compute_features(payload: CityRequest):
     """Return input features used by models plus location metadata from OpenWeather."""
     try:
-        city = (payload.city or "").strip()
-        if "," in city:
-            city = city.split(",")[0].strip()
-        if not city and (payload.lat is None or payload.lon is None):
-            raise HTTPException(status_code=422, detail="City or lat/lon required")
-        f = fetch_5day_forecast(city if city else None, payload.lat, payload.lon)
+        city = _resolve_city(payload)
+        with span("fetch"):
+            f = await get_forecast(city if city else None, payload.lat, payload.lon)
         # Location metadata
         meta = f.get("city", {})
         coord = meta.get("coord", {})
         country = meta.get("country")
 
-        import datetime
-        temps = []
-        hums = []
-        winds = []
-        today = datetime.date.today()
-        tomorrow_date = today + datetime.timedelta(days=1)
-        # Aggregate for tomorrow day window
-        for item in f.get("list", []):
-            ts = datetime.datetime.fromtimestamp(item["dt"]) 
-            if ts.date() == tomorrow_date:
-                temps.append(item.get("main", {}).get("temp") or 0.0)
-                hums.append(item.get("main", {}).get("humidity") or 0.0)
-                winds.append(item.get("wind", {}).get("speed") or 0.0)
-        temp_mean = float(np.mean(temps)) if temps else 0.0
-        hum_mean = float(np.mean(hums)) if hums else 0.0
-        wind_mean = float(np.mean(winds)) if winds else 0.0
-        # Rain lag-1 approximation: total rain today from forecast
-        today_total = 0.0
-        for item in f.get("list", []):
-            ts = datetime.datetime.fromtimestamp(item["dt"]) 
-            if ts.date() == today:
-                today_total += item.get("rain", {}).get("3h", 0.0)
-        rain_lag_1 = float(today_total)
-        dayofyear = float(tomorrow_date.timetuple().tm_yday)
+        with span("features"):
+            feat, _ = tomorrow_features(f)
+        features = dict(zip(XGB_FEATURES, (float(v) for v in feat[0])))
 
         return {
             "city": meta.get("name") or city,
             "country": country,
             "lat": coord.get("lat"),
             "lon": coord.get("lon"),
-            "features": {
-                "temp_mean_tomorrow": temp_mean,
-                "humidity_mean_tomorrow": hum_mean,
-                "wind_speed_mean_tomorrow": wind_mean,
-                "rain_lag_1": rain_lag_1,
-                "dayofyear_tomorrow": dayofyear,
-            },
+            "features": features,
         }
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/archive/stats")
+async def archive_stats():
+    """Record count, time span and on-disk size of the raw forecast archive."""
+    if forecast_archive is None:
+        return {"enabled": False}
+    return {"enabled": True, **await run_in_threadpool(forecast_archive.stats)}
+
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the shared forecast cache, upstream call counts, LSTM batching and the
+    per-city model cache."""
+    return {**forecast_cache.stats(), "upstream": weather_client.stats(), "provider": forecast_provider.stats(),
+            "lstm_batching": lstm_batcher.stats(), "models": model_router.stats()}
+
+
+def runtime_metrics():
+    """Counters and gauges kept by the cache, upstream client, provider and model registry, for ``/metrics``."""
+    cache, upstream, provider = forecast_cache.stats(), weather_client.stats(), forecast_provider.stats()
+    models = model_registry.cache_stats()
+    return [
+        ("laundry_upstream_requests_total", "counter", "OpenWeather HTTP attempts, retries included.",
+         upstream["requests"]),
+        ("laundry_upstream_retries_total", "counter", "OpenWeather attempts that were retried.", upstream["retries"]),
+        ("laundry_upstream_errors_total", "counter", "OpenWeather calls that failed after retries.",
+         upstream["errors"]),
+        ("laundry_forecast_fetches_total", "counter", "Forecast payloads obtained by source.",
+         {(("source", "upstream"),): provider["upstream"], (("source", "replay"),): provider["replayed"]}),
+        ("laundry_forecast_cache_total", "counter", "Forecast cache lookups by result.",
+         {(("result", k),): cache[k] for k in ("hits", "misses", "coalesced")}),
+        ("laundry_forecast_cache_entries", "gauge", "Forecast payloads currently cached.", cache["entries"]),
+        ("laundry_model_cache_total", "counter", "Per-city model cache lookups by result.",
+         {(("result", k),): models[k] for k in ("hits", "misses", "evictions")}),
+        ("laundry_model_cache_bytes", "gauge", "Bytes of evictable model files loaded.", models["bytes"]),
+    ]
+
+
+profiler = SamplingProfiler()
+
+
+@router.get("/debug/profile")
+async def profile(seconds: float = Query(10.0, gt=0), interval_ms: float = Query(5.0, ge=1)):
+    """Sample every thread's stack for ``seconds`` and return collapsed stacks (flamegraph input)."""
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler disabled; set PROFILER_ENABLED=true")
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
+    profiler.interval_s = interval_ms / 1000
+    profiler.start()
+    try:
+        await asyncio.sleep(min(seconds, settings.PROFILER_MAX_S))
+    finally:
+        profiler.stop()
+    return PlainTextResponse(profiler.collapsed(), headers={"X-Profile-Samples": str(profiler.samples)})
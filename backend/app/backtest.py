@@ -0,0 +1,414 @@
+"""Walk-forward backtest of the rule, XGBoost, Prophet and LSTM across cities and issue dates.
+
+Every day ``t`` in the evaluation range is a target: the forecast for it was
+issued on ``t - 1``. Each model is refit on an expanding window every
+``retrain_days`` (its own cadence, Prophet and the LSTM being slower to fit)
+using only days whose rain was complete on the first issue date of the block,
+and predicts every target of that block. The rule is scored against the
+forecast archived on the issue date when there is one, else against
+persistence (today's rain for tomorrow), which is what the API's rule
+falls back to without a forecast.
+
+Per-city feature frames (calendar-aligned daily rows, lags and archived
+forecast rain) are built once, cached as Parquet under ``data/backtest/cache``
+keyed by a hash of their inputs, and read by the worker processes; the
+(city, model, block) fits run in a process pool.
+
+    cd backend
+    python -m app.backtest --cities London Paris --start 2025-01-01 --workers 8
+    python -m app.backtest --models rule xgboost prophet    # skip the LSTM (needs TensorFlow)
+
+Results go to ``data/backtest/results.json`` (served by ``GET /api/evaluate``)
+and the individual predictions to ``data/backtest/predictions.parquet``.
+"""
+import argparse
+import collections
+import datetime
+import functools
+import glob
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from .backtest_results import BACKTEST_DIR, RESULTS_PATH, save_results
+from .feature_builder import build_features, make_schema
+from .forecast_archive import ARCHIVE_DIR, ForecastArchive
+from .forecast_features import tomorrow_rain
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "data"))
+STORE_DIR = os.path.join(DATA_DIR, "daily")
+CACHE_DIR = os.path.join(BACKTEST_DIR, "cache")
+
+MODELS = ("rule", "xgboost", "prophet", "lstm")
+FITTED_MODELS = ("xgboost", "prophet", "lstm")
+RETRAIN_DAYS = {"xgboost": 7, "prophet": 28, "lstm": 91}
+DAILY_COLUMNS = ["date", "rain_mm", "temp", "humidity", "wind_speed"]
+# Same default features as training/train_xgboost.py
+FEATURE_SCHEMA = make_schema()
+FRAME_VERSION = 2  # bump when city_frame changes so cached frames are rebuilt
+ONE_DAY = pd.Timedelta(days=1)
+
+
+def load_daily(cities=None, store_dir=STORE_DIR, data_dir=DATA_DIR):
+    """``{city: daily frame}`` from the partitioned store, or ``daily_<city>.csv`` files without one."""
+    if os.path.isdir(store_dir):
+        filters = [("city", "in", list(cities))] if cities else None
+        df = pd.read_parquet(store_dir, columns=DAILY_COLUMNS + ["city"], filters=filters)
+        df["city"] = df["city"].astype(str)
+        return {city: rows.drop(columns="city") for city, rows in df.groupby("city", sort=True)}
+    paths = {os.path.basename(p)[len("daily_"):-len(".csv")]: p
+             for p in glob.glob(os.path.join(data_dir, "daily_*.csv"))}
+    return {city: pd.read_csv(path, usecols=DAILY_COLUMNS) for city, path in sorted(paths.items())
+            if not cities or city in cities}
+
+
+def archived_rain(archive, city):
+    """Forecast rain for each target date, from the last payload archived on the day before it."""
+    rain = {}
+    for record in archive.iter_records(city=city):
+        issued = datetime.date.fromtimestamp(record["issued_at"])
+        rain[pd.Timestamp(issued) + ONE_DAY] = tomorrow_rain(record["payload"], today=issued)
+    return pd.Series(rain, dtype=float)
+
+
+def city_frame(daily, forecast_rain=None):
+    """One row per calendar day (gaps are NaN rows) with the model features and archived forecast rain."""
+    df = daily.assign(date=pd.to_datetime(daily["date"])).drop_duplicates("date", keep="last")
+    df = df.set_index("date").sort_index().asfreq("D").rename_axis("date").reset_index()
+    frame = build_features(df, FEATURE_SCHEMA).drop(columns="city")
+    frame["forecast_rain"] = forecast_rain.reindex(frame["date"]).to_numpy() if forecast_rain is not None else np.nan
+    return frame
+
+
+def cached_frame(city, daily, archive=None, cache_dir=CACHE_DIR):
+    """Path of ``city``'s feature frame, rebuilt only when the daily rows or its archive records changed."""
+    rows = archive.query(city=city) if archive is not None else []
+    digest = hashlib.sha1(f"{FRAME_VERSION}|{city}|{len(rows)}|{rows[-1][0] if rows else 0}|".encode())
+    digest.update(pd.util.hash_pandas_object(daily.reset_index(drop=True), index=False).values.tobytes())
+    prefix = urllib.parse.quote(city, safe="")
+    path = os.path.join(cache_dir, f"{prefix}-{digest.hexdigest()[:16]}.parquet")
+    if os.path.exists(path):
+        return path, True
+    os.makedirs(cache_dir, exist_ok=True)
+    frame = city_frame(daily, archived_rain(archive, city) if rows else None)
+    frame.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    for stale in glob.glob(os.path.join(glob.escape(cache_dir), glob.escape(prefix) + "-*.parquet")):
+        if stale != path:
+            os.remove(stale)
+    return path, False
+
+
+@functools.lru_cache(maxsize=8)
+def _read_frame(path):
+    # A worker runs many blocks of the same city; read each frame once per process
+    return pd.read_parquet(path)
+
+
+def targets(frame, start=None, end=None, min_train_days=60):
+    """Target dates to score: observed days after ``min_train_days`` of history, within [start, end]."""
+    observed = frame.loc[frame["rain_mm"].notna(), "date"]
+    if observed.empty:
+        return observed
+    first = observed.iloc[0] + pd.Timedelta(days=min_train_days)
+    if start is not None:
+        first = max(first, pd.Timestamp(start))
+    keep = observed >= first
+    if end is not None:
+        keep &= observed <= pd.Timestamp(end)
+    return observed[keep].reset_index(drop=True)
+
+
+def blocks(dates, retrain_days):
+    """Split target dates into consecutive blocks of ``retrain_days`` calendar days."""
+    if dates.empty:
+        return []
+    index = (dates - dates.iloc[0]).dt.days // retrain_days
+    return [group.reset_index(drop=True) for _, group in dates.groupby(index)]
+
+
+def rule_predictions(frame, dates):
+    """Archived forecast rain for tomorrow, else today's rain (persistence)."""
+    rows = frame.set_index("date").loc[dates]
+    pred = rows["forecast_rain"].where(rows["forecast_rain"].notna(), rows["rain_lag_1"])
+    source = np.where(rows["forecast_rain"].notna(), "forecast", "persistence")
+    return pred.to_numpy(dtype=float), source
+
+
+def _fit_xgboost(train, test, params):
+    import xgboost as xgb
+
+    train = train[train["rain_mm"].notna()]
+    model = xgb.XGBRegressor(n_estimators=params.get("xgb_estimators", 200), tree_method="hist", n_jobs=1,
+                             random_state=42)
+    features = FEATURE_SCHEMA["features"]
+    model.fit(train[features], train["rain_mm"])
+    return model.predict(test[features])
+
+
+def _fit_prophet(train, test, params):
+    from prophet import Prophet
+
+    from .prophet_fast import ProphetEvaluator
+
+    logging.getLogger("cmdstanpy").disabled = True  # one INFO line per fit otherwise
+    history = train.loc[train["rain_mm"].notna(), ["date", "rain_mm"]].rename(columns={"date": "ds", "rain_mm": "y"})
+    model = Prophet().fit(history)
+    return ProphetEvaluator.from_prophet(model).predict(test["date"].to_numpy())
+
+
+def _fit_lstm(train, test, params, frame):
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.layers import LSTM, Dense
+    from tensorflow.keras.models import Sequential
+
+    from .lstm_runtime import LSTMRuntime
+
+    window = params.get("lstm_window", 14)
+    series = train["rain_mm"].fillna(0.0).to_numpy(dtype=np.float32)
+    X = np.lib.stride_tricks.sliding_window_view(series[:-1], window)
+    y = series[window:]
+    model = Sequential([LSTM(64, input_shape=(window, 1)), Dense(1)])
+    model.compile(optimizer="adam", loss="mse")
+    model.fit(X[..., None], y, validation_split=0.2, epochs=params.get("lstm_epochs", 30), batch_size=16,
+              callbacks=[EarlyStopping(patience=5, restore_best_weights=True)], verbose=0)
+    # Window for target t is the ``window`` days ending on its issue date
+    rain = frame.set_index("date")["rain_mm"].fillna(0.0)
+    windows = np.stack([rain.loc[t - window * ONE_DAY:t - ONE_DAY].to_numpy(dtype=np.float32) for t in test["date"]])
+    return LSTMRuntime.from_keras(model).predict(windows)[:, 0]
+
+
+def run_block(task):
+    """Fit one model for one (city, block) and predict the block's targets. Runs in a worker process."""
+    t0 = time.perf_counter()
+    frame = _read_frame(task["frame"])
+    dates = pd.to_datetime(pd.Series(task["targets"]))
+    # Days whose rain was complete when the block's first forecast was issued
+    train = frame[frame["date"] <= dates.iloc[0] - 2 * ONE_DAY]
+    test = frame.set_index("date").loc[dates].reset_index()
+    out = {"city": task["city"], "model": task["model"], "targets": task["targets"],
+           "train_days": int(train["rain_mm"].notna().sum())}
+    try:
+        if out["train_days"] < task["params"].get("min_train_rows", 30):
+            raise ValueError(f"only {out['train_days']} days of history")
+        if task["model"] == "xgboost":
+            pred = _fit_xgboost(train, test, task["params"])
+        elif task["model"] == "prophet":
+            pred = _fit_prophet(train, test, task["params"])
+        else:
+            pred = _fit_lstm(train, test, task["params"], frame)
+        out["pred"] = np.maximum(np.asarray(pred, dtype=float), 0.0).tolist()  # rain is never negative
+    except ImportError as e:
+        out["error"] = f"{e.name or e} not installed"
+    except Exception as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+    out["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    return out
+
+
+def score(actual, pred, threshold):
+    """MAE, RMSE and safe/unsafe accuracy; ``false_safe_rate`` is the share of rainy days called safe."""
+    actual = np.asarray(actual, dtype=float)
+    pred = np.asarray(pred, dtype=float)
+    ok = ~np.isnan(pred) & ~np.isnan(actual)
+    actual, pred = actual[ok], pred[ok]
+    if not len(actual):
+        return {"n": 0}
+    err = pred - actual
+    safe, pred_safe = actual <= threshold, pred <= threshold
+    rainy = int((~safe).sum())
+    return {
+        "n": int(len(actual)),
+        "MAE": float(np.abs(err).mean()),
+        "RMSE": float(np.sqrt((err ** 2).mean())),
+        "accuracy": float((safe == pred_safe).mean()),
+        "false_safe_rate": float((pred_safe & ~safe).sum() / rainy) if rainy else None,
+    }
+
+
+def city_event(city, parts, frame_path, threshold):
+    """``city`` event: metrics per model for one city whose fits are all done."""
+    results = {}
+    if parts:
+        actual = _read_frame(frame_path)[["date", "rain_mm"]].rename(columns={"rain_mm": "actual"})
+        rows = pd.concat(parts, ignore_index=True).merge(actual, on="date", how="left")
+        results = {model: score(g["actual"], g["pred"], threshold) for model, g in rows.groupby("model", sort=True)}
+    return {"event": "city", "city": city, "results": results}
+
+
+def summarize(predictions, threshold, config, errors, wall_s):
+    results, cities = {}, {}
+    for model, rows in predictions.groupby("model", sort=False):
+        results[model] = score(rows["actual"], rows["pred"], threshold)
+    for (city, model), rows in predictions.groupby(["city", "model"], sort=True):
+        cities.setdefault(city, {})[model] = score(rows["actual"], rows["pred"], threshold)
+    for model in config["models"]:
+        if model not in results or not results[model]["n"]:
+            results[model] = {"n": 0, "error": next((e["error"] for e in errors if e["model"] == model),
+                                                    "no predictions")}
+    scored = {name: m for name, m in results.items() if "MAE" in m}
+    best = min(scored, key=lambda name: scored[name]["MAE"]) if scored else None
+    rule = predictions[predictions["model"] == "rule"]
+    return {
+        "generated_at": time.time(),
+        "config": config,
+        "results": results,
+        "best": best,
+        "best_mae": scored[best]["MAE"] if best else None,
+        "cities": cities,
+        "rule_sources": rule["source"].value_counts().to_dict() if len(rule) else {},
+        "errors": errors[:100],
+        "n_errors": len(errors),
+        "wall_s": round(wall_s, 2),
+    }
+
+
+def iter_backtest(cities=None, models=MODELS, start=None, end=None, retrain_days=None, min_train_days=60,
+                  threshold=1.0, workers=None, store_dir=STORE_DIR, archive_dir=ARCHIVE_DIR, cache_dir=CACHE_DIR,
+                  params=None):
+    """Run the backtest, yielding progress events; the last one is ``{"event": "done", ...}``.
+
+    Events: ``frames`` (feature frames ready, ``cached`` of them reused),
+    ``block`` (one finished fit), ``city`` with a city's metrics as soon as
+    its last fit is in, and ``done`` with the ``summary`` and the
+    ``predictions`` frame.
+    """
+    t0 = time.perf_counter()
+    retrain = {**RETRAIN_DAYS, **(retrain_days or {})}
+    params = params or {}
+    unknown = set(models) - set(MODELS)
+    if unknown:
+        raise ValueError(f"unknown models: {', '.join(sorted(unknown))}")
+    daily = load_daily(cities, store_dir)
+    if not daily:
+        raise FileNotFoundError(f"no daily data under {store_dir}")
+    archive = ForecastArchive(archive_dir) if os.path.isdir(archive_dir) else None
+    frames, cached = {}, 0
+    try:
+        for city, rows in daily.items():
+            frames[city], hit = cached_frame(city, rows, archive, cache_dir)
+            cached += hit
+    finally:
+        if archive is not None:
+            archive.close()
+    yield {"event": "frames", "cities": len(frames), "cached": cached}
+
+    parts, tasks = {city: [] for city in frames}, []
+    for city, path in frames.items():
+        frame = _read_frame(path)
+        dates = targets(frame, start, end, min_train_days)
+        if "rule" in models and len(dates):
+            pred, source = rule_predictions(frame, dates)
+            parts[city].append(pd.DataFrame({"city": city, "model": "rule", "date": dates, "pred": pred,
+                                             "source": source}))
+        for model in models:
+            if model in FITTED_MODELS:
+                tasks += [{"city": city, "model": model, "frame": path, "params": params,
+                           "targets": [d.strftime("%Y-%m-%d") for d in block]}
+                          for block in blocks(dates, retrain[model])]
+
+    pending = collections.Counter(task["city"] for task in tasks)
+    for city in frames:
+        if not pending[city]:
+            yield city_event(city, parts[city], frames[city], threshold)
+
+    errors = []
+    # spawn: safe to start from inside the API process (no forked event loop or threads)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = [pool.submit(run_block, task) for task in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            out = future.result()
+            city = out["city"]
+            if "error" in out:
+                errors.append({k: out[k] for k in ("city", "model", "error")} | {"first_target": out["targets"][0]})
+            else:
+                parts[city].append(pd.DataFrame({"city": city, "model": out["model"],
+                                                 "date": pd.to_datetime(out["targets"]), "pred": out["pred"],
+                                                 "source": "walk_forward"}))
+            yield {"event": "block", "done": done, "total": len(tasks), "city": city, "model": out["model"],
+                   "elapsed_s": out["elapsed_s"], "error": out.get("error")}
+            pending[city] -= 1
+            if not pending[city]:
+                yield city_event(city, parts[city], frames[city], threshold)
+    finally:
+        # A generator closed early (client gone) drops the queued fits instead of running them all,
+        # and does not wait for the ones already running
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    parts = [part for city_parts in parts.values() for part in city_parts]
+    predictions = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(
+        columns=["city", "model", "date", "pred", "source"])
+    actual = pd.concat([_read_frame(p)[["date", "rain_mm"]].assign(city=c) for c, p in frames.items()])
+    predictions = predictions.merge(actual.rename(columns={"rain_mm": "actual"}), on=["city", "date"], how="left")
+    config = {"cities": sorted(frames), "models": list(models), "start": str(start) if start else None,
+              "end": str(end) if end else None, "retrain_days": {m: retrain[m] for m in models if m in retrain},
+              "min_train_days": min_train_days, "threshold": threshold, "params": params}
+    summary = summarize(predictions, threshold, config, errors, time.perf_counter() - t0)
+    yield {"event": "done", "summary": summary, "predictions": predictions}
+
+
+def run_backtest(**kwargs):
+    """Run to completion; returns ``(summary, predictions)``."""
+    for event in iter_backtest(**kwargs):
+        if event["event"] == "done":
+            return event["summary"], event["predictions"]
+
+
+def main(args):
+    retrain = {m: args.retrain_days for m in FITTED_MODELS} if args.retrain_days else {}
+    for model, days in (("prophet", args.prophet_retrain_days), ("lstm", args.lstm_retrain_days)):
+        if days:
+            retrain[model] = days
+    params = {"lstm_window": args.lstm_window, "lstm_epochs": args.lstm_epochs}
+    summary = None
+    for event in iter_backtest(cities=args.cities, models=args.models, start=args.start, end=args.end,
+                               retrain_days=retrain, min_train_days=args.min_train_days, threshold=args.threshold,
+                               workers=args.workers, store_dir=args.store, archive_dir=args.archive,
+                               cache_dir=args.cache, params=params):
+        if event["event"] == "frames":
+            print(f"{event['cities']} cities, {event['cached']} feature frames from cache")
+        elif event["event"] == "block" and (event["done"] % args.progress_every == 0 or event["done"] == event["total"]):
+            print(f"{event['done']}/{event['total']} fits done")
+        elif event["event"] == "done":
+            summary = event["summary"]
+            save_results(summary, event["predictions"], args.out)
+
+    print(f"\n{'model':<10} {'n':>7} {'MAE':>8} {'RMSE':>8} {'accuracy':>9} {'false safe':>11}")
+    for model, m in summary["results"].items():
+        if "MAE" in m:
+            fs = f"{m['false_safe_rate']:.3f}" if m["false_safe_rate"] is not None else "-"
+            print(f"{model:<10} {m['n']:>7} {m['MAE']:>8.3f} {m['RMSE']:>8.3f} {m['accuracy']:>9.3f} {fs:>11}")
+        else:
+            print(f"{model:<10} {'':>7} {m.get('error', '')}")
+    print(f"best: {summary['best']}; {summary['n_errors']} failed fits; {summary['wall_s']}s; written to {args.out}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Walk-forward backtest of all models across cities")
+    p.add_argument("--cities", nargs="+", default=None, help="default: every city in the store")
+    p.add_argument("--models", nargs="+", default=list(MODELS), choices=MODELS)
+    p.add_argument("--start", default=None, help="first target date (default: after --min-train-days)")
+    p.add_argument("--end", default=None, help="last target date")
+    p.add_argument("--min-train-days", type=int, default=60)
+    p.add_argument("--retrain-days", type=int, default=None,
+                   help=f"refit cadence for every model (default: {RETRAIN_DAYS})")
+    p.add_argument("--prophet-retrain-days", type=int, default=None)
+    p.add_argument("--lstm-retrain-days", type=int, default=None)
+    p.add_argument("--lstm-window", type=int, default=14)
+    p.add_argument("--lstm-epochs", type=int, default=30)
+    p.add_argument("--threshold", type=float, default=1.0, help="rain (mm) at or below which a day is safe")
+    p.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    p.add_argument("--store", default=STORE_DIR)
+    p.add_argument("--archive", default=ARCHIVE_DIR)
+    p.add_argument("--cache", default=CACHE_DIR)
+    p.add_argument("--out", default=RESULTS_PATH)
+    p.add_argument("--progress-every", type=int, default=50)
+    main(p.parse_args())
@@ -0,0 +1,35 @@
+"""Saved backtest results, kept apart from app.backtest so ``GET /api/evaluate`` reads them without pandas."""
+import json
+import os
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "data"))
+BACKTEST_DIR = os.path.join(DATA_DIR, "backtest")
+RESULTS_PATH = os.path.join(BACKTEST_DIR, "results.json")
+PREDICTIONS_FILE = "predictions.parquet"
+
+
+def save_results(summary, predictions, path=RESULTS_PATH):
+    """Write the predictions next to ``path`` and then ``path`` itself, each atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pred_path = os.path.join(os.path.dirname(path), PREDICTIONS_FILE)
+    predictions.to_parquet(pred_path + ".tmp", index=False)
+    os.replace(pred_path + ".tmp", pred_path)
+    with open(path + ".tmp", "w") as f:
+        json.dump(summary, f, indent=2, default=str)
+    os.replace(path + ".tmp", path)
+
+
+_results_cache = {}  # path -> (mtime_ns, summary)
+
+
+def load_results(path=RESULTS_PATH):
+    """The saved summary, re-read only when the file changes; None if there is none yet."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _results_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path) as f:
+            cached = _results_cache[path] = (mtime, json.load(f))
+    return cached[1]
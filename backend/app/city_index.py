@@ -0,0 +1,221 @@
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+# n-gram sizes kept in the substring index; 2-grams serve the shortest queries
+NGRAM_SIZES = (2, 3)
+# Coordinates are packed as int32 micro-degrees; this marks a missing value
+COORD_SCALE = 1_000_000
+COORD_MISSING = np.iinfo(np.int32).min
+
+
+def fold(text: str) -> str:
+    """Accent- and case-fold a name so "São Paulo" matches "sao paulo"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def ngrams(text: str, n: int):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _population(c) -> int:
+    return int(c.get("population") or (c.get("stat") or {}).get("population") or 0)
+
+
+def _pack_coord(value) -> int:
+    if value is None:
+        return COORD_MISSING
+    return int(round(float(value) * COORD_SCALE))
+
+
+class StringTable:
+    """Read-only sequence of UTF-8 strings stored as an offsets array plus one blob.
+
+    The blob may be ``bytes`` or a memoryview over an mmap. UTF-8 byte order
+    equals code point order, so ``raw`` values can be compared and searched
+    without decoding.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.uint32, count=len(encoded))
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(offsets, b"".join(encoded))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, i) -> bytes:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def __getitem__(self, i) -> str:
+        return self.raw(i).decode("utf-8")
+
+
+class _RawView:
+    """Raw strings of ``table`` in ``order``, indexable for ``bisect``."""
+
+    def __init__(self, table: StringTable, order):
+        self.table = table
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, k) -> bytes:
+        return self.table.raw(self.order[k])
+
+
+class CityIndex:
+    """Prebuilt autocomplete index over the OpenWeather city list.
+
+    Prefix queries are answered by binary search over folded names sorted
+    alphabetically; substring queries intersect the posting lists of the
+    query's n-grams. Matches rank exact names first, then prefix matches, then
+    substring matches, each by descending population.
+
+    All state is flat arrays and string tables, so the same index can be built
+    in memory from JSON or mapped read-only from the binary city store.
+    """
+
+    def __init__(self, ids, names, folded, countries, coords, population, order,
+                 gram_keys, gram_offsets, gram_postings):
+        self.ids = ids
+        self.names = names
+        self.folded = folded
+        self.countries = countries
+        self.coords = coords
+        self.population = population
+        self.order = order
+        self.gram_keys = gram_keys
+        self.gram_offsets = gram_offsets
+        self.gram_postings = gram_postings
+        self._sorted_folded = _RawView(folded, order)
+        self._sorted_grams = _RawView(gram_keys, range(len(gram_keys)))
+
+    @classmethod
+    def from_records(cls, cities):
+        """Build from the raw ``world_cities.json`` list of dicts."""
+        names = [c.get("name", "") for c in cities]
+        folded = [fold(n) for n in names]
+        coords = [c.get("coord") or {} for c in cities]
+        grams = cls._build_ngrams(folded)
+        gram_keys = sorted(grams)
+        lengths = np.fromiter((len(grams[g]) for g in gram_keys), dtype=np.uint32, count=len(gram_keys))
+        gram_offsets = np.zeros(len(gram_keys) + 1, dtype=np.uint32)
+        np.cumsum(lengths, out=gram_offsets[1:])
+        return cls(
+            ids=np.array([c.get("id") or 0 for c in cities], dtype=np.int64),
+            names=StringTable.from_strings(names),
+            folded=StringTable.from_strings(folded),
+            countries=np.array([(c.get("country") or "").encode("ascii", "ignore")[:2] for c in cities], dtype="S2"),
+            coords=np.array([(_pack_coord(co.get("lat")), _pack_coord(co.get("lon"))) for co in coords],
+                            dtype=np.int32).reshape(-1, 2),
+            population=np.array([_population(c) for c in cities], dtype=np.uint32),
+            order=np.array(sorted(range(len(folded)), key=folded.__getitem__), dtype=np.int32),
+            gram_keys=StringTable.from_strings(gram_keys),
+            gram_offsets=gram_offsets,
+            gram_postings=np.fromiter((i for g in gram_keys for i in grams[g]), dtype=np.int32,
+                                      count=int(gram_offsets[-1])),
+        )
+
+    @staticmethod
+    def _build_ngrams(folded):
+        postings = {}
+        for i, name in enumerate(folded):
+            for n in NGRAM_SIZES:
+                for g in ngrams(name, n):
+                    postings.setdefault(g, []).append(i)
+        return postings
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _posting(self, gram: bytes):
+        pos = bisect_left(self._sorted_grams, gram)
+        if pos == len(self._sorted_grams) or self._sorted_grams[pos] != gram:
+            return None
+        return self.gram_postings[self.gram_offsets[pos]:self.gram_offsets[pos + 1]]
+
+    def prefix_matches(self, fq: str):
+        key = fq.encode("utf-8")
+        lo = bisect_left(self._sorted_folded, key)
+        # 0xFF never occurs in UTF-8, so this sorts after every extension of key
+        hi = bisect_left(self._sorted_folded, key + b"\xff", lo)
+        return np.asarray(self.order[lo:hi])
+
+    def substring_candidates(self, fq: str):
+        """Cities containing every n-gram of ``fq`` (a superset of the substring matches)."""
+        n = 3 if len(fq) >= 3 else 2
+        lists = []
+        for g in ngrams(fq, n):
+            p = self._posting(g.encode("utf-8"))
+            if p is None:
+                return np.empty(0, dtype=np.int32)
+            lists.append(p)
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+        lists.sort(key=len)
+        cand = np.asarray(lists[0])
+        for p in lists[1:]:
+            cand = np.intersect1d(cand, p, assume_unique=True)
+            if not len(cand):
+                break
+        return cand
+
+    def _rank(self, idx, fq_nbytes=None):
+        """Order candidates by (exact name first,) population desc, then name."""
+        keys = [-self.population[idx].astype(np.int64)]
+        if fq_nbytes is not None:
+            nbytes = self.folded.offsets[idx + 1].astype(np.int64) - self.folded.offsets[idx]
+            keys.append(nbytes != fq_nbytes)
+        return idx[np.lexsort(keys)]
+
+    def search(self, q: str, limit: int = 10, country: str = None):
+        fq = fold(q.strip())
+        if not fq:
+            return []
+        fq_b = fq.encode("utf-8")
+        country_b = country.upper().encode("ascii", "ignore") if country else None
+        prefix = self.prefix_matches(fq)
+        if country_b:
+            prefix = prefix[self.countries[prefix] == country_b]
+        hits = list(self._rank(prefix, len(fq_b))[:limit])
+
+        if len(hits) < limit:
+            sub = self.substring_candidates(fq)
+            if country_b and len(sub):
+                sub = sub[self.countries[sub] == country_b]
+            sub = np.setdiff1d(sub, prefix, assume_unique=True)
+            exact_gram = len(fq) <= max(NGRAM_SIZES)
+            # Walk candidates best-first and confirm the substring only as needed
+            for i in self._rank(sub):
+                if exact_gram or fq_b in self.folded.raw(i):
+                    hits.append(i)
+                    if len(hits) >= limit:
+                        break
+        return [self.record(int(i)) for i in hits]
+
+    def coord(self, i: int):
+        lat, lon = (int(v) for v in self.coords[i])
+        if lat == COORD_MISSING or lon == COORD_MISSING:
+            return None, None
+        return lat / COORD_SCALE, lon / COORD_SCALE
+
+    def record(self, i: int):
+        lat, lon = self.coord(i)
+        return {
+            "id": int(self.ids[i]),
+            "name": self.names[i],
+            "country": self.countries[i].decode("ascii") or None,
+            "lat": lat,
+            "lon": lon,
+        }
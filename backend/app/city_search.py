@@ -1,49 +1,117 @@
 import json
 import os
+import threading
 from fastapi import APIRouter, Query, HTTPException
+from .city_index import CityIndex
+from .city_store import CITIES_JSON_PATH, CITIES_STORE_PATH, open_store
+from .geo_index import GeoIndex
+from .metrics import span
 
 router = APIRouter()
 
 
 def _load_cities():
-    data_path = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "world_cities.json"))
+    data_path = CITIES_JSON_PATH
     if not os.path.exists(data_path):
         raise FileNotFoundError("data/world_cities.json not found. Please download OpenWeather city list.")
     with open(data_path, encoding="utf-8") as f:
         return json.load(f)
 
 
-_CITIES_CACHE = None
+_INDEX_CACHE = None
+_GEO_CACHE = None
+# The warm-up thread and a request thread must not both parse world_cities.json
+_BUILD_LOCK = threading.RLock()
+
+
+def _store_is_fresh():
+    if not os.path.exists(CITIES_STORE_PATH):
+        return False
+    if not os.path.exists(CITIES_JSON_PATH):
+        return True
+    return os.path.getmtime(CITIES_STORE_PATH) >= os.path.getmtime(CITIES_JSON_PATH)
+
+
+def get_city_index() -> CityIndex:
+    """Open the search index once per process; called at startup to warm it.
+
+    Prefers the memory-mapped binary store (see city_store.py) and falls back
+    to building the index from world_cities.json when the store is missing,
+    older than the JSON, or unreadable.
+    """
+    global _INDEX_CACHE
+    if _INDEX_CACHE is None:
+        with _BUILD_LOCK:
+            if _INDEX_CACHE is None:
+                index = None
+                if _store_is_fresh():
+                    try:
+                        index = open_store(CITIES_STORE_PATH)
+                    except (OSError, ValueError):
+                        index = None
+                _INDEX_CACHE = index if index is not None else CityIndex.from_records(_load_cities())
+    return _INDEX_CACHE
+
+
+def get_geo_index() -> GeoIndex:
+    """Spatial grid over the city coordinates, built once per process."""
+    global _GEO_CACHE
+    if _GEO_CACHE is None:
+        with _BUILD_LOCK:
+            if _GEO_CACHE is None:
+                _GEO_CACHE = GeoIndex.from_city_index(get_city_index())
+    return _GEO_CACHE
+
+
+def geo_index_ready() -> bool:
+    """Whether nearest_cities can answer without building the indexes first."""
+    return _GEO_CACHE is not None
+
+
+def nearest_cities(lat: float, lon: float, k: int = 1, max_km: float = None):
+    """Return up to k city records closest to (lat, lon), each with distance_km."""
+    index = get_city_index()
+    positions, dists = get_geo_index().nearest(lat, lon, k)
+    results = []
+    for i, d in zip(positions, dists):
+        if max_km is not None and d > max_km:
+            break
+        results.append({**index.record(int(i)), "distance_km": round(float(d), 3)})
+    return results
 
 
 @router.get("/search_city")
-def search_city(q: str = Query(..., min_length=2)):
+def search_city(
+    q: str = Query(..., min_length=2),
+    country: str | None = Query(None, min_length=2, max_length=2),
+    limit: int = Query(10, ge=1, le=50),
+):
     """
-    Search cities by name substring. Returns up to 10 matches with name, country, lat, lon.
+    Search cities by name prefix or substring, accent- and case-insensitive.
+    Exact and prefix matches come first, then by population. Returns up to
+    `limit` matches with id, name, country, lat, lon, optionally within one country.
     Requires data/world_cities.json from OpenWeather bulk sample.
     """
-    global _CITIES_CACHE
     try:
-        if _CITIES_CACHE is None:
-            _CITIES_CACHE = _load_cities()
+        index = get_city_index()
     except FileNotFoundError as e:
         raise HTTPException(status_code=503, detail=str(e))
-
-    q_lower = q.lower()
-    results = []
-    for c in _CITIES_CACHE:
-        name = c.get("name", "")
-        if q_lower in name.lower():
-            coord = c.get("coord", {})
-            results.append({
-                "id": c.get("id"),
-                "name": name,
-                "country": c.get("country"),
-                "lat": coord.get("lat"),
-                "lon": coord.get("lon"),
-            })
-            if len(results) >= 10:
-                break
-    return results
+    with span("search"):
+        return index.search(q, limit=limit, country=country)
 
 
+@router.get("/nearest_city")
+def nearest_city(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(1, ge=1, le=50),
+):
+    """
+    Reverse-geocode coordinates to the k nearest known cities, closest first,
+    without calling OpenWeather.
+    """
+    try:
+        with span("nearest"):
+            return nearest_cities(lat, lon, k)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
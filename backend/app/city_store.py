@@ -0,0 +1,111 @@
+"""Compact columnar city store, memory-mapped by every worker.
+
+Layout: an 8-byte magic, a little-endian uint32 header length, a JSON header
+describing each section (offset, dtype, shape) and then the 8-byte aligned
+sections themselves. Arrays are read with ``np.frombuffer`` straight from the
+mapping, so workers share the page cache instead of each holding their own
+copy of the city list.
+
+Build it once after downloading ``world_cities.json``:
+
+    cd backend
+    python -m app.city_store
+"""
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from .city_index import CityIndex, StringTable
+
+MAGIC = b"LPCITY\x00\x01"
+VERSION = 1
+ALIGN = 8
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "data"))
+CITIES_JSON_PATH = os.path.join(DATA_DIR, "world_cities.json")
+CITIES_STORE_PATH = os.path.join(DATA_DIR, "world_cities.bin")
+
+_ARRAYS = ("ids", "coords", "population", "countries", "order", "gram_offsets", "gram_postings")
+_TABLES = ("names", "folded", "gram_keys")
+
+
+def _sections(index: CityIndex):
+    for name in _ARRAYS:
+        yield name, np.ascontiguousarray(getattr(index, name))
+    for name in _TABLES:
+        table = getattr(index, name)
+        yield f"{name}.offsets", np.ascontiguousarray(table.offsets)
+        yield f"{name}.blob", np.frombuffer(bytes(table.blob), dtype=np.uint8)
+
+
+def write_store(index: CityIndex, path: str):
+    """Serialize ``index`` to ``path`` (written to a temp file, then renamed)."""
+    sections = list(_sections(index))
+    meta = {}
+    offset = 0
+    for name, arr in sections:
+        meta[name] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        offset += -(-arr.nbytes // ALIGN) * ALIGN
+    header = json.dumps({"version": VERSION, "count": len(index), "sections": meta}).encode()
+    data_start = -(-(len(MAGIC) + 4 + len(header)) // ALIGN) * ALIGN
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for name, arr in sections:
+            f.seek(data_start + meta[name]["offset"])
+            f.write(arr.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+def open_store(path: str) -> CityIndex:
+    """Map ``path`` read-only and return a ``CityIndex`` backed by it."""
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a city store")
+    (header_len,) = struct.unpack_from("<I", mm, len(MAGIC))
+    header = json.loads(mm[len(MAGIC) + 4:len(MAGIC) + 4 + header_len])
+    if header.get("version") != VERSION:
+        raise ValueError(f"{path} has unsupported city store version {header.get('version')}")
+    data_start = -(-(len(MAGIC) + 4 + header_len) // ALIGN) * ALIGN
+
+    def section(name):
+        m = header["sections"][name]
+        dtype = np.dtype(m["dtype"])
+        count = int(np.prod(m["shape"], dtype=np.int64))
+        arr = np.frombuffer(mm, dtype=dtype, count=count, offset=data_start + m["offset"])
+        return arr.reshape(m["shape"])
+
+    fields = {name: section(name) for name in _ARRAYS}
+    for name in _TABLES:
+        blob = memoryview(mm)[data_start + header["sections"][f"{name}.blob"]["offset"]:]
+        blob = blob[:header["sections"][f"{name}.blob"]["shape"][0]]
+        fields[name] = StringTable(section(f"{name}.offsets"), blob)
+    return CityIndex(**fields)
+
+
+def build_store(src: str = CITIES_JSON_PATH, out: str = CITIES_STORE_PATH) -> CityIndex:
+    with open(src, encoding="utf-8") as f:
+        index = CityIndex.from_records(json.load(f))
+    write_store(index, out)
+    return index
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    p = argparse.ArgumentParser(description="Convert world_cities.json into the binary city store")
+    p.add_argument("--src", default=CITIES_JSON_PATH)
+    p.add_argument("--out", default=CITIES_STORE_PATH)
+    args = p.parse_args()
+    t0 = time.perf_counter()
+    index = build_store(args.src, args.out)
+    print(f"Wrote {len(index)} cities to {args.out} "
+          f"({os.path.getsize(args.out) / 1e6:.1f} MB) in {time.perf_counter() - t0:.1f}s")
@@ -8,6 +8,62 @@ class Settings(BaseSettings):
     OPENWEATHER_KEY: str
     DEFAULT_CITY: str = "London"
     RAIN_THRESHOLD_MM: float = 1.0
+    # OpenWeather refreshes the 5-day forecast every 3 hours
+    FORECAST_CACHE_TTL_S: float = 3 * 60 * 60
+    FORECAST_CACHE_MAX_ENTRIES: int = 1024
+    FORECAST_CACHE_COORD_PRECISION: int = 2
+    # Coordinates within this distance of a known city share that city's cache entry (0 disables)
+    FORECAST_SNAP_MAX_KM: float = 10.0
+    BATCH_MAX_LOCATIONS: int = 500
+    BATCH_FETCH_CONCURRENCY: int = 16
+    # Streamed batches run the models over whatever forecasts arrived together, at most this many at once
+    STREAM_GROUP_MAX: int = 64
+    # How often the model registry re-stats model files for hot reload
+    MODEL_CHECK_INTERVAL_S: float = 2.0
+    MODEL_WARMUP: bool = True
+    # Per-city models are loaded on demand and evicted least-recently-used beyond this many MB of model files
+    MODEL_CACHE_MAX_MB: float = 512.0
+    # Daily store read for the lag/rolling features a model's schema asks for (empty dir: data/daily)
+    DAILY_STORE_DIR: str = ""
+    # Concurrent /predict/lstm calls are stacked into one forward pass
+    LSTM_BATCH_MAX: int = 64
+    LSTM_BATCH_WAIT_MS: float = 2.0
+    # Append every upstream forecast payload to the raw archive (empty dir: data/forecast_archive)
+    FORECAST_ARCHIVE_ENABLED: bool = False
+    FORECAST_ARCHIVE_DIR: str = ""
+    # Segments not written to for this long are deleted when a new one is started; 0 keeps everything
+    FORECAST_ARCHIVE_MAX_AGE_DAYS: float = 0.0
+    # live: OpenWeather; record: OpenWeather + always archive; replay: archived payloads only (offline)
+    FORECAST_PROVIDER: str = "live"
+    FORECAST_REPLAY_LATENCY_MS: float = 0.0
+    FORECAST_REPLAY_JITTER_MS: float = 0.0
+    # "error": 404 for locations never recorded; "any": serve a recorded payload picked from the key
+    FORECAST_REPLAY_MISS: str = "error"
+    # Move replayed slots to start today so "tomorrow" features stay meaningful
+    FORECAST_REPLAY_SHIFT: bool = True
+    # Comma-separated cities whose predictions are precomputed in the background
+    HOT_CITIES: str = ""
+    SNAPSHOT_REFRESH_S: float = 15 * 60
+    SNAPSHOT_MAX_AGE_S: float = 3 * 60 * 60
+    # GET /api/debug/profile samples the live process for up to PROFILER_MAX_S seconds; off by default
+    PROFILER_ENABLED: bool = False
+    PROFILER_MAX_S: float = 60.0
+    # blocking: warm indexes and models before serving; background: serve at once and warm meanwhile
+    # (GET /ready is 503 until done); preload: warm at import, i.e. once in the gunicorn --preload parent
+    STARTUP_WARMUP: str = "blocking"
+    OPENWEATHER_BASE_URL: str = "http://api.openweathermap.org/data/2.5/forecast"
+    OPENWEATHER_TIMEOUT_S: float = 10.0
+    OPENWEATHER_CONNECT_TIMEOUT_S: float = 3.0
+    OPENWEATHER_MAX_CONNECTIONS: int = 100
+    OPENWEATHER_MAX_KEEPALIVE: int = 32
+    OPENWEATHER_MAX_CONCURRENCY: int = 32
+    OPENWEATHER_MAX_RETRIES: int = 3
+    OPENWEATHER_BACKOFF_BASE_S: float = 0.25
+    OPENWEATHER_BACKOFF_MAX_S: float = 4.0
+
+    @property
+    def hot_cities(self):
+        return [c.strip() for c in self.HOT_CITIES.split(",") if c.strip()]
 
     class Config:
         env_file = "../data_pipeline/.env"
@@ -0,0 +1,106 @@
+"""Best times to hang laundry outside over the whole forecast horizon.
+
+Every 3-hour slot of every forecast is scored in one pass over the
+``forecast_arrays`` columns: a slot with rain (or a gale) scores 0, otherwise
+warmth, dry air and a breeze each add to the score, and night slots count
+half. Runs of consecutive slots scoring at least ``min_score`` are drying
+windows; each forecast's windows are ranked by their summed score, so a
+long good window beats a short excellent one.
+"""
+import datetime
+
+import numpy as np
+
+from .forecast_features import _local_offsets, forecast_arrays
+
+SLOT_SECONDS = 3 * 3600
+# Any measurable rain in the slot means wet laundry
+SLOT_RAIN_MM = 0.1
+# Above this (m/s, a near gale) things get blown off the line
+MAX_WIND_MS = 13.9
+WEIGHTS = {"temp": 0.35, "humidity": 0.4, "wind_speed": 0.25}
+DAYLIGHT_HOURS = (7, 19)  # local [start, end)
+NIGHT_FACTOR = 0.5
+
+
+def slot_offsets(forecasts, arrays):
+    """UTC offset (s) per slot: the payload's ``city.timezone`` when it has one, else the server's."""
+    tz = np.array([(f.get("city") or {}).get("timezone", np.nan) for f in forecasts], dtype=float)
+    per_slot = tz[arrays["city"]] if len(tz) else np.zeros(0)
+    return np.where(np.isnan(per_slot), _local_offsets(arrays["dt"]), per_slot).astype(np.int64)
+
+
+def slot_scores(arrays, offsets, max_rain_mm=SLOT_RAIN_MM):
+    """Drying score in [0, 1] for every slot."""
+    temp = np.clip((arrays["temp"] - 5.0) / 20.0, 0.0, 1.0)  # 5 C -> 0, 25 C -> 1
+    humidity = np.clip((95.0 - arrays["humidity"]) / 55.0, 0.0, 1.0)  # 95 % -> 0, 40 % -> 1
+    wind = np.clip(arrays["wind_speed"] / 5.0, 0.0, 1.0)
+    score = WEIGHTS["temp"] * temp + WEIGHTS["humidity"] * humidity + WEIGHTS["wind_speed"] * wind
+    hour = (arrays["dt"] + offsets) % 86400 // 3600
+    score = np.where((hour >= DAYLIGHT_HOURS[0]) & (hour < DAYLIGHT_HOURS[1]), score, score * NIGHT_FACTOR)
+    usable = (arrays["rain_3h"] <= max_rain_mm) & (arrays["wind_speed"] <= MAX_WIND_MS)
+    return np.where(usable, score, 0.0)
+
+
+def _isoformat(ts, offset):
+    tz = datetime.timezone(datetime.timedelta(seconds=int(offset)))
+    return datetime.datetime.fromtimestamp(int(ts), tz).isoformat()
+
+
+def drying_windows(forecasts, min_hours=6.0, min_score=0.5, top=5, max_rain_mm=SLOT_RAIN_MM, slots=False):
+    """Ranked drying windows for each forecast payload, in input order.
+
+    Returns one dict per forecast with ``windows`` (best first, at most
+    ``top``) and, with ``slots``, every slot's time and score.
+    """
+    if isinstance(forecasts, dict):
+        forecasts = [forecasts]
+    arrays = forecast_arrays(forecasts)
+    order = np.lexsort((arrays["dt"], arrays["city"]))
+    arrays = {k: v[order] if isinstance(v, np.ndarray) else v for k, v in arrays.items()}
+    offsets = slot_offsets(forecasts, arrays)
+    score = slot_scores(arrays, offsets, max_rain_mm)
+    city, dt = arrays["city"], arrays["dt"]
+
+    # A window starts at a good slot whose predecessor is not a good slot of the same forecast 3 h earlier
+    good = score >= min_score
+    joined = np.zeros(len(dt), dtype=bool)
+    joined[1:] = (city[1:] == city[:-1]) & (dt[1:] - dt[:-1] == SLOT_SECONDS) & good[:-1]
+    starts = np.flatnonzero(good & ~joined)
+    run = np.cumsum(good & ~joined) - 1
+    members = np.flatnonzero(good)
+    n_runs = len(starts)
+
+    def total(values):
+        return np.bincount(run[members], weights=values[members], minlength=n_runs)
+
+    count = np.bincount(run[members], minlength=n_runs)
+    score_sum = total(score)
+    keep = np.flatnonzero(count * SLOT_SECONDS >= min_hours * 3600)
+    ranked = keep[np.lexsort((dt[starts[keep]], -score_sum[keep], city[starts[keep]]))]
+    # Position of each window within its forecast, to cut at ``top``
+    run_city = city[starts[ranked]]
+    first = np.searchsorted(run_city, run_city, side="left")
+    ranked = ranked[np.arange(len(ranked)) - first < top]
+
+    means = {k: total(arrays[k]) / np.maximum(count, 1) for k in ("temp", "humidity", "wind_speed")}
+    rain = total(arrays["rain_3h"])
+    out = [{"windows": []} for _ in forecasts]
+    for r in ranked:
+        i = starts[r]
+        n = int(count[r])
+        out[city[i]]["windows"].append({
+            "start": _isoformat(dt[i], offsets[i]),
+            "end": _isoformat(dt[i] + n * SLOT_SECONDS, offsets[i]),
+            "hours": n * SLOT_SECONDS // 3600,
+            "score": round(float(score_sum[r] / n), 3),
+            "rain_mm": float(rain[r]),
+            "temp_mean": round(float(means["temp"][r]), 1),
+            "humidity_mean": round(float(means["humidity"][r]), 1),
+            "wind_speed_mean": round(float(means["wind_speed"][r]), 1),
+        })
+    if slots:
+        for c, entry in enumerate(out):
+            idx = np.flatnonzero(city == c)
+            entry["slots"] = [{"time": _isoformat(dt[i], offsets[i]), "score": round(float(score[i]), 3)} for i in idx]
+    return out
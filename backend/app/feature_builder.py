@@ -0,0 +1,219 @@
+"""Daily rain model features, shared by training, the backtest and the API.
+
+``build_features`` takes a long-format frame (``city``, ``date``,
+``rain_mm``, ``temp``, ``humidity``, ``wind_speed``; one row per city and
+day) and adds, for every row at once:
+
+- ``rain_lag_k``: rain ``k`` calendar days earlier (missing days give NaN),
+- ``rain_mean_Nd`` / ``rain_max_Nd``: rain over the ``N`` days before the row,
+- ``dayofyear`` and, with ``seasonal``, ``doy_sin`` / ``doy_cos``.
+
+Which features a model uses, and in what order, is its schema: a JSON file
+saved next to the artifact (``xgb_model.joblib`` -> ``xgb_model.schema.json``).
+The API builds serving rows from the schema with this same code and refuses
+a model whose fitted feature names disagree with it. Models without a schema
+file are the original five-feature ones (``LEGACY_SCHEMA``).
+"""
+import datetime
+import functools
+import json
+import os
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_VERSION = 1
+TARGET = "rain_mm"
+WEATHER_FEATURES = ("temp", "humidity", "wind_speed")
+DEFAULT_LAGS = (1, 2, 3, 7)
+DEFAULT_WINDOWS = (3, 7, 14)
+ONE_DAY = np.timedelta64(1, "D")
+
+
+def feature_names(lags=DEFAULT_LAGS, windows=DEFAULT_WINDOWS, seasonal=True):
+    names = list(WEATHER_FEATURES) + [f"rain_lag_{k}" for k in lags]
+    for n in windows:
+        names += [f"rain_mean_{n}d", f"rain_max_{n}d"]
+    return names + ["dayofyear"] + (["doy_sin", "doy_cos"] if seasonal else [])
+
+
+def make_schema(lags=DEFAULT_LAGS, windows=DEFAULT_WINDOWS, seasonal=True, **extra):
+    """Schema dict; ``extra`` (e.g. what it was trained on) is stored alongside."""
+    lags, windows = sorted(set(lags)), sorted(set(windows))
+    return {"version": SCHEMA_VERSION, "target": TARGET, "horizon_days": 1, "lags": lags, "windows": windows,
+            "seasonal": seasonal, "features": feature_names(lags, windows, seasonal), **extra}
+
+
+# What training/features.py produced before schemas existed: [temp, humidity, wind_speed, rain_lag_1, dayofyear]
+LEGACY_SCHEMA = make_schema(lags=(1,), windows=(), seasonal=False)
+
+
+def lookback_days(schema):
+    """Days of history before the target day that the schema's features read."""
+    return max(list(schema["lags"]) + list(schema["windows"]) or [0])
+
+
+def build_features(daily, schema=None):
+    """Feature frame (``city``, ``date``, target, then ``schema["features"]``) for a long-format daily frame.
+
+    Rows are sorted by (city, date) and kept even when a lag is missing, so
+    callers choose what to drop. A frame without a ``city`` column is one city.
+    """
+    schema = schema or make_schema()
+    df = daily.assign(date=pd.to_datetime(daily["date"]).dt.normalize())
+    if "city" not in df.columns:
+        df["city"] = ""
+    df = df.drop_duplicates(["city", "date"], keep="last").sort_values(["city", "date"], kind="stable")
+    df = df.reset_index(drop=True)
+    for col in WEATHER_FEATURES:
+        if col not in df.columns:
+            df[col] = np.nan
+
+    # (city, day) packed into one int64 so every lag is a single hash lookup over all rows
+    codes = pd.factorize(df["city"])[0].astype(np.int64)
+    day = df["date"].to_numpy("datetime64[D]").astype(np.int64)
+    span = int(day.max() - day.min()) + max(schema["lags"] or [0]) + 1 if len(df) else 1
+    key = codes * span + (day - (day.min() if len(df) else 0))
+    index = pd.Index(key)
+    rain = df[TARGET].to_numpy(dtype=float)
+    out = {}
+    for k in schema["lags"]:
+        pos = index.get_indexer(key - k)
+        out[f"rain_lag_{k}"] = np.where(pos >= 0, rain[np.maximum(pos, 0)], np.nan)
+    if schema["windows"]:
+        by_city = df[["city", "date", TARGET]].groupby("city", sort=False)
+        for n in schema["windows"]:
+            # closed="left": the N calendar days before the row, never the row itself
+            rolled = by_city.rolling(f"{n}D", on="date", closed="left")[TARGET]
+            out[f"rain_mean_{n}d"] = rolled.mean().to_numpy()
+            out[f"rain_max_{n}d"] = rolled.max().to_numpy()
+    doy = df["date"].dt.dayofyear.to_numpy(dtype=float)
+    out["dayofyear"] = doy
+    if schema["seasonal"]:
+        angle = 2 * np.pi * doy / 365.25
+        out["doy_sin"] = np.sin(angle)
+        out["doy_cos"] = np.cos(angle)
+    df = pd.concat([df, pd.DataFrame(out, index=df.index)], axis=1)
+    return df[["city", "date", TARGET] + list(schema["features"])]
+
+
+def time_split(frame, test_size=0.2):
+    """Split at a date so every test row is later than every train row, across all cities."""
+    dates = np.sort(frame["date"].unique())
+    cutoff = dates[min(int(len(dates) * (1 - test_size)), len(dates) - 1)]
+    return frame[frame["date"] < cutoff], frame[frame["date"] >= cutoff]
+
+
+def time_folds(frame, n_splits=5, gap_days=0):
+    """Expanding-window CV folds over calendar dates: yields positional ``(train_idx, test_idx)``.
+
+    Like ``TimeSeriesSplit`` but on dates, so with many cities a day never
+    sits in both train and test; ``gap_days`` leaves days out between them.
+    """
+    dates = frame["date"].to_numpy("datetime64[D]")
+    unique = np.unique(dates)
+    bounds = np.linspace(0, len(unique), n_splits + 2).astype(int)[1:]
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        test_start, test_end = unique[start], unique[stop - 1]
+        train_idx = np.flatnonzero(dates < test_start - gap_days * ONE_DAY)
+        test_idx = np.flatnonzero((dates >= test_start) & (dates <= test_end))
+        if len(train_idx) and len(test_idx):
+            yield train_idx, test_idx
+
+
+def schema_path(model_path):
+    return os.path.splitext(model_path)[0] + ".schema.json"
+
+
+def save_schema(schema, model_path):
+    """Write the schema next to ``model_path``; do this before saving the model so reloads see both."""
+    path = schema_path(model_path)
+    with open(path + ".tmp", "w") as f:
+        json.dump(schema, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_schema(model_path):
+    """The model's schema, ``LEGACY_SCHEMA`` if it has no schema file."""
+    path = schema_path(model_path)
+    if not os.path.exists(path):
+        return LEGACY_SCHEMA
+    with open(path) as f:
+        schema = json.load(f)
+    if schema.get("version") != SCHEMA_VERSION:
+        raise ValueError(f"{path}: schema version {schema.get('version')} is not {SCHEMA_VERSION}")
+    if schema["features"] != feature_names(schema["lags"], schema["windows"], schema["seasonal"]):
+        raise ValueError(f"{path}: feature list does not match its lags/windows/seasonal settings")
+    return schema
+
+
+def check_model(schema, model):
+    """Raise ValueError if ``model`` was fitted on different features than ``schema`` lists."""
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None and [str(n) for n in names] != list(schema["features"]):
+        raise ValueError(f"model was fitted on {[str(n) for n in names]} but its schema lists {schema['features']}")
+    n = getattr(model, "n_features_in_", None)
+    if n is not None and n != len(schema["features"]):
+        raise ValueError(f"model expects {n} features but its schema lists {len(schema['features'])}")
+
+
+@functools.lru_cache(maxsize=4096)
+def _read_partition(path, mtime_ns):
+    # Keyed by mtime so an upserted month is read again
+    return pd.read_parquet(path, columns=["date", TARGET])
+
+
+def read_history(cities, start, end, store_dir):
+    """Observed daily rain between ``start`` and ``end`` from the daily store, long format.
+
+    ``city`` in the result is the position in ``cities``; names the store
+    does not have simply contribute no rows.
+    """
+    months = pd.period_range(start, end, freq="M").strftime("%Y-%m")
+    frames = []
+    for i, city in enumerate(cities):
+        if not city:
+            continue
+        city_dir = os.path.join(store_dir, "city=" + urllib.parse.quote(city, safe=""))
+        for month in months:
+            path = os.path.join(city_dir, f"month={month}", "part.parquet")
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            frames.append(_read_partition(path, mtime).assign(city=i))
+    if not frames:
+        return pd.DataFrame({"city": [], "date": pd.to_datetime([]), TARGET: []})
+    df = pd.concat(frames, ignore_index=True)
+    df["date"] = pd.to_datetime(df["date"])
+    return df[(df["date"] >= pd.Timestamp(start)) & (df["date"] <= pd.Timestamp(end))]
+
+
+def serving_matrix(schema, rows, cities=(), store_dir=None, today=None):
+    """Feature rows for tomorrow in schema order, one per forecast.
+
+    ``rows`` is the ``tomorrow_features`` matrix (tomorrow's weather, today's
+    forecast rain, day of year). Earlier days come from the daily store for
+    the matching name in ``cities``; without them history features are NaN,
+    which the tree models route like any missing value.
+    """
+    today = pd.Timestamp(today or datetime.date.today())
+    tomorrow = today + pd.Timedelta(days=1)
+    n = len(rows)
+    idx = np.arange(n)
+    parts = [
+        pd.DataFrame({"city": idx, "date": today, TARGET: rows[:, 3]}),
+        pd.DataFrame({"city": idx, "date": tomorrow, TARGET: np.nan, "temp": rows[:, 0], "humidity": rows[:, 1],
+                      "wind_speed": rows[:, 2]}),
+    ]
+    back = lookback_days(schema)
+    if store_dir and back > 1 and len(cities):
+        history = read_history(cities, today - pd.Timedelta(days=back), today - pd.Timedelta(days=1), store_dir)
+        parts.insert(0, history)
+    frame = build_features(pd.concat(parts, ignore_index=True), schema)
+    frame = frame[frame["date"] == tomorrow].sort_values("city")
+    if len(frame) != n:
+        raise ValueError(f"built {len(frame)} feature rows for {n} forecasts")
+    return frame[list(schema["features"])].to_numpy(dtype=float)
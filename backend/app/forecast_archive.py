@@ -0,0 +1,297 @@
+"""Append-only archive of raw OpenWeather forecast payloads.
+
+Every fetched payload is stored as its own gzip member appended to a segment
+file, so a segment is a valid ``.gz`` (``zcat`` prints JSON lines) and a single record
+can be read by seeking to its offset and inflating just that member. A
+SQLite index maps (city, issue time) to (segment, offset, length).
+
+``issued_at`` is the time the payload was fetched: OpenWeather does not
+report when a forecast was computed, and it refreshes them every 3 hours.
+
+Each writer process appends to its own segments (pid in the name), so the
+API workers and the data pipeline can write concurrently; SQLite serializes
+the index inserts. With ``max_age_s``, each time a writer starts a segment
+it deletes the segments nobody has written to for that long, with their
+index rows.
+"""
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "..", "data"))
+ARCHIVE_DIR = os.path.join(DATA_DIR, "forecast_archive")
+INDEX_FILE = "index.sqlite"
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    city TEXT,
+    city_id INTEGER,
+    query_key TEXT,
+    issued_at REAL NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_city_time ON records (city, issued_at);
+CREATE INDEX IF NOT EXISTS records_city_id_time ON records (city_id, issued_at);
+CREATE INDEX IF NOT EXISTS records_query_time ON records (query_key, issued_at);
+CREATE INDEX IF NOT EXISTS records_time ON records (issued_at);
+"""
+
+
+def city_key(name):
+    """Case- and whitespace-folded city name used as the archive key."""
+    return " ".join(name.lower().split()) if name else None
+
+
+class ForecastArchive:
+    def __init__(self, root: str = ARCHIVE_DIR, segment_max_bytes: int = SEGMENT_MAX_BYTES, compresslevel: int = 6,
+                 max_age_s: float = None):
+        self.root = root
+        self.segment_max_bytes = segment_max_bytes
+        self.max_age_s = max_age_s
+        self.compresslevel = compresslevel
+        self._lock = threading.Lock()
+        self._db = None
+        self._segment = None  # (name, file) this process appends to
+        self._seq = 0
+        self.appended = 0
+
+    def _connect(self):
+        os.makedirs(self.root, exist_ok=True)
+        db = sqlite3.connect(os.path.join(self.root, INDEX_FILE), timeout=30, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        # Index rows lost in a power cut are recoverable with reindex(); skip the per-commit fsync
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_SCHEMA)
+        return db
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = self._connect()
+        return self._db
+
+    def _segment_for(self, size):
+        if self._segment is not None and self._segment[1].tell() + size > self.segment_max_bytes:
+            self._segment[1].close()
+            self._segment = None
+        if self._segment is None:
+            if self.max_age_s:
+                self._prune(time.time() - self.max_age_s)
+            self._seq += 1
+            name = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{self._seq:04d}.gz"
+            self._segment = (name, open(os.path.join(self.root, name), "ab"))
+        return self._segment
+
+    def _prune(self, before):
+        # By last write, not issued_at: backfilled or replayed payloads carry old issue times
+        current = self._segment[0] if self._segment is not None else None
+        removed = 0
+        for name in sorted(n for n in os.listdir(self.root) if n.endswith(".gz")):
+            path = os.path.join(self.root, name)
+            try:
+                if name == current or os.path.getmtime(path) >= before:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue  # another writer pruned it first
+            self.db.execute("DELETE FROM records WHERE segment = ?", (name,))
+            removed += 1
+        self.db.commit()
+        return removed
+
+    def prune(self, max_age_s: float) -> int:
+        """Delete segments not written to in ``max_age_s`` seconds and their records; returns how many."""
+        with self._lock:
+            return self._prune(time.time() - max_age_s)
+
+    def append(self, payload: dict, query_key: str = None, issued_at: float = None) -> int:
+        """Compress ``payload`` into the current segment and index it; returns the record id."""
+        issued_at = time.time() if issued_at is None else issued_at
+        meta = payload.get("city") or {}
+        record = {"issued_at": issued_at, "query_key": query_key, "payload": payload}
+        member = gzip.compress((json.dumps(record, separators=(",", ":")) + "\n").encode(), self.compresslevel, mtime=0)
+        with self._lock:
+            db = self.db
+            name, f = self._segment_for(len(member))
+            offset = f.tell()
+            f.write(member)
+            f.flush()
+            cur = db.execute(
+                "INSERT INTO records (city, city_id, query_key, issued_at, segment, offset, length) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (city_key(meta.get("name")), meta.get("id"), query_key, issued_at, name, offset, len(member)),
+            )
+            db.commit()
+            self.appended += 1
+            return cur.lastrowid
+
+    @staticmethod
+    def _select(city, city_id, query_key, start, end, limit, newest_first=False):
+        where, args = [], []
+        for col, value in (("city", city_key(city)), ("city_id", city_id), ("query_key", query_key)):
+            if value is not None:
+                where.append(f"{col} = ?")
+                args.append(value)
+        if start is not None:
+            where.append("issued_at >= ?")
+            args.append(start)
+        if end is not None:
+            where.append("issued_at <= ?")
+            args.append(end)
+        sql = "SELECT id, city, city_id, query_key, issued_at, segment, offset, length FROM records"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY issued_at DESC, id DESC" if newest_first else " ORDER BY issued_at, id"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return sql, args
+
+    def query(self, city: str = None, city_id: int = None, query_key: str = None, start: float = None,
+              end: float = None, limit: int = None):
+        """Index rows ``(id, city, city_id, query_key, issued_at, segment, offset, length)`` in time order."""
+        sql, args = self._select(city, city_id, query_key, start, end, limit)
+        with self._lock:
+            return self.db.execute(sql, args).fetchall()
+
+    def iter_records(self, city: str = None, city_id: int = None, query_key: str = None, start: float = None,
+                     end: float = None, limit: int = None):
+        """Yield archived records (``issued_at``, ``query_key``, ``payload``) one at a time.
+
+        Index rows come from a cursor on a private connection and only the
+        indexed member is read and inflated for each record, with at most one
+        segment file open, so memory stays flat however large the range is.
+        """
+        handle = None
+        db = self._connect()
+        try:
+            for row in db.execute(*self._select(city, city_id, query_key, start, end, limit)):
+                segment, offset, length = row[5], row[6], row[7]
+                if handle is None or handle[0] != segment:
+                    if handle is not None:
+                        handle[1].close()
+                    handle = (segment, open(os.path.join(self.root, segment), "rb"))
+                handle[1].seek(offset)
+                record = json.loads(gzip.decompress(handle[1].read(length)))
+                record["id"] = row[0]
+                yield record
+        finally:
+            db.close()
+            if handle is not None:
+                handle[1].close()
+
+    def latest(self, city: str = None, city_id: int = None, query_key: str = None, before: float = None):
+        """Most recent record issued at or before ``before`` (default: any time), or None."""
+        sql, args = self._select(city, city_id, query_key, None, before, 1, newest_first=True)
+        with self._lock:
+            row = self.db.execute(sql, args).fetchone()
+        return self.read(row) if row else None
+
+    def read(self, row):
+        """Inflate the single record an index row points to."""
+        with open(os.path.join(self.root, row[5]), "rb") as f:
+            f.seek(row[6])
+            record = json.loads(gzip.decompress(f.read(row[7])))
+        record["id"] = row[0]
+        return record
+
+    def stats(self):
+        with self._lock:
+            count, first, last = self.db.execute("SELECT COUNT(*), MIN(issued_at), MAX(issued_at) FROM records").fetchone()
+        segments = [n for n in os.listdir(self.root) if n.endswith(".gz")] if os.path.isdir(self.root) else []
+        size = sum(os.path.getsize(os.path.join(self.root, n)) for n in segments)
+        return {"records": count, "first_issued_at": first, "last_issued_at": last, "segments": len(segments),
+                "bytes": size, "appended_by_this_process": self.appended}
+
+    def reindex(self):
+        """Rebuild the index by scanning every segment member by member.
+
+        Recovers records whose index insert was lost (e.g. a crash between the
+        segment write and the commit). Returns the number of records indexed.
+        """
+        with self._lock:
+            db = self.db
+            db.execute("DELETE FROM records")
+            count = 0
+            for name in sorted(n for n in os.listdir(self.root) if n.endswith(".gz")):
+                for offset, length, record in _scan_segment(os.path.join(self.root, name)):
+                    meta = record["payload"].get("city") or {}
+                    db.execute(
+                        "INSERT INTO records (city, city_id, query_key, issued_at, segment, offset, length) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (city_key(meta.get("name")), meta.get("id"), record.get("query_key"), record["issued_at"],
+                         name, offset, length),
+                    )
+                    count += 1
+            db.commit()
+            return count
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment[1].close()
+                self._segment = None
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def _scan_segment(path, chunk_size=1 << 16):
+    """Yield ``(offset, length, record)`` for each complete gzip member of a segment.
+
+    A torn member at the end (interrupted write) is skipped.
+    """
+    with open(path, "rb") as f:
+        start = pos = 0  # offset of the current member / of the next byte fed to the decompressor
+        d = zlib.decompressobj(wbits=31)
+        parts = []
+        pending = b""
+        while True:
+            data = pending or f.read(chunk_size)
+            pending = b""
+            if not data:
+                return
+            try:
+                parts.append(d.decompress(data))
+            except zlib.error:
+                return  # corrupt tail; everything before it was yielded
+            if not d.eof:
+                pos += len(data)
+                continue
+            end = pos + len(data) - len(d.unused_data)
+            yield start, end - start, json.loads(b"".join(parts))
+            pending = d.unused_data
+            start = pos = end
+            d = zlib.decompressobj(wbits=31)
+            parts = []
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Inspect, re-index or prune the forecast archive")
+    p.add_argument("command", choices=("stats", "reindex", "dump", "prune"))
+    p.add_argument("--root", default=ARCHIVE_DIR)
+    p.add_argument("--city", default=None)
+    p.add_argument("--start", type=float, default=None, help="unix time")
+    p.add_argument("--end", type=float, default=None, help="unix time")
+    p.add_argument("--max-age-days", type=float, default=None, help="prune: segments older than this")
+    args = p.parse_args()
+    archive = ForecastArchive(args.root)
+    if args.command == "stats":
+        print(json.dumps(archive.stats(), indent=2))
+    elif args.command == "reindex":
+        print(f"Indexed {archive.reindex()} records")
+    elif args.command == "prune":
+        if args.max_age_days is None:
+            p.error("prune needs --max-age-days")
+        print(f"Removed {archive.prune(args.max_age_days * 86400)} segments")
+    else:
+        for rec in archive.iter_records(city=args.city, start=args.start, end=args.end):
+            print(json.dumps(rec))
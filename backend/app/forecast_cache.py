@@ -0,0 +1,139 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from .city_search import geo_index_ready, nearest_cities
+from .config import settings
+from .forecast_provider import forecast_provider
+
+
+def cache_key(city: str = None, lat: float = None, lon: float = None, precision: int = None, city_id: int = None):
+    """Normalize a location into a cache key.
+
+    City names are case- and whitespace-folded; coordinates are either snapped
+    to a known city id or rounded so that nearby GPS fixes share an entry.
+    """
+    if city_id is not None:
+        return f"id:{city_id}"
+    if city:
+        return "city:" + " ".join(city.lower().split())
+    if precision is None:
+        precision = settings.FORECAST_CACHE_COORD_PRECISION
+    return f"coord:{round(float(lat), precision):.{precision}f},{round(float(lon), precision):.{precision}f}"
+
+
+def _retrieve(task):
+    # Mark the outcome as retrieved so a failed fetch nobody awaits any more does not log a warning.
+    if not task.cancelled():
+        task.exception()
+
+
+class ForecastCache:
+    """In-process TTL + LRU cache for forecast payloads.
+
+    Concurrent misses for the same key are coalesced so only one upstream
+    request is made; the other callers await its result.
+    """
+
+    def __init__(self, ttl_s: float, max_entries: int):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, payload)
+        self._inflight = {}  # key -> asyncio.Future
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    def put(self, key, payload):
+        self._entries[key] = (time.monotonic() + self.ttl_s, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(self, key, fetch):
+        """Return the cached payload for ``key`` or await ``fetch()`` to fill it."""
+        payload = self.get(key)
+        if payload is not None:
+            self.hits += 1
+            return payload
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # The fetch runs in its own task, so a caller that is cancelled (a
+            # closed stream, an aborted request) does not cancel it for the others.
+            pending = asyncio.ensure_future(self._fill(key, fetch))
+            pending.add_done_callback(_retrieve)
+            self._inflight[key] = pending
+        return await asyncio.shield(pending)
+
+    async def _fill(self, key, fetch):
+        try:
+            payload = await fetch()
+            self.put(key, payload)
+            return payload
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "inflight": len(self._inflight),
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+forecast_cache = ForecastCache(settings.FORECAST_CACHE_TTL_S, settings.FORECAST_CACHE_MAX_ENTRIES)
+
+
+def snap_to_city(lat: float, lon: float):
+    """Return the id of the known city within FORECAST_SNAP_MAX_KM of (lat, lon), if any.
+
+    Runs on the event loop, so until warm-up has built the city indexes the
+    coordinates are used as they are rather than building them here.
+    """
+    if not settings.FORECAST_SNAP_MAX_KM or not geo_index_ready():
+        return None
+    try:
+        nearest = nearest_cities(lat, lon, 1, max_km=settings.FORECAST_SNAP_MAX_KM)
+    except FileNotFoundError:
+        return None
+    return nearest[0]["id"] if nearest else None
+
+
+async def get_forecast(city: str = None, lat: float = None, lon: float = None):
+    """Cached, single-flight wrapper around the forecast provider (live, record or replay).
+
+    Coordinate lookups near a known city are fetched and cached under that
+    city's id so every GPS fix around it shares one entry.
+    """
+    city_id = None if city or lat is None or lon is None else snap_to_city(lat, lon)
+    key = cache_key(city, lat, lon, city_id=city_id)
+    return await forecast_cache.get_or_fetch(
+        key, lambda: forecast_provider.fetch(city, lat, lon, city_id=city_id, key=key)
+    )
@@ -0,0 +1,109 @@
+import datetime
+import time
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+# today .. today+5 covers the whole 5-day / 3-hour OpenWeather horizon
+HORIZON_DAYS = 6
+
+# Model input order used in training: [temp, humidity, wind_speed, rain_lag_1, dayofyear]
+XGB_FEATURES = ("temp_mean_tomorrow", "humidity_mean_tomorrow", "wind_speed_mean_tomorrow",
+                "rain_lag_1", "dayofyear_tomorrow")
+
+
+def forecast_arrays(forecasts):
+    """Flatten one or many forecast payloads into column arrays in a single pass.
+
+    Returns a dict of equal-length arrays: ``city`` (index of the payload the
+    slot came from), ``dt``, ``temp``, ``humidity``, ``wind_speed`` and
+    ``rain_3h``. Missing readings become 0.0, as in the original loops.
+    """
+    if isinstance(forecasts, dict):
+        forecasts = [forecasts]
+    rows = [
+        (c, item["dt"],
+         (item.get("main") or {}).get("temp") or 0.0,
+         (item.get("main") or {}).get("humidity") or 0.0,
+         (item.get("wind") or {}).get("speed") or 0.0,
+         (item.get("rain") or {}).get("3h", 0.0) or 0.0)
+        for c, f in enumerate(forecasts) for item in f.get("list", [])
+    ]
+    cols = np.array(rows, dtype=float).reshape(-1, 6)
+    return {
+        "city": cols[:, 0].astype(np.int64),
+        "dt": cols[:, 1].astype(np.int64),
+        "temp": cols[:, 2],
+        "humidity": cols[:, 3],
+        "wind_speed": cols[:, 4],
+        "rain_3h": cols[:, 5],
+        "n_cities": len(forecasts),
+    }
+
+
+def _local_offsets(dt):
+    """Server-local UTC offset in seconds for each timestamp (what fromtimestamp uses)."""
+    if not len(dt):
+        return np.zeros(0, dtype=np.int64)
+    first, last = time.localtime(int(dt.min())).tm_gmtoff, time.localtime(int(dt.max())).tm_gmtoff
+    if first == last:
+        return np.full(len(dt), first, dtype=np.int64)
+    # Horizon crosses a DST change; resolve per slot
+    return np.array([time.localtime(int(t)).tm_gmtoff for t in dt], dtype=np.int64)
+
+
+def daily_aggregates(arrays, tz_offset_hours=0, today=None):
+    """Group slots by local calendar day relative to ``today`` with bincount.
+
+    Returns ``(n_cities, HORIZON_DAYS)`` arrays ``rain_sum``, ``temp_mean``,
+    ``humidity_mean``, ``wind_speed_mean`` and ``count``; column 0 is today,
+    column 1 tomorrow. Days without slots have mean 0.0.
+    """
+    today = today or datetime.date.today()
+    n_cities = arrays["n_cities"]
+    local = arrays["dt"] + _local_offsets(arrays["dt"]) + int(tz_offset_hours * 3600)
+    day = local // SECONDS_PER_DAY + EPOCH_ORDINAL - today.toordinal()
+    keep = (day >= 0) & (day < HORIZON_DAYS)
+    group = arrays["city"][keep] * HORIZON_DAYS + day[keep]
+    size = n_cities * HORIZON_DAYS
+
+    def total(col):
+        return np.bincount(group, weights=arrays[col][keep], minlength=size).reshape(n_cities, HORIZON_DAYS)
+
+    count = np.bincount(group, minlength=size).reshape(n_cities, HORIZON_DAYS)
+    safe = np.maximum(count, 1)
+    return {
+        "rain_sum": total("rain_3h"),
+        "temp_mean": total("temp") / safe,
+        "humidity_mean": total("humidity") / safe,
+        "wind_speed_mean": total("wind_speed") / safe,
+        "count": count,
+    }
+
+
+def tomorrow_features(forecasts, tz_offset_hours=0, today=None):
+    """Model features for tomorrow for a stack of forecasts.
+
+    Returns ``(X, rain_tomorrow)`` where ``X`` has one row per forecast in
+    ``XGB_FEATURES`` order and ``rain_tomorrow`` is the forecast rain total
+    used by the rule.
+    """
+    today = today or datetime.date.today()
+    agg = daily_aggregates(forecast_arrays(forecasts), tz_offset_hours, today)
+    tomorrow = today + datetime.timedelta(days=1)
+    n = agg["count"].shape[0]
+    X = np.column_stack([
+        agg["temp_mean"][:, 1],
+        agg["humidity_mean"][:, 1],
+        agg["wind_speed_mean"][:, 1],
+        agg["rain_sum"][:, 0],
+        np.full(n, float(tomorrow.timetuple().tm_yday)),
+    ])
+    return X, agg["rain_sum"][:, 1]
+
+
+def tomorrow_rain(forecast_json, tz_offset_hours=0, today=None) -> float:
+    """Total forecast rain (mm) for tomorrow's local date."""
+    arrays = forecast_arrays(forecast_json)
+    return float(daily_aggregates(arrays, tz_offset_hours, today)["rain_sum"][0, 1])
@@ -0,0 +1,199 @@
+import asyncio
+import datetime
+import logging
+import random
+import time
+import zlib
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from .config import settings
+from .forecast_archive import ARCHIVE_DIR, ForecastArchive, city_key
+from .weather_client import weather_client
+
+logger = logging.getLogger(__name__)
+
+MODES = ("live", "record", "replay")
+SECONDS_PER_DAY = 86400
+
+
+def shift_to_today(payload, today=None):
+    """Copy of ``payload`` with every slot moved by whole days so the first slot falls on ``today``.
+
+    Keeps the time of day, so a recorded forecast replays as "today and the
+    next days" whenever it is served.
+    """
+    items = payload.get("list") or []
+    if not items:
+        return payload
+    today = today or datetime.date.today()
+    first = datetime.date.fromtimestamp(items[0]["dt"])
+    shift = (today - first).days * SECONDS_PER_DAY
+    if not shift:
+        return payload
+    return {**payload, "list": [{**item, "dt": item["dt"] + shift} for item in items]}
+
+
+class ForecastProvider:
+    """Where forecast payloads come from.
+
+    ``live`` calls OpenWeather (and archives the payload if an archive is
+    configured), ``record`` does the same but always archives, and
+    ``replay`` serves archived payloads only, never touching the network,
+    after an optional synthetic latency.
+
+    Replay looks a request up by its cache key, then by city name or city id.
+    With ``replay_miss="any"`` an unknown location gets a recorded payload
+    picked deterministically from its key, so load tests can use any input.
+    """
+
+    def __init__(self, mode="live", client=weather_client, archive=None, replay_latency_s=0.0,
+                 replay_jitter_s=0.0, replay_miss="error", replay_shift=True):
+        if mode not in MODES:
+            raise ValueError(f"FORECAST_PROVIDER must be one of {', '.join(MODES)}, not {mode!r}")
+        if mode != "live" and archive is None:
+            raise ValueError(f"FORECAST_PROVIDER={mode} needs the forecast archive")
+        self.mode = mode
+        self.client = client
+        self.archive = archive
+        self.replay_latency_s = replay_latency_s
+        self.replay_jitter_s = replay_jitter_s
+        self.replay_miss = replay_miss
+        self.replay_shift = replay_shift
+        self._replayed = {}  # lookup -> recorded payload
+        self._all_rows = None
+        self.upstream = 0
+        self.recorded = 0
+        self.replayed = 0
+        self.replay_misses = 0
+
+    @classmethod
+    def from_settings(cls):
+        mode = settings.FORECAST_PROVIDER
+        archive = None
+        if settings.FORECAST_ARCHIVE_ENABLED or mode != "live":
+            archive = ForecastArchive(settings.FORECAST_ARCHIVE_DIR or ARCHIVE_DIR,
+                                      max_age_s=settings.FORECAST_ARCHIVE_MAX_AGE_DAYS * 86400 or None)
+        return cls(
+            mode=mode,
+            archive=archive,
+            replay_latency_s=settings.FORECAST_REPLAY_LATENCY_MS / 1000,
+            replay_jitter_s=settings.FORECAST_REPLAY_JITTER_MS / 1000,
+            replay_miss=settings.FORECAST_REPLAY_MISS,
+            replay_shift=settings.FORECAST_REPLAY_SHIFT,
+        )
+
+    def _record(self, payload, key):
+        if self.archive is None:
+            return
+        try:
+            self.archive.append(payload, key)
+            self.recorded += 1
+        except Exception:
+            # Losing an archive record must not fail the request
+            if self.mode == "record":
+                raise
+            logger.exception("could not archive forecast for %s", key)
+
+    @staticmethod
+    def _lookup_key(city, city_id, key):
+        return key or (f"id:{city_id}" if city_id is not None else f"city:{city_key(city)}")
+
+    def _lookup(self, city, city_id, key):
+        """Recorded payload for a request (blocking: reads the archive on first use)."""
+        lookup = self._lookup_key(city, city_id, key)
+        payload = self._replayed.get(lookup)
+        if payload is not None:
+            return payload
+        record = None
+        if key:
+            record = self.archive.latest(query_key=key)
+        if record is None and city:
+            record = self.archive.latest(city=city)
+        if record is None and city_id is not None:
+            record = self.archive.latest(city_id=city_id)
+        if record is None and self.replay_miss == "any":
+            if self._all_rows is None:
+                self._all_rows = self.archive.query()
+            if self._all_rows:
+                row = self._all_rows[zlib.crc32(lookup.encode()) % len(self._all_rows)]
+                record = self.archive.read(row)
+        if record is None:
+            self.replay_misses += 1
+            raise HTTPException(status_code=404, detail=f"No recorded forecast for {lookup}")
+        self._replayed[lookup] = record["payload"]
+        return record["payload"]
+
+    def preload(self):
+        """Read the newest recording of every key into memory (replay mode).
+
+        Streams the archive once in time order, so later records win; after
+        this no request touches the archive. Returns the number of keys.
+        """
+        if self.mode != "replay":
+            return 0
+        for record in self.archive.iter_records():
+            meta = record["payload"].get("city") or {}
+            keys = [record.get("query_key"), f"city:{city_key(meta.get('name'))}" if meta.get("name") else None,
+                    f"id:{meta['id']}" if meta.get("id") is not None else None]
+            for key in filter(None, keys):
+                self._replayed[key] = record["payload"]
+        return len(self._replayed)
+
+    def _replay_delay(self):
+        return self.replay_latency_s + (random.uniform(0, self.replay_jitter_s) if self.replay_jitter_s else 0.0)
+
+    def _replay(self, city, city_id, key):
+        payload = self._lookup(city, city_id, key)
+        self.replayed += 1
+        return shift_to_today(payload) if self.replay_shift else payload
+
+    async def fetch(self, city: str = None, lat: float = None, lon: float = None, city_id: int = None,
+                    key: str = None):
+        if self.mode == "replay":
+            if self._lookup_key(city, city_id, key) in self._replayed:
+                payload = self._replay(city, city_id, key)  # already in memory, no archive read
+            else:
+                payload = await run_in_threadpool(self._replay, city, city_id, key)
+            delay = self._replay_delay()
+            if delay:
+                await asyncio.sleep(delay)
+            return payload
+        payload = await self.client.fetch_forecast(city, lat, lon, city_id=city_id)
+        self.upstream += 1
+        if self.archive is not None:
+            await run_in_threadpool(self._record, payload, key)
+        return payload
+
+    def fetch_sync(self, city: str = None, lat: float = None, lon: float = None, api_key: str = None,
+                   key: str = None):
+        """Blocking variant for scripts and ``utils.fetch_5day_forecast``."""
+        if self.mode == "replay":
+            payload = self._replay(city, None, key)
+            delay = self._replay_delay()
+            if delay:
+                time.sleep(delay)
+            return payload
+        import requests  # only scripts use this path; the API fetches with httpx
+
+        params = {"appid": api_key or settings.OPENWEATHER_KEY, "units": "metric"}
+        if city:
+            params["q"] = city
+        else:
+            params["lat"] = lat
+            params["lon"] = lon
+        r = requests.get(self.client.base_url, params=params, timeout=10)
+        r.raise_for_status()
+        payload = r.json()
+        self.upstream += 1
+        self._record(payload, key)
+        return payload
+
+    def stats(self):
+        return {"mode": self.mode, "upstream": self.upstream, "recorded": self.recorded,
+                "replayed": self.replayed, "replay_misses": self.replay_misses}
+
+
+forecast_provider = ForecastProvider.from_settings()
+forecast_archive = forecast_provider.archive
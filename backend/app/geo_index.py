@@ -0,0 +1,104 @@
+import numpy as np
+
+from .city_index import COORD_MISSING, COORD_SCALE, CityIndex
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG = np.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoIndex:
+    """Uniform lat/lon grid over the city coordinates for k-nearest lookups.
+
+    Cities are sorted by grid cell so each cell is a contiguous slice of
+    ``order``. A query scans square rings of cells around the point until the
+    k-th best distance is inside the radius the rings are guaranteed to cover.
+    """
+
+    def __init__(self, coords, cell_deg: float = 0.5):
+        coords = np.asarray(coords)
+        valid = np.flatnonzero((coords[:, 0] != COORD_MISSING) & (coords[:, 1] != COORD_MISSING))
+        self.cell_deg = cell_deg
+        self.n_rows = int(np.ceil(180 / cell_deg))
+        self.n_cols = int(np.ceil(360 / cell_deg))
+        self.lat = coords[valid, 0] / COORD_SCALE
+        self.lon = coords[valid, 1] / COORD_SCALE
+        cells = self._cell(self.lat, self.lon)
+        by_cell = np.argsort(cells, kind="stable")
+        self.cells = cells[by_cell]
+        self.order = valid[by_cell]
+        self.lat = self.lat[by_cell]
+        self.lon = self.lon[by_cell]
+
+    @classmethod
+    def from_city_index(cls, index: CityIndex, cell_deg: float = 0.5):
+        return cls(index.coords, cell_deg)
+
+    def __len__(self):
+        return len(self.order)
+
+    def _row_col(self, lat, lon):
+        row = np.clip(((np.asarray(lat) + 90) // self.cell_deg).astype(np.int64), 0, self.n_rows - 1)
+        col = ((np.asarray(lon) + 180) // self.cell_deg).astype(np.int64) % self.n_cols
+        return row, col
+
+    def _cell(self, lat, lon):
+        row, col = self._row_col(lat, lon)
+        return row * self.n_cols + col
+
+    def _candidates(self, row, col, r):
+        rows = np.arange(max(row - r, 0), min(row + r, self.n_rows - 1) + 1)
+        if 2 * r + 1 >= self.n_cols:
+            cols = np.arange(self.n_cols)
+        else:
+            cols = np.arange(col - r, col + r + 1) % self.n_cols
+        wanted = (rows[:, None] * self.n_cols + cols[None, :]).ravel()
+        starts = np.searchsorted(self.cells, wanted, side="left")
+        lens = np.searchsorted(self.cells, wanted, side="right") - starts
+        # Concatenate the per-cell slices without a Python loop
+        return np.arange(lens.sum()) + np.repeat(starts - (np.cumsum(lens) - lens), lens)
+
+    def _covered_km(self, lat, r):
+        """Distance that rings of radius ``r`` are guaranteed to cover around ``lat``.
+
+        Longitude cells shrink towards the poles, so the narrowest row counts.
+        """
+        edge_lat = min(abs(lat) + (r + 1) * self.cell_deg, 90.0)
+        return r * self.cell_deg * KM_PER_DEG * np.cos(np.radians(edge_lat))
+
+    def nearest(self, lat: float, lon: float, k: int = 1):
+        """Return ``(positions, distances_km)`` of the k nearest cities, closest first.
+
+        Positions index the source ``CityIndex``.
+        """
+        if not len(self.order):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        k = min(k, len(self.order))
+        row = min(max(int((lat + 90) // self.cell_deg), 0), self.n_rows - 1)
+        col = int((lon + 180) // self.cell_deg) % self.n_cols
+        max_r = max(self.n_rows, self.n_cols // 2)
+
+        # Grow the ring geometrically until it holds at least k cities ...
+        r = 0
+        cand = self._candidates(row, col, r)
+        while len(cand) < k and r < max_r:
+            r = min(max(1, 2 * r), max_r)
+            cand = self._candidates(row, col, r)
+        # ... then widen it until it provably contains everything closer than the k-th
+        while True:
+            dist = haversine_km(lat, lon, self.lat[cand], self.lon[cand])
+            top = np.argpartition(dist, k - 1)[:k] if len(cand) > k else np.arange(len(cand))
+            kth = dist[top].max()
+            if r >= max_r or len(cand) == len(self.order) or kth <= self._covered_km(lat, r):
+                top = top[np.argsort(dist[top])]
+                return self.order[cand[top]], dist[top]
+            # Jump straight to the smallest ring that covers the current k-th distance
+            r += 1
+            while r < max_r and self._covered_km(lat, r) < kth:
+                r += 1
+            cand = self._candidates(row, col, r)
@@ -0,0 +1,226 @@
+"""NumPy forward pass for the Keras LSTM trained by ``training/train_lstm.py``.
+
+Reads the weights straight from the Keras ``.h5`` file (needs ``h5py``, not
+TensorFlow) or from the ``.npz`` export, so API workers never import Keras.
+
+Export an existing model once:
+
+    cd backend
+    python -m app.lstm_runtime app/models/lstm_model.h5
+"""
+import asyncio
+import json
+
+import numpy as np
+
+ACTIVATIONS = {
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "relu": lambda x: np.maximum(x, 0.0),
+    "linear": lambda x: x,
+}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"activation {name!r} is not supported by the NumPy LSTM runtime")
+    return name
+
+
+def _input_shape(layer_configs):
+    for cfg in layer_configs:
+        shape = cfg.get("batch_input_shape") or cfg.get("batch_shape")
+        if shape:
+            return shape[1], shape[2]
+    return None, None
+
+
+class LSTMRuntime:
+    """Stack of Keras LSTM/Dense layers evaluated with NumPy.
+
+    ``layers`` is a list of ``(spec, weights)`` pairs where ``spec`` is the
+    JSON-serializable layer description and ``weights`` the arrays in Keras
+    order (LSTM: kernel, recurrent kernel, bias with gates i, f, c, o; Dense:
+    kernel, bias).
+    """
+
+    def __init__(self, layers, window=None, n_features=1):
+        self.layers = [(spec, [np.asarray(w, dtype=np.float32) for w in weights]) for spec, weights in layers]
+        self.window = window
+        self.n_features = n_features
+
+    @classmethod
+    def from_keras_config(cls, model_config, weights_by_layer):
+        """Build from a Keras ``model_config`` dict and ``{layer name: [arrays]}``."""
+        if model_config.get("class_name") != "Sequential":
+            raise ValueError("only Sequential models are supported by the NumPy LSTM runtime")
+        configs = [layer["config"] for layer in model_config["config"]["layers"]]
+        window, n_features = _input_shape(configs)
+        layers = []
+        for layer in model_config["config"]["layers"]:
+            kind, cfg = layer["class_name"], layer["config"]
+            if kind in ("InputLayer", "Dropout"):
+                continue  # no-ops at inference
+            if kind == "LSTM":
+                if cfg.get("go_backwards") or cfg.get("stateful") or cfg.get("return_state") or cfg.get("time_major"):
+                    raise ValueError(f"LSTM layer {cfg['name']!r} uses options the NumPy runtime does not support")
+                spec = {"type": "lstm", "units": cfg["units"], "use_bias": cfg.get("use_bias", True),
+                        "activation": _activation(cfg["activation"]),
+                        "recurrent_activation": _activation(cfg["recurrent_activation"]),
+                        "return_sequences": bool(cfg.get("return_sequences"))}
+            elif kind == "Dense":
+                spec = {"type": "dense", "units": cfg["units"], "use_bias": cfg.get("use_bias", True),
+                        "activation": _activation(cfg.get("activation", "linear"))}
+            else:
+                raise ValueError(f"layer type {kind} is not supported by the NumPy LSTM runtime")
+            layers.append((spec, weights_by_layer[cfg["name"]]))
+        return cls(layers, window=window, n_features=n_features or 1)
+
+    @classmethod
+    def from_h5(cls, path):
+        """Read a Keras ``model.save('*.h5')`` file with h5py."""
+        try:
+            import h5py
+        except ImportError as e:
+            raise RuntimeError("h5py is required to read .h5 models; export an .npz instead") from e
+        with h5py.File(path, "r") as f:
+            config = f.attrs["model_config"]
+            config = json.loads(config.decode() if isinstance(config, bytes) else config)
+            group = f["model_weights"] if "model_weights" in f else f
+            weights = {}
+            for name in group:
+                names = group[name].attrs.get("weight_names", [])
+                weights[name] = [group[name][n.decode() if isinstance(n, bytes) else n][()] for n in names]
+        return cls.from_keras_config(config, weights)
+
+    @classmethod
+    def from_keras(cls, model):
+        """Build from an in-memory Keras model (used by the training script)."""
+        weights = {layer.name: [np.asarray(w) for w in layer.get_weights()] for layer in model.layers}
+        return cls.from_keras_config(json.loads(model.to_json()), weights)
+
+    def save(self, path):
+        arrays = {f"layer{i}_{j}": w for i, (_, weights) in enumerate(self.layers) for j, w in enumerate(weights)}
+        meta = {"window": self.window, "n_features": self.n_features,
+                "layers": [dict(spec, n_weights=len(weights)) for spec, weights in self.layers]}
+        np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Load the ``.npz`` written by ``save``; ``.h5`` paths go through ``from_h5``."""
+        if str(path).endswith(".h5"):
+            return cls.from_h5(path)
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"][()]))
+            layers = []
+            for i, spec in enumerate(meta["layers"]):
+                n = spec.pop("n_weights")
+                layers.append((spec, [data[f"layer{i}_{j}"] for j in range(n)]))
+        return cls(layers, window=meta["window"], n_features=meta["n_features"])
+
+    def predict(self, X):
+        """Forward pass for a batch of windows, ``(n, window[, n_features])`` -> ``(n, units)``.
+
+        The input projection of every timestep of every row is one matmul; the
+        recurrence then does one ``(n, units) @ (units, 4 * units)`` per step.
+        """
+        x = np.asarray(X, dtype=np.float32)
+        if x.ndim == 2:
+            x = x[:, :, None]
+        for spec, weights in self.layers:
+            if spec["type"] == "lstm":
+                x = self._lstm(spec, weights, x)
+            else:
+                x = x @ weights[0]
+                if spec["use_bias"]:
+                    x = x + weights[1]
+                x = ACTIVATIONS[spec["activation"]](x)
+        return x
+
+    @staticmethod
+    def _lstm(spec, weights, x):
+        kernel, recurrent = weights[0], weights[1]
+        n, steps, _ = x.shape
+        units = spec["units"]
+        act = ACTIVATIONS[spec["activation"]]
+        gate = ACTIVATIONS[spec["recurrent_activation"]]
+        xw = (x.reshape(n * steps, -1) @ kernel).reshape(n, steps, 4 * units)
+        if spec["use_bias"]:
+            xw += weights[2]
+        h = np.zeros((n, units), dtype=np.float32)
+        c = np.zeros((n, units), dtype=np.float32)
+        outputs = []
+        for t in range(steps):
+            z = xw[:, t] + h @ recurrent
+            i = gate(z[:, :units])
+            f = gate(z[:, units:2 * units])
+            o = gate(z[:, 3 * units:])
+            c = f * c + i * act(z[:, 2 * units:3 * units])
+            h = o * act(c)
+            outputs.append(h)
+        return np.stack(outputs, axis=1) if spec["return_sequences"] else h
+
+
+class MicroBatcher:
+    """Coalesces concurrent ``predict`` calls into one forward pass per model.
+
+    Calls arriving within ``max_wait_s`` of the first pending one (or until
+    ``max_batch`` are queued) are stacked and run together on the event loop.
+    """
+
+    def __init__(self, max_batch: int = 64, max_wait_s: float = 0.002):
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_s
+        self._pending = []  # (model, x, future)
+        self._timer = None
+        self.batches = 0
+        self.items = 0
+
+    async def predict(self, model, x):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((model, np.asarray(x, dtype=np.float32), fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_s, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        groups = {}
+        for item in pending:
+            groups.setdefault(id(item[0]), []).append(item)
+        for items in groups.values():
+            self.batches += 1
+            self.items += len(items)
+            try:
+                out = items[0][0].predict(np.stack([x for _, x, _ in items]))
+            except Exception as e:
+                for _, _, fut in items:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (_, _, fut), y in zip(items, out):
+                if not fut.done():
+                    fut.set_result(y)
+
+    def stats(self):
+        return {"batches": self.batches, "items": self.items,
+                "mean_batch": self.items / self.batches if self.batches else 0.0}
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    p = argparse.ArgumentParser(description="Export a Keras LSTM .h5 to the NumPy runtime's .npz format")
+    p.add_argument("src")
+    p.add_argument("--out", default=None, help="default: src with .npz")
+    args = p.parse_args()
+    out = args.out or os.path.splitext(args.src)[0] + ".npz"
+    runtime = LSTMRuntime.from_h5(args.src)
+    runtime.save(out)
+    print(f"Wrote {out} (window={runtime.window}, layers={[s['type'] for s, _ in runtime.layers]})")
@@ -1,13 +1,103 @@
+import time
+
+STARTED = time.perf_counter()
+
+import asyncio
+import importlib
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .api import router
+from fastapi.concurrency import run_in_threadpool
+from .api import router, model_registry, refresh_snapshots, runtime_metrics
+from . import metrics
 from .config import settings
-from .city_search import router as city_router
-
-app = FastAPI(title="Laundry Planner Pro API")
+from .city_search import router as city_router, get_geo_index
+from .weather_client import weather_client
+from .forecast_provider import forecast_archive, forecast_provider
+from .snapshots import SnapshotScheduler
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+logger = logging.getLogger(__name__)
+
+STARTUP_MODES = ("blocking", "background", "preload")
+# Imported by endpoints on first use; preload imports them before the workers fork
+HEAVY_MODULES = ("joblib", "pandas", ".feature_builder")
+
+readiness = {"ready": False, "mode": None, "steps": {}, "error": None, "import_s": None, "ready_s": None}
+
+
+def _step(name, fn):
+    start = time.perf_counter()
+    fn()
+    readiness["steps"][name] = round(time.perf_counter() - start, 3)
+
+
+def _city_indexes():
+    try:
+        get_geo_index()
+    except FileNotFoundError:
+        pass
+
+
+def warm_shared(imports=False):
+    """Work whose result a forked worker inherits: heavy imports, city search indexes, models."""
+    if imports:
+        _step("imports", lambda: [importlib.import_module(name, __package__) for name in HEAVY_MODULES])
+    # Build the city search and spatial indexes before serving so no request pays for them
+    _step("city_index", _city_indexes)
+    if settings.MODEL_WARMUP:
+        _step("models", model_registry.warm_up)
+
+
+def warm_process():
+    """Per-process warm-up (the archive's SQLite handle must not cross a fork)."""
+    if forecast_provider.mode == "replay":
+        _step("replay", forecast_provider.preload)
+
+
+async def _warm(shared):
+    try:
+        if shared:
+            await run_in_threadpool(warm_shared)
+        await run_in_threadpool(warm_process)
+    except Exception as e:
+        readiness["error"] = str(e)
+        raise
+    readiness["ready"] = True
+    readiness["ready_s"] = round(time.perf_counter() - STARTED, 3)
+
+
+async def _warm_in_background():
+    try:
+        await _warm(shared=True)
+    except Exception:
+        logger.exception("warm-up failed; /ready stays 503")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    mode = readiness["mode"]
+    warming = None
+    if mode == "background":
+        warming = asyncio.create_task(_warm_in_background())
+    else:
+        await _warm(shared=mode == "blocking")
+    scheduler = SnapshotScheduler(refresh_snapshots, settings.SNAPSHOT_REFRESH_S)
+    if settings.hot_cities:
+        scheduler.start()
+    yield
+    if warming is not None:
+        warming.cancel()
+    await scheduler.stop()
+    # Close the pooled OpenWeather connections on shutdown
+    await weather_client.aclose()
+    if forecast_archive is not None:
+        forecast_archive.close()
+
 
 # Create app
-app = FastAPI(title="Laundry Planner Pro API")
+app = FastAPI(title="Laundry Planner Pro API", lifespan=lifespan)
 
 # ADD THIS SECTION 👇
 app.add_middleware(
@@ -18,6 +108,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so recorded latency includes CORS handling
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(router, prefix="/api")
 app.include_router(city_router, prefix="/api")
 
@@ -25,4 +118,26 @@ app.include_router(city_router, prefix="/api")
 def root():
     return {"app": "laundry-planner-pro", "default_city": settings.DEFAULT_CITY}
 
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Latency histograms per route and stage plus upstream, cache and model counters (Prometheus text format)."""
+    return PlainTextResponse(metrics.render(runtime_metrics()), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/ready", include_in_schema=False)
+def ready():
+    """200 once indexes, models and the replay archive are warm, 503 before; for readiness probes."""
+    loaded = [name for name, entry in model_registry.info().items() if entry["loaded"]]
+    return JSONResponse({**readiness, "models": loaded}, status_code=200 if readiness["ready"] else 503)
+
+
+readiness["mode"] = settings.STARTUP_WARMUP
+if readiness["mode"] not in STARTUP_MODES:
+    raise ValueError(f"STARTUP_WARMUP must be one of {', '.join(STARTUP_MODES)}, not {readiness['mode']!r}")
+if readiness["mode"] == "preload":
+    # gunicorn --preload imports this module once in the parent; the forked workers share what it loads
+    warm_shared(imports=True)
+readiness["import_s"] = round(time.perf_counter() - STARTED, 3)
+
 # Run with: uvicorn app.main:app --reload --port 8000
@@ -0,0 +1,233 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+def _joblib_load(path):
+    import joblib  # deferred: pulls in NumPy/SciPy helpers worth ~0.2 s of worker start
+
+    return joblib.load(path)
+
+
+class ModelEntry:
+    def __init__(self, name, path, model, version, mtime, size, load_time_s):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.version = version
+        self.mtime = mtime
+        self.size = size
+        self.loaded_at = time.time()
+        self.load_time_s = load_time_s
+        self.warmup_s = None
+        self.reload_error = None
+
+    def info(self):
+        return {
+            "name": self.name,
+            "path": self.path,
+            "loaded": True,
+            "version": self.version,
+            "type": type(self.model).__name__,
+            "file_mtime": self.mtime,
+            "file_size": self.size,
+            "loaded_at": self.loaded_at,
+            "load_time_s": self.load_time_s,
+            "warmup_s": self.warmup_s,
+            "reload_error": self.reload_error,
+        }
+
+
+class ModelRegistry:
+    """Keeps each model file loaded once per worker and hot-swaps it on change.
+
+    ``get`` re-stats the file at most every ``check_interval_s`` seconds; a new
+    mtime or size triggers a reload whose result replaces the old entry in a
+    single dict assignment, so in-flight requests keep the model they started
+    with and never see a half-loaded one.
+
+    Models registered with ``evictable=True`` (per-city models, of which there
+    may be thousands) are loaded on first use and kept in an LRU bounded by
+    ``max_bytes``, counted as the size of their files; the least recently
+    used ones are dropped and loaded again when next asked for.
+
+    A model registered with ``superseded_by`` is a fallback: warm-up skips it
+    while the other model's file exists, so it is only loaded if asked for.
+    """
+
+    def __init__(self, loader=_joblib_load, check_interval_s: float = 2.0, max_bytes: int = 512 * 1024 * 1024):
+        self.loader = loader
+        self.check_interval_s = check_interval_s
+        self.max_bytes = max_bytes
+        self._lru = OrderedDict()  # evictable name -> file size, least recently used first
+        self._lru_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._paths = {}  # name -> path
+        self._warmups = {}  # name -> callable(model)
+        self._loaders = {}  # name -> callable(path) overriding the default loader
+        self._superseded_by = {}  # fallback name -> name preferred over it
+        self._entries = {}  # name -> ModelEntry
+        self._checked_at = {}  # name -> monotonic time of last stat
+        self._locks = {}  # name -> threading.Lock serializing reloads
+        self._versions = {}  # name -> last assigned version
+
+    def register(self, name: str, path: str, warmup=None, loader=None, evictable=False, superseded_by=None):
+        if evictable:
+            self._lru.setdefault(name, None)  # marks it evictable; sized once loaded
+        self._paths[name] = path
+        self._locks[name] = threading.Lock()
+        self._versions.setdefault(name, 0)
+        if warmup is not None:
+            self._warmups[name] = warmup
+        if loader is not None:
+            self._loaders[name] = loader
+        if superseded_by is not None:
+            self._superseded_by[name] = superseded_by
+
+    def path(self, name: str) -> str:
+        return self._paths[name]
+
+    def names_for_path(self, path: str):
+        path = os.path.abspath(path)
+        return [n for n, p in self._paths.items() if os.path.abspath(p) == path]
+
+    def _stat(self, name):
+        try:
+            st = os.stat(self._paths[name])
+        except FileNotFoundError:
+            return None
+        return st.st_mtime, st.st_size
+
+    def _is_stale(self, name):
+        """True when the entry must be (re)loaded or dropped."""
+        entry = self._entries.get(name)
+        now = time.monotonic()
+        if entry is not None and now - self._checked_at.get(name, 0.0) < self.check_interval_s:
+            return False
+        self._checked_at[name] = now
+        stat = self._stat(name)
+        if entry is None:
+            return stat is not None
+        return stat is None or (entry.mtime, entry.size) != stat
+
+    def _load(self, name, warm=False, force=False):
+        with self._locks[name]:
+            stat = self._stat(name)
+            if stat is None:
+                self._entries.pop(name, None)
+                if name in self._lru:
+                    with self._lru_lock:
+                        self._lru[name] = None
+                return None
+            current = self._entries.get(name)
+            if not force and current is not None and (current.mtime, current.size) == stat:
+                return current  # another thread reloaded it meanwhile
+            t0 = time.perf_counter()
+            try:
+                model = self._loaders.get(name, self.loader)(self._paths[name])
+            except Exception as e:
+                if current is None or force:
+                    raise
+                # A rejected new file must not take down the model already serving; retry when it changes again
+                logger.exception("could not reload %s, keeping version %d", name, current.version)
+                current.mtime, current.size = stat
+                current.reload_error = f"{type(e).__name__}: {e}"
+                return current
+            self._versions[name] += 1
+            entry = ModelEntry(name, self._paths[name], model, self._versions[name], stat[0], stat[1],
+                               time.perf_counter() - t0)
+            if warm and name in self._warmups:
+                t0 = time.perf_counter()
+                self._warmups[name](model)
+                entry.warmup_s = time.perf_counter() - t0
+            self._entries[name] = entry
+            self._checked_at[name] = time.monotonic()
+            if name in self._lru:
+                self._admit(name, entry.size)
+            return entry
+
+    def _admit(self, name, size):
+        """Account a freshly loaded evictable model and drop the least recently used ones over budget."""
+        with self._lru_lock:
+            self.misses += 1
+            self._lru[name] = size
+            self._lru.move_to_end(name)
+            total = sum(s for s in self._lru.values() if s)
+            for victim in list(self._lru):
+                if total <= self.max_bytes or victim == name:
+                    break
+                if self._lru[victim] and self._entries.pop(victim, None) is not None:
+                    total -= self._lru[victim]
+                    self._lru[victim] = None
+                    self.evictions += 1
+
+    def _touch(self, name):
+        # Only resident models count as hits: a name whose file is missing stays unloaded
+        if name in self._lru and name in self._entries:
+            with self._lru_lock:
+                self.hits += 1
+                self._lru.move_to_end(name)
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._paths
+
+    def get(self, name: str):
+        """Return the loaded model for ``name`` or None if its file does not exist."""
+        if self._is_stale(name):
+            self._load(name)
+        else:
+            self._touch(name)
+        entry = self._entries.get(name)
+        return entry.model if entry is not None else None
+
+    async def aget(self, name: str):
+        """Like ``get`` but runs any (re)load in the threadpool instead of the event loop."""
+        if self._is_stale(name):
+            await run_in_threadpool(self._load, name)
+        else:
+            self._touch(name)
+        entry = self._entries.get(name)
+        return entry.model if entry is not None else None
+
+    def reload(self, name: str, warm: bool = True):
+        """Load ``name`` from disk now; the old model keeps serving until the swap."""
+        return self._load(name, warm=warm, force=True)
+
+    def warm_up(self):
+        """Load every registered model except the evictable and superseded ones and run its warm-up prediction."""
+        for name in self._paths:
+            if name in self._lru:
+                continue
+            preferred = self._superseded_by.get(name)
+            if preferred is not None and self._stat(preferred) is not None:
+                continue
+            try:
+                self._load(name, warm=True)
+            except Exception:
+                # A broken artifact must not stop the API from starting
+                self._entries.pop(name, None)
+
+    def info(self):
+        return {
+            name: (self._entries[name].info() if name in self._entries
+                   else {"name": name, "path": path, "loaded": False})
+            for name, path in self._paths.items()
+            if name not in self._lru or name in self._entries
+        }
+
+    def cache_stats(self):
+        """Hits, misses (loads) and evictions of the evictable-model LRU."""
+        with self._lru_lock:
+            sizes = [s for s in self._lru.values() if s]
+            lookups = self.hits + self.misses
+            return {"registered": len(self._lru), "loaded": len(sizes), "bytes": sum(sizes),
+                    "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else None}
@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+from .forecast_archive import city_key
+
+CITY_PREFIX = "city-"
+
+
+def _city_of(stem):
+    """City key of a ``city-<url-quoted name>`` artifact stem, else None."""
+    return city_key(urllib.parse.unquote(stem[len(CITY_PREFIX):])) if stem.startswith(CITY_PREFIX) else None
+
+
+class ModelRouter:
+    """Maps (model, city) to the registry name of the model that should serve it.
+
+    XGBoost routes come from ``registry.json`` written by
+    training/train_xgboost_search.py (its ``best_by_city``, which may be the
+    pooled model); Prophet routes from ``city-<name>.npz`` exports in
+    ``prophet_dir``. Cities without a route get None and the caller uses the
+    global model. Routed models are registered as evictable, so the registry
+    loads them on first use and keeps only as many as its memory budget
+    allows. Both sources are re-read at most every ``check_interval_s``.
+    """
+
+    def __init__(self, registry, xgb_dir, prophet_dir, loaders, warmups=None, check_interval_s: float = 2.0):
+        self.registry = registry
+        self.xgb_dir = xgb_dir
+        self.prophet_dir = prophet_dir
+        self.loaders = loaders  # family -> callable(path)
+        self.warmups = warmups or {}
+        self.check_interval_s = check_interval_s
+        self._routes = {"xgboost": {}, "prophet": {}}  # family -> city key -> (registry name, path)
+        self._checked_at = 0.0
+        self._sources = None  # (manifest mtime, prophet dir mtime) the routes were built from
+        self._lock = threading.Lock()
+        self.routed = 0
+        self.fallbacks = 0
+
+    def _xgboost_routes(self):
+        try:
+            with open(os.path.join(self.xgb_dir, "registry.json")) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        routes = {}
+        for city, name in manifest.get("best_by_city", {}).items():
+            entry = manifest.get("models", {}).get(name)
+            if entry is not None:
+                routes[city_key(city)] = (f"xgboost@{name}", os.path.join(self.xgb_dir, entry["path"]))
+        return routes
+
+    def _prophet_routes(self):
+        if not os.path.isdir(self.prophet_dir):
+            return {}
+        routes = {}
+        for filename in sorted(os.listdir(self.prophet_dir)):
+            stem, ext = os.path.splitext(filename)
+            city = _city_of(stem)
+            if city and ext == ".npz":
+                routes[city] = (f"prophet@{stem}", os.path.join(self.prophet_dir, filename))
+        return routes
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval_s:
+            return
+        with self._lock:
+            self._checked_at = now
+            sources = (self._mtime(os.path.join(self.xgb_dir, "registry.json")), self._mtime(self.prophet_dir))
+            if sources == self._sources and not force:
+                return
+            routes = {"xgboost": self._xgboost_routes(), "prophet": self._prophet_routes()}
+            for family, by_city in routes.items():
+                for name, path in by_city.values():
+                    if not self.registry.is_registered(name) or self.registry.path(name) != path:
+                        self.registry.register(name, path, warmup=self.warmups.get(family),
+                                               loader=self.loaders[family], evictable=True)
+            self._routes = routes
+            self._sources = sources
+
+    def route(self, family: str, city: str):
+        """Registry name of ``city``'s own model for ``family``, or None for the global one."""
+        self.refresh()
+        found = self._routes.get(family, {}).get(city_key(city)) if city else None
+        if found is None:
+            self.fallbacks += 1
+            return None
+        self.routed += 1
+        return found[0]
+
+    def stats(self):
+        return {"cities": {family: len(routes) for family, routes in self._routes.items()},
+                "routed": self.routed, "fallbacks": self.fallbacks, "cache": self.registry.cache_stats()}
@@ -0,0 +1,65 @@
+"""Sampling profiler for a live server (``GET /api/debug/profile``, needs ``PROFILER_ENABLED``).
+
+A daemon thread reads every other thread's stack with
+``sys._current_frames`` every ``interval_s`` and counts identical stacks,
+so the cost is one stack walk per thread per sample whatever the request
+rate. Output is collapsed stacks (``outer;inner;leaf count``), the input of
+flamegraph.pl and speedscope.
+"""
+import collections
+import os
+import sys
+import threading
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval_s=0.005):
+        self.interval_s = interval_s
+        self.samples = 0
+        self._stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_s):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        if self.running:
+            raise RuntimeError("profiler already running")
+        self._stop.clear()
+        self._stacks.clear()
+        self.samples = 0
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def collapsed(self, min_count=1):
+        return "".join(f"{stack} {n}\n" for stack, n in self._stacks.most_common() if n >= min_count)
@@ -0,0 +1,96 @@
+import numpy as np
+
+NS_PER_DAY = 86400 * 10**9
+
+
+class ProphetEvaluator:
+    """NumPy re-implementation of a fitted Prophet model's point forecast (``yhat``).
+
+    Holds only the fitted trend (piecewise-linear or flat), the changepoints and
+    the Fourier seasonality coefficients, so ``predict`` is a handful of array
+    operations instead of a DataFrame round trip plus uncertainty sampling.
+    Holidays, extra regressors, conditional seasonalities and logistic growth
+    are not supported; ``from_prophet`` refuses such models.
+    """
+
+    def __init__(self, growth, start_ns, t_scale_ns, y_scale, floor, k, m, deltas, changepoints_t,
+                 periods, orders, beta_add, beta_mul):
+        self.growth = str(growth)
+        self.start_ns = int(start_ns)
+        self.t_scale_ns = float(t_scale_ns)
+        self.y_scale = float(y_scale)
+        self.floor = float(floor)
+        self.k = float(k)
+        self.m = float(m)
+        self.deltas = np.asarray(deltas, dtype=float)
+        self.changepoints_t = np.asarray(changepoints_t, dtype=float)
+        self.periods = np.asarray(periods, dtype=float)
+        self.orders = np.asarray(orders, dtype=np.int64)
+        self.beta_add = np.asarray(beta_add, dtype=float)
+        self.beta_mul = np.asarray(beta_mul, dtype=float)
+        # Angular frequency (per day) of every sin/cos feature column, in Prophet's column order
+        self._freqs = np.concatenate([
+            np.repeat(2 * np.pi * np.arange(1, o + 1) / p, 2) for p, o in zip(self.periods, self.orders)
+        ]) if len(self.orders) else np.zeros(0)
+        self._is_sin = np.tile([True, False], len(self._freqs) // 2)
+
+    @classmethod
+    def from_prophet(cls, model):
+        """Extract the fitted parameters from a ``prophet.Prophet`` instance."""
+        if model.growth not in ("linear", "flat"):
+            raise ValueError(f"growth={model.growth!r} is not supported by the fast evaluator")
+        if model.extra_regressors or model.holidays is not None or getattr(model, "country_holidays", None):
+            raise ValueError("holidays and extra regressors are not supported by the fast evaluator")
+        if any(props.get("condition_name") for props in model.seasonalities.values()):
+            raise ValueError("conditional seasonalities are not supported by the fast evaluator")
+
+        periods = [props["period"] for props in model.seasonalities.values()]
+        orders = [props["fourier_order"] for props in model.seasonalities.values()]
+        cols = model.train_component_cols
+        if len(cols) != 2 * sum(orders):
+            raise ValueError("unexpected seasonal feature layout")
+        # Linear in beta, so averaging samples first equals Prophet's nanmean of the components
+        beta = np.nanmean(np.asarray(model.params["beta"], dtype=float), axis=0)
+        floor = model.y_min if getattr(model, "scaling", "absmax") == "minmax" else 0.0
+        return cls(
+            growth=model.growth,
+            start_ns=model.start.value,
+            t_scale_ns=model.t_scale.value,
+            y_scale=model.y_scale,
+            floor=floor,
+            k=np.nanmean(model.params["k"]),
+            m=np.nanmean(model.params["m"]),
+            deltas=np.nanmean(model.params["delta"], axis=0),
+            changepoints_t=model.changepoints_t,
+            periods=periods,
+            orders=orders,
+            beta_add=beta * cols["additive_terms"].values * model.y_scale,
+            beta_mul=beta * cols["multiplicative_terms"].values,
+        )
+
+    _FIELDS = ("growth", "start_ns", "t_scale_ns", "y_scale", "floor", "k", "m", "deltas", "changepoints_t",
+               "periods", "orders", "beta_add", "beta_mul")
+
+    def save(self, path):
+        np.savez(path, **{name: np.asarray(getattr(self, name)) for name in self._FIELDS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{name: data[name][()] if data[name].ndim == 0 else data[name] for name in cls._FIELDS})
+
+    def predict(self, ds):
+        """``yhat`` for an array of dates/datetimes (anything ``np.datetime64`` accepts)."""
+        ns = np.asarray(ds, dtype="datetime64[ns]").astype(np.int64)
+        t = (ns - self.start_ns) / self.t_scale_ns
+        if self.growth == "flat":
+            trend = np.full(t.shape, self.m)
+        else:
+            deltas_t = (self.changepoints_t[None, :] <= t[:, None]) * self.deltas
+            trend = (self.k + deltas_t.sum(axis=1)) * t + self.m - (deltas_t * self.changepoints_t).sum(axis=1)
+        trend = trend * self.y_scale + self.floor
+
+        days = ns / NS_PER_DAY
+        angles = days[:, None] * self._freqs[None, :]
+        X = np.where(self._is_sin, np.sin(angles), np.cos(angles))
+        return trend * (1 + X @ self.beta_mul) + X @ self.beta_add
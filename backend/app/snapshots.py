@@ -0,0 +1,89 @@
+import asyncio
+import datetime
+import logging
+import time
+
+from .forecast_cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """Latest precomputed prediction entry per hot city.
+
+    Entries are served only for the calendar day they were computed on and
+    while younger than ``max_age_s``; anything else counts as a miss so the
+    caller falls back to live computation.
+    """
+
+    def __init__(self, max_age_s: float):
+        self.max_age_s = max_age_s
+        self._entries = {}  # cache key -> (entry, computed_at, for_date)
+        self.hits = 0
+        self.misses = 0
+        self.last_refresh = None
+
+    def put(self, city: str, entry: dict, computed_at: float = None):
+        self._entries[cache_key(city)] = (entry, computed_at or time.time(), datetime.date.today())
+
+    def get(self, city: str):
+        """Return ``(entry, meta)`` for a fresh snapshot of ``city`` or None."""
+        item = self._entries.get(cache_key(city))
+        if item is not None:
+            entry, computed_at, for_date = item
+            age = time.time() - computed_at
+            if for_date == datetime.date.today() and age <= self.max_age_s:
+                self.hits += 1
+                meta = {
+                    "computed_at": datetime.datetime.fromtimestamp(computed_at, datetime.timezone.utc).isoformat(),
+                    "age_s": round(age, 1),
+                    "max_age_s": self.max_age_s,
+                }
+                return entry, meta
+        self.misses += 1
+        return None
+
+    def status(self):
+        now = time.time()
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "max_age_s": self.max_age_s,
+            "last_refresh": self.last_refresh,
+            "cities": {
+                key: {"city": entry.get("city"), "age_s": round(now - computed_at, 1), "for_date": str(for_date)}
+                for key, (entry, computed_at, for_date) in self._entries.items()
+            },
+        }
+
+
+class SnapshotScheduler:
+    """Runs ``refresh()`` now and then every ``interval_s`` seconds on the app's event loop."""
+
+    def __init__(self, refresh, interval_s: float):
+        self.refresh = refresh
+        self.interval_s = interval_s
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                # Keep serving the previous snapshots; live computation covers the gap
+                logger.exception("snapshot refresh failed")
+            await asyncio.sleep(self.interval_s)
@@ -0,0 +1,47 @@
+"""Newline-delimited JSON and server-sent-event responses for results produced incrementally.
+
+Handlers yield event dicts, each with an ``event`` name, from an async
+generator; nothing is accumulated server-side. A client asks for a stream
+with ``?stream=ndjson|sse`` or an ``Accept: application/x-ndjson`` /
+``text/event-stream`` header, and gets the plain JSON response otherwise.
+"""
+import json
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+NDJSON = "application/x-ndjson"
+SSE = "text/event-stream"
+FORMATS = {"ndjson": NDJSON, "sse": SSE}
+
+
+def stream_format(request, stream=None, default=None):
+    """``"ndjson"``, ``"sse"`` or ``default`` (None: the caller answers with plain JSON)."""
+    if stream:
+        if stream not in FORMATS:
+            raise HTTPException(status_code=422, detail=f"stream must be one of {', '.join(FORMATS)}")
+        return stream
+    accept = request.headers.get("accept", "")
+    for name, media_type in FORMATS.items():
+        if media_type in accept:
+            return name
+    return default
+
+
+def _encode(event, fmt):
+    data = json.dumps(event, default=str)
+    if fmt == "sse":
+        return f"event: {event.get('event', 'message')}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+def stream_response(events, fmt, background=None):
+    """Send each event from the async iterable ``events`` as soon as it is produced."""
+
+    async def body():
+        async for event in events:
+            yield _encode(event, fmt)
+
+    # X-Accel-Buffering: nginx would otherwise hold the events back until its buffer fills
+    return StreamingResponse(body(), media_type=FORMATS[fmt], background=background,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,30 +1,15 @@
-import requests
-import datetime
-from .config import settings
+from .forecast_features import tomorrow_rain
 
 BASE_FORECAST_URL = "http://api.openweathermap.org/data/2.5/forecast"
 
 
 def fetch_5day_forecast(city: str = None, lat: float = None, lon: float = None, api_key: str = None):
-    key = api_key or settings.OPENWEATHER_KEY
-    params = {"appid": key, "units": "metric"}
-    if city:
-        params["q"] = city
-    else:
-        params["lat"] = lat
-        params["lon"] = lon
-    r = requests.get(BASE_FORECAST_URL, params=params, timeout=10)
-    r.raise_for_status()
-    return r.json()
+    # Served by the configured provider (FORECAST_PROVIDER=live/record/replay)
+    from .forecast_cache import cache_key
+    from .forecast_provider import forecast_provider
+    return forecast_provider.fetch_sync(city, lat, lon, api_key, key=cache_key(city, lat, lon))
 
 
 def sum_tomorrow_rain(forecast_json, tz_offset_hours=0):
     # Sum rain (3h) for tomorrow local date
-    today = datetime.date.today()
-    tomorrow = today + datetime.timedelta(days=1)
-    total = 0.0
-    for item in forecast_json.get("list", []):
-        ts = datetime.datetime.fromtimestamp(item["dt"]) + datetime.timedelta(hours=tz_offset_hours)
-        if ts.date() == tomorrow:
-            total += item.get("rain", {}).get("3h", 0.0)
-    return total
\ No newline at end of file
+    return tomorrow_rain(forecast_json, tz_offset_hours)
\ No newline at end of file
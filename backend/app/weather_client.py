@@ -0,0 +1,116 @@
+import asyncio
+import random
+
+import httpx
+
+from .config import settings
+from .metrics import span
+from .utils import BASE_FORECAST_URL
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class OpenWeatherClient:
+    """Asyncio-native OpenWeather forecast client.
+
+    One pooled ``httpx.AsyncClient`` is shared by all requests in the worker so
+    connections are kept alive, a semaphore bounds in-flight upstream calls, and
+    429/5xx responses or transport errors are retried with jittered backoff.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_FORECAST_URL,
+        api_key: str = None,
+        timeout_s: float = 10.0,
+        connect_timeout_s: float = 3.0,
+        max_connections: int = 100,
+        max_keepalive: int = 32,
+        max_concurrency: int = 32,
+        max_retries: int = 3,
+        backoff_base_s: float = 0.25,
+        backoff_max_s: float = 4.0,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout_s, connect=connect_timeout_s)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            base_url=settings.OPENWEATHER_BASE_URL,
+            timeout_s=settings.OPENWEATHER_TIMEOUT_S,
+            connect_timeout_s=settings.OPENWEATHER_CONNECT_TIMEOUT_S,
+            max_connections=settings.OPENWEATHER_MAX_CONNECTIONS,
+            max_keepalive=settings.OPENWEATHER_MAX_KEEPALIVE,
+            max_concurrency=settings.OPENWEATHER_MAX_CONCURRENCY,
+            max_retries=settings.OPENWEATHER_MAX_RETRIES,
+            backoff_base_s=settings.OPENWEATHER_BACKOFF_BASE_S,
+            backoff_max_s=settings.OPENWEATHER_BACKOFF_MAX_S,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    def _backoff(self, attempt: int, response: httpx.Response = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max_s)
+        # Full jitter: spread retries from many workers over the whole window
+        return random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt))
+
+    async def fetch_forecast(
+        self, city: str = None, lat: float = None, lon: float = None, api_key: str = None, city_id: int = None
+    ):
+        params = {"appid": api_key or self.api_key or settings.OPENWEATHER_KEY, "units": "metric"}
+        if city_id is not None:
+            params["id"] = city_id
+        elif city:
+            params["q"] = city
+        else:
+            params["lat"] = lat
+            params["lon"] = lon
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                self.requests += 1
+                response = None
+                try:
+                    with span("upstream"):
+                        response = await self.client.get(self.base_url, params=params)
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        self.errors += 1
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                        if response.is_error:
+                            self.errors += 1
+                        response.raise_for_status()
+                        return response.json()
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, response))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self):
+        return {"requests": self.requests, "retries": self.retries, "errors": self.errors}
+
+
+weather_client = OpenWeatherClient.from_settings()
@@ -0,0 +1,87 @@
+"""p50/p99 autocomplete latency: CityIndex vs. the old linear substring scan.
+
+Uses data/world_cities.json when present, otherwise a synthetic list of the
+same shape (``--synthetic N``).
+
+    cd backend
+    python -m benchmarks.bench_city_search --synthetic 200000
+"""
+import argparse
+import random
+import string
+import time
+
+import numpy as np
+
+from app.city_index import CityIndex
+from app.city_search import _load_cities
+
+
+def linear_scan(cities, q, limit=10):
+    """The original search_city loop, kept here as the baseline."""
+    q_lower = q.lower()
+    results = []
+    for c in cities:
+        name = c.get("name", "")
+        if q_lower in name.lower():
+            coord = c.get("coord", {})
+            results.append({"id": c.get("id"), "name": name, "country": c.get("country"),
+                            "lat": coord.get("lat"), "lon": coord.get("lon")})
+            if len(results) >= limit:
+                break
+    return results
+
+
+def synthetic_cities(n, seed=0):
+    rng = random.Random(seed)
+    syllables = ["lon", "don", "par", "is", "ber", "lin", "mad", "rid", "san", "são", "ko", "ba", "mün", "chen",
+                 "vil", "le", "burg", "ton", "ham", "ford", "new", "port", "field", "o", "a", "ri", "na"]
+    countries = ["GB", "FR", "DE", "ES", "BR", "US", "IN", "JP", "IT", "PL"]
+    cities = []
+    for i in range(n):
+        name = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).title()
+        cities.append({
+            "id": i + 1, "name": name, "country": rng.choice(countries),
+            "coord": {"lat": rng.uniform(-60, 70), "lon": rng.uniform(-180, 180)},
+            "population": int(rng.paretovariate(1.2) * 1000),
+        })
+    return cities
+
+
+def percentiles(fn, queries):
+    lat = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        lat.append(time.perf_counter() - t0)
+    lat = np.array(lat) * 1000
+    return np.percentile(lat, 50), np.percentile(lat, 99)
+
+
+def main(args):
+    if args.synthetic:
+        cities = synthetic_cities(args.synthetic)
+    else:
+        cities = _load_cities()
+    t0 = time.perf_counter()
+    index = CityIndex.from_records(cities)
+    print(f"{len(cities)} cities, index build {time.perf_counter() - t0:.2f}s")
+
+    rng = random.Random(1)
+    queries = []
+    for _ in range(args.queries):
+        name = rng.choice(cities)["name"]
+        start = rng.randint(0, max(0, len(name) - 3)) if rng.random() < 0.3 else 0
+        queries.append(name[start:start + rng.randint(2, 6)])
+    queries += ["".join(rng.choice(string.ascii_lowercase) for _ in range(4)) for _ in range(args.queries // 10)]
+
+    for label, fn in (("linear scan", lambda q: linear_scan(cities, q)), ("CityIndex", index.search)):
+        p50, p99 = percentiles(fn, queries)
+        print(f"{label:<12} p50={p50:8.3f}ms  p99={p99:8.3f}ms")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--synthetic", type=int, default=0, help="generate N synthetic cities instead of loading the JSON")
+    p.add_argument("--queries", type=int, default=500)
+    main(p.parse_args())
@@ -0,0 +1,78 @@
+"""Startup time and per-worker memory: JSON city list vs. mmap'd binary store.
+
+Each mode runs in a fresh interpreter (like a uvicorn worker), loads the
+index, answers a few queries and reports RSS plus the private/shared split
+from /proc/self/smaps_rollup (Linux only).
+
+    cd backend
+    python -m benchmarks.bench_city_store                 # data/world_cities.json
+    python -m benchmarks.bench_city_store --synthetic 200000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from app.city_store import CITIES_JSON_PATH, build_store
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+mode, path = sys.argv[1], sys.argv[2]
+if mode == "json":
+    from app.city_index import CityIndex
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    index = CityIndex.from_records(raw)
+elif mode == "dicts":
+    with open(path, encoding="utf-8") as f:
+        index = json.load(f)
+else:
+    from app.city_store import open_store
+    index = open_store(path)
+startup = time.perf_counter() - t0
+if mode != "dicts":
+    for q in ("lon", "par", "san", "ber", "ton"):
+        index.search(q)
+mem = {}
+with open("/proc/self/smaps_rollup") as f:
+    for line in f:
+        parts = line.split()
+        if parts[0] in ("Rss:", "Pss:", "Shared_Clean:", "Private_Clean:", "Private_Dirty:"):
+            mem[parts[0][:-1]] = int(parts[1]) / 1024
+print(json.dumps({"startup_s": startup, **mem}))
+"""
+
+
+def run(mode, path):
+    out = subprocess.run([sys.executable, "-c", CHILD, mode, path], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return json.loads(out.stdout)
+
+
+def main(args):
+    src = CITIES_JSON_PATH
+    tmpdir = tempfile.mkdtemp()
+    if args.synthetic:
+        from benchmarks.bench_city_search import synthetic_cities
+        src = os.path.join(tmpdir, "world_cities.json")
+        with open(src, "w", encoding="utf-8") as f:
+            json.dump(synthetic_cities(args.synthetic), f)
+    store = os.path.join(tmpdir, "world_cities.bin")
+    build_store(src, store)
+    print(f"JSON {os.path.getsize(src) / 1e6:.1f} MB -> store {os.path.getsize(store) / 1e6:.1f} MB")
+
+    for label, mode, path in (("json.load only", "dicts", src), ("JSON + index", "json", src),
+                              ("mmap store", "store", store)):
+        r = run(mode, path)
+        private = r["Private_Clean"] + r["Private_Dirty"]
+        print(f"{label:<15} startup={r['startup_s'] * 1000:8.1f}ms  RSS={r['Rss']:7.1f}MB  "
+              f"private={private:7.1f}MB  shared={r['Shared_Clean']:6.1f}MB")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--synthetic", type=int, default=0)
+    main(p.parse_args())
@@ -0,0 +1,70 @@
+"""Latency/throughput of the async forecast client against the local stub.
+
+Compares the pooled ``OpenWeatherClient`` with the old pattern of calling
+blocking ``requests.get`` from inside the event loop.
+
+    cd backend
+    OPENWEATHER_KEY=stub python -m benchmarks.bench_forecast_client --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+import requests
+
+from app.weather_client import OpenWeatherClient
+from benchmarks.stub_openweather import StubServer
+
+
+def report(label, latencies, wall_s):
+    lat = np.array(latencies) * 1000
+    print(
+        f"{label:<14} n={len(lat):<5} {len(lat) / wall_s:8.1f} req/s  "
+        f"p50={np.percentile(lat, 50):7.1f}ms  p99={np.percentile(lat, 99):7.1f}ms"
+    )
+
+
+async def run_load(n, concurrency, call):
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            t0 = time.perf_counter()
+            await call(i)
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies, time.perf_counter() - t0
+
+
+async def main(args):
+    # The stub runs on its own thread so blocking calls below cannot stall it
+    stub = StubServer(latency_s=args.latency_ms / 1000, error_rate=args.error_rate).start_in_thread()
+
+    client = OpenWeatherClient(
+        base_url=stub.url, api_key="stub", max_concurrency=args.concurrency, max_keepalive=args.concurrency
+    )
+    latencies, wall = await run_load(args.requests, args.concurrency, lambda i: client.fetch_forecast(f"city{i}"))
+    await client.aclose()
+    report("async pooled", latencies, wall)
+    print(f"{'':<14} upstream connections: {stub.connections}, client: {client.stats()}")
+
+    if args.compare_sync:
+        async def blocking(i):
+            requests.get(stub.url, params={"q": f"city{i}"}, timeout=10).json()
+
+        latencies, wall = await run_load(min(args.requests, 100), args.concurrency, blocking)
+        report("blocking", latencies, wall)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--requests", type=int, default=500)
+    p.add_argument("--concurrency", type=int, default=50)
+    p.add_argument("--latency-ms", type=float, default=50)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    p.add_argument("--compare-sync", action="store_true")
+    asyncio.run(main(p.parse_args()))
@@ -0,0 +1,113 @@
+"""Startup time, memory and parity: NumPy LSTM runtime vs. Keras.
+
+Each mode runs in a fresh interpreter (like a uvicorn worker), loads the
+model, runs one prediction and reports the elapsed time and RSS. The Keras
+mode needs TensorFlow installed; the parity check compares both on the same
+random windows.
+
+    cd backend
+    python -m benchmarks.bench_lstm                       # app/models/lstm_model.h5
+    python -m benchmarks.bench_lstm --model app/models/lstm_model.npz
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from app.lstm_runtime import LSTMRuntime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, os, sys, time
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+t0 = time.perf_counter()
+mode, path, inputs = sys.argv[1], sys.argv[2], sys.argv[3]
+import numpy as np
+if mode == "numpy":
+    from app.lstm_runtime import LSTMRuntime
+    model = LSTMRuntime.load(path)
+    predict = model.predict
+else:
+    import keras
+    try:
+        model = keras.models.load_model(path, compile=False)
+    except Exception:
+        # Keras 3 cannot deserialize every Keras 2 .h5 config; rebuild the same stack from the weights
+        from app.lstm_runtime import LSTMRuntime
+        rt = LSTMRuntime.load(path)
+        layers = [keras.Input((rt.window, rt.n_features))]
+        for spec, _ in rt.layers:
+            if spec["type"] == "lstm":
+                layers.append(keras.layers.LSTM(spec["units"], activation=spec["activation"],
+                                                recurrent_activation=spec["recurrent_activation"],
+                                                use_bias=spec["use_bias"], return_sequences=spec["return_sequences"]))
+            else:
+                layers.append(keras.layers.Dense(spec["units"], activation=spec["activation"], use_bias=spec["use_bias"]))
+        model = keras.Sequential(layers)
+        model.set_weights([w for _, ws in rt.layers for w in ws])
+    predict = lambda X: model.predict(X, verbose=0)
+X = np.load(inputs)
+predict(X[:1])
+startup = time.perf_counter() - t0
+out = predict(X)
+rss = 0.0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmHWM:"):
+            rss = int(line.split()[1]) / 1024
+np.save(inputs + "." + mode + ".npy", out)
+print(json.dumps({"startup_s": startup, "peak_rss_mb": rss}))
+"""
+
+
+def run(mode, path, inputs):
+    out = subprocess.run([sys.executable, "-c", CHILD, mode, path, inputs], capture_output=True, text=True,
+                         cwd=BACKEND_DIR)
+    if out.returncode != 0:
+        return None, out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "failed"
+    return json.loads(out.stdout.strip().splitlines()[-1]), None
+
+
+def throughput(model, X, batch):
+    t0 = time.perf_counter()
+    for i in range(0, len(X), batch):
+        model.predict(X[i:i + batch])
+    return len(X) / (time.perf_counter() - t0)
+
+
+def main(args):
+    model = LSTMRuntime.load(args.model)
+    rng = np.random.default_rng(0)
+    X = rng.gamma(0.6, 4.0, size=(args.rows, model.window or 14, model.n_features)).astype(np.float32)
+    inputs = os.path.join(args.tmpdir, "lstm_inputs.npy")
+    np.save(inputs, X)
+
+    results = {}
+    for mode in ("numpy", "keras"):
+        r, err = run(mode, os.path.abspath(args.model), inputs)
+        if err:
+            print(f"{mode:<6} skipped: {err}")
+            continue
+        results[mode] = r
+        print(f"{mode:<6} startup={r['startup_s'] * 1000:8.1f}ms  peak RSS={r['peak_rss_mb']:7.1f}MB")
+    if len(results) == 2:
+        a, b = (np.load(f"{inputs}.{m}.npy") for m in ("numpy", "keras"))
+        print(f"parity: max |numpy - keras| = {np.abs(a - b).max():.3g} over {len(X)} windows")
+        print(f"savings: {results['keras']['startup_s'] / results['numpy']['startup_s']:.0f}x faster startup, "
+              f"{results['keras']['peak_rss_mb'] - results['numpy']['peak_rss_mb']:.0f}MB less RSS per worker")
+
+    for batch in (1, 16, 64):
+        print(f"numpy batch={batch:<3} {throughput(model, X, batch):10.0f} windows/s")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--model", default=os.path.join(BACKEND_DIR, "app", "models", "lstm_model.h5"))
+    p.add_argument("--rows", type=int, default=4096)
+    p.add_argument("--tmpdir", default="/tmp")
+    main(p.parse_args())
@@ -0,0 +1,122 @@
+"""Cold start: import time of ``app.main`` and time to first response per STARTUP_WARMUP mode.
+
+The import phase runs ``python -X importtime -c "import app.main"`` in fresh
+interpreters and reports the median wall time and the packages whose modules
+take longest to import. The serve phase starts uvicorn once per mode in
+replay mode over a synthetic archive (no network) and reports when it first
+answers, when ``GET /ready`` turns 200, and the latency of the first call to
+each endpoint.
+
+    cd backend
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --modes background preload --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.loadgen import synthetic_archive
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_CALLS = (
+    ("POST", "/api/predict/rule"),
+    ("POST", "/api/predict/xgboost"),
+    ("POST", "/api/plan/windows"),
+    ("GET", "/api/evaluate"),
+)
+
+
+def import_profile(env, runs, top):
+    walls, totals, run_totals = [], {}, {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=BACKEND_DIR,
+                             env=env, capture_output=True, text=True, check=True).stderr
+        walls.append(time.perf_counter() - start)
+        for line in out.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            own, _, name = line[len("import time:"):].split("|")
+            # Self time summed per top-level package: what each dependency costs in total
+            package = name.strip().split(".")[0]
+            run_totals[package] = run_totals.get(package, 0.0) + int(own) / 1e6
+        for package, seconds in run_totals.items():
+            totals.setdefault(package, []).append(seconds)
+        run_totals.clear()
+    print(f"import app.main: median {statistics.median(walls):.3f}s over {runs} interpreters (process start included)")
+    slowest = sorted(((statistics.median(v), k) for k, v in totals.items()), reverse=True)[:top]
+    for seconds, name in slowest:
+        print(f"  {name:<24} {seconds:.3f}s")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_once(mode, env, city, timeout_s):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--log-level", "warning"], cwd=BACKEND_DIR, env={**env, "STARTUP_WARMUP": mode})
+    result = {"mode": mode}
+    try:
+        with httpx.Client(timeout=timeout_s) as client:
+            while "listening_s" not in result or "ready_s" not in result:
+                if time.perf_counter() - start > timeout_s or proc.poll() is not None:
+                    raise RuntimeError(f"{mode}: server not ready after {timeout_s}s (exit {proc.poll()})")
+                try:
+                    r = client.get(base + "/ready")
+                except httpx.TransportError:
+                    time.sleep(0.01)
+                    continue
+                result.setdefault("listening_s", time.perf_counter() - start)
+                if r.status_code == 200:
+                    result["ready_s"] = time.perf_counter() - start
+                    result["steps"] = r.json()["steps"]
+                else:
+                    time.sleep(0.01)
+            for method, path in FIRST_CALLS:
+                t = time.perf_counter()
+                r = client.request(method, base + path, json={"city": city} if method == "POST" else None)
+                result[path] = (time.perf_counter() - t, r.status_code)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return result
+
+
+def main(args):
+    env = {**os.environ, "OPENWEATHER_KEY": os.environ.get("OPENWEATHER_KEY", "bench"), "HOT_CITIES": "",
+           "PYTHONPATH": BACKEND_DIR}
+    import_profile(env, args.runs, args.top)
+    with tempfile.TemporaryDirectory() as root:
+        city = synthetic_archive(root, 20)[0]
+        env.update(FORECAST_PROVIDER="replay", FORECAST_ARCHIVE_DIR=root)
+        for mode in args.modes:
+            runs = [serve_once(mode, env, city, args.timeout) for _ in range(args.runs)]
+            listening = statistics.median(r["listening_s"] for r in runs)
+            ready = statistics.median(r["ready_s"] for r in runs)
+            print(f"\nSTARTUP_WARMUP={mode}: answering after {listening:.3f}s, ready after {ready:.3f}s "
+                  f"(median of {args.runs}; last run's steps {runs[-1]['steps']})")
+            for _, path in FIRST_CALLS:
+                latency = statistics.median(r[path][0] for r in runs)
+                print(f"  first {path:<22} {latency * 1000:8.1f} ms  (HTTP {runs[-1][path][1]})")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--modes", nargs="+", default=["blocking", "background", "preload"])
+    p.add_argument("--runs", type=int, default=3)
+    p.add_argument("--top", type=int, default=10, help="slowest packages to list")
+    p.add_argument("--timeout", type=float, default=120.0)
+    main(p.parse_args())
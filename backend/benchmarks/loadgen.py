@@ -0,0 +1,152 @@
+"""Load generator: requests/s and latency percentiles per endpoint.
+
+By default the API runs in-process (``httpx.ASGITransport``) with
+``FORECAST_PROVIDER=replay`` over a synthetic recording archive, so results
+are deterministic and need neither network nor OpenWeather quota. Point
+``--url`` at a running server (e.g. one started with FORECAST_PROVIDER=replay)
+to measure it over HTTP instead.
+
+    cd backend
+    python -m benchmarks.loadgen --requests 2000 --concurrency 32
+    python -m benchmarks.loadgen --no-cache --replay-latency-ms 40     # every request goes to the provider
+    python -m benchmarks.loadgen --url http://localhost:8000 --cities London Paris Berlin
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+DEFAULT_ENDPOINTS = ("predict/rule", "predict/prophet", "predict/xgboost", "predict/lstm", "features",
+                     "predict/batch")
+
+
+def synthetic_archive(root, n_cities):
+    """Record ``n_cities`` synthetic forecasts into a fresh archive; returns the city names."""
+    from app.forecast_archive import ForecastArchive
+    from benchmarks.stub_openweather import make_forecast
+
+    archive = ForecastArchive(root)
+    cities = [f"Loadtown{i}" for i in range(n_cities)]
+    for i, city in enumerate(cities):
+        payload = make_forecast(city, seed=i)
+        payload["city"]["id"] = 900000 + i
+        archive.append(payload, query_key=f"city:{city.lower()}")
+    archive.close()
+    return cities
+
+
+def body_for(endpoint, cities, rng, batch_size):
+    if endpoint == "predict/batch":
+        return {"cities": rng.sample(cities, min(batch_size, len(cities)))}
+    return {"city": rng.choice(cities)}
+
+
+async def run_endpoint(client, endpoint, cities, n, concurrency, batch_size, seed):
+    rng = random.Random(seed)
+    bodies = [body_for(endpoint, cities, rng, batch_size) for _ in range(n)]
+    latencies = np.zeros(n)
+    statuses = {}
+    next_i = 0
+
+    async def worker():
+        nonlocal next_i
+        while next_i < n:
+            i = next_i
+            next_i += 1
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(f"/api/{endpoint}", json=bodies[i])
+                status = r.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies[i] = time.perf_counter() - t0
+            statuses[status] = statuses.get(status, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    ms = latencies * 1000
+    return {
+        "endpoint": endpoint,
+        "requests": n,
+        "ok": statuses.get(200, 0),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "req_per_s": n / wall,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+async def run(args, client, cities):
+    results = []
+    for endpoint in args.endpoints:
+        # Warm-up pass: model loads, first archive reads and cache fills are not what we measure
+        await run_endpoint(client, endpoint, cities, min(args.concurrency, args.requests), args.concurrency,
+                           args.batch_size, args.seed + 1)
+        results.append(await run_endpoint(client, endpoint, cities, args.requests, args.concurrency,
+                                          args.batch_size, args.seed))
+    return results
+
+
+async def run_in_process(args):
+    tmp = tempfile.mkdtemp(prefix="loadgen-")
+    cities = args.cities or synthetic_archive(os.path.join(tmp, "archive"), args.synthetic)
+    # Settings are read when the app is imported, so configure replay first
+    os.environ.setdefault("OPENWEATHER_KEY", "offline")
+    os.environ.setdefault("FORECAST_ARCHIVE_DIR", os.path.join(tmp, "archive"))
+    os.environ["FORECAST_PROVIDER"] = "replay"
+    os.environ["FORECAST_REPLAY_LATENCY_MS"] = str(args.replay_latency_ms)
+    os.environ.setdefault("HOT_CITIES", "")
+    if args.no_cache:
+        os.environ["FORECAST_CACHE_MAX_ENTRIES"] = "0"
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=60) as client:
+            return await run(args, client, cities)
+
+
+async def run_remote(args):
+    if not args.cities:
+        raise SystemExit("--url needs --cities (names the server can serve)")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        return await run(args, client, args.cities)
+
+
+def main(args):
+    results = asyncio.run(run_remote(args) if args.url else run_in_process(args))
+    print(f"{'endpoint':<16} {'n':>6} {'ok':>6} {'req/s':>9} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for r in results:
+        print(f"{r['endpoint']:<16} {r['requests']:>6} {r['ok']:>6} {r['req_per_s']:>9.1f} {r['p50_ms']:>6.2f}ms "
+              f"{r['p90_ms']:>6.2f}ms {r['p99_ms']:>6.2f}ms {r['max_ms']:>6.2f}ms")
+        if r["ok"] != r["requests"]:
+            print(f"{'':<16} statuses: {r['statuses']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--url", default=None, help="running server; default: in-process app in replay mode")
+    p.add_argument("--endpoints", nargs="+", default=list(DEFAULT_ENDPOINTS))
+    p.add_argument("--cities", nargs="+", default=None, help="default: the synthetic recorded cities")
+    p.add_argument("--synthetic", type=int, default=200, help="cities to record for the in-process run")
+    p.add_argument("--requests", type=int, default=1000, help="per endpoint")
+    p.add_argument("--concurrency", type=int, default=32)
+    p.add_argument("--batch-size", type=int, default=20, help="cities per /predict/batch call")
+    p.add_argument("--replay-latency-ms", type=float, default=0.0)
+    p.add_argument("--no-cache", action="store_true", help="disable the forecast cache (in-process only)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", default=None, help="also write the results here")
+    main(p.parse_args())
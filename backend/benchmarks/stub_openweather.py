@@ -0,0 +1,124 @@
+"""Local stand-in for the OpenWeather 5-day forecast endpoint.
+
+Serves synthetic payloads over HTTP/1.1 keep-alive with configurable latency
+and error rate, so the forecast client and the API can be load-tested without
+network access or quota.
+
+    python stub_openweather.py --port 8765 --latency-ms 50
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+
+def make_forecast(city="London", lat=51.5085, lon=-0.1257, slots=40, start=None, seed=None):
+    """Build an OpenWeather-shaped forecast payload with ``slots`` 3-hour items."""
+    rng = random.Random(seed if seed is not None else city)
+    start = int(start if start is not None else time.time()) // 10800 * 10800
+    items = []
+    for i in range(slots):
+        item = {
+            "dt": start + i * 10800,
+            "main": {
+                "temp": round(rng.uniform(2, 28), 2),
+                "humidity": rng.randint(35, 100),
+                "pressure": rng.randint(990, 1030),
+            },
+            "wind": {"speed": round(rng.uniform(0, 12), 2)},
+        }
+        if rng.random() < 0.3:
+            item["rain"] = {"3h": round(rng.uniform(0.1, 4.0), 2)}
+        items.append(item)
+    return {
+        "cod": "200",
+        "cnt": slots,
+        "list": items,
+        "city": {"name": city, "country": "GB", "coord": {"lat": lat, "lon": lon}},
+    }
+
+
+class StubServer:
+    def __init__(self, host="127.0.0.1", port=0, latency_s=0.05, error_rate=0.0):
+        self.host = host
+        self.port = port
+        self.latency_s = latency_s
+        self.error_rate = error_rate
+        self.requests = 0
+        self.connections = 0
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/data/2.5/forecast"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def start_in_thread(self):
+        """Run the server on its own event loop thread and return once it is listening."""
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run():
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        return self
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                self.requests += 1
+                target = request_line.split()[1].decode()
+                query = {k: v[0] for k, v in parse_qs(urlsplit(target).query).items()}
+                await asyncio.sleep(self.latency_s)
+                if random.random() < self.error_rate:
+                    status, body = "503 Service Unavailable", b'{"cod": "503"}'
+                else:
+                    # Like OpenWeather, answer "London,GB" with the city name alone
+                    city = query["q"].split(",")[0] if query.get("q") else f"{query.get('lat')},{query.get('lon')}"
+                    status, body = "200 OK", json.dumps(make_forecast(city)).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve(args):
+    server = await StubServer(args.host, args.port, args.latency_ms / 1000, args.error_rate).start()
+    print(f"Stub OpenWeather listening on {server.url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser()
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency-ms", type=float, default=50)
+    p.add_argument("--error-rate", type=float, default=0.0)
+    asyncio.run(_serve(p.parse_args()))
@@ -0,0 +1,164 @@
+"""Daily weather dataset stored as Parquet, partitioned by city and month.
+
+Layout (hive-style, readable by pandas/pyarrow directly):
+
+    data/daily/city=London/month=2025-09/part.parquet
+
+Writes touch only the month partitions that contain the incoming dates: each
+one is read, merged by date, sorted and atomically replaced. Readers use
+``read_daily`` (or ``pd.read_parquet`` on the root) with column selection
+and partition filters, so they never load more than they ask for.
+"""
+import os
+import urllib.parse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+STORE_DIR = os.path.join(DATA_DIR, "daily")
+DAILY_COLUMNS = ("date", "rain_mm", "temp", "humidity", "wind_speed")
+PART_FILE = "part.parquet"
+
+
+def normalize_dates(daily):
+    """Copy of ``daily`` with ``date`` as ``datetime.date`` whatever it was parsed as.
+
+    CSV round trips give strings and fresh aggregates give dates; mixing the
+    two is what let duplicate days through the old CSV dedup.
+    """
+    out = daily.copy()
+    out["date"] = pd.to_datetime(out["date"]).dt.date
+    return out
+
+
+def _city_dir(root, city):
+    # Hive partition values are URI-decoded by pyarrow, so any city name round-trips
+    return os.path.join(root, "city=" + urllib.parse.quote(city, safe=""))
+
+
+def _month_key(date):
+    return f"{date.year:04d}-{date.month:02d}"
+
+
+class DailyStore:
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+
+    def partition_path(self, city: str, month: str) -> str:
+        return os.path.join(_city_dir(self.root, city), f"month={month}", PART_FILE)
+
+    def cities(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(urllib.parse.unquote(d[len("city="):]) for d in os.listdir(self.root) if d.startswith("city="))
+
+    def months(self, city: str):
+        city_dir = _city_dir(self.root, city)
+        if not os.path.isdir(city_dir):
+            return []
+        return sorted(d[len("month="):] for d in os.listdir(city_dir)
+                      if os.path.exists(os.path.join(city_dir, d, PART_FILE)))
+
+    def _read_partition(self, path):
+        if not os.path.exists(path):
+            return None
+        return normalize_dates(pq.read_table(path).to_pandas())
+
+    def _write_partition(self, path, df):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+        tmp = path + ".tmp"
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+
+    def write(self, city: str, daily, mode: str = "upsert"):
+        """Merge ``daily`` rows into ``city``'s month partitions.
+
+        ``mode="upsert"`` replaces rows whose date already exists (newer
+        forecasts win); ``mode="append"`` only adds dates not stored yet.
+        Returns the list of months rewritten.
+        """
+        if mode not in ("upsert", "append"):
+            raise ValueError(f"unknown write mode {mode!r}")
+        new = normalize_dates(daily).drop_duplicates(subset="date", keep="last")
+        if new.empty:
+            return []
+        touched = []
+        for month, rows in new.groupby(new["date"].map(_month_key), sort=True):
+            path = self.partition_path(city, month)
+            old = self._read_partition(path)
+            if old is not None:
+                if mode == "append":
+                    rows = rows[~rows["date"].isin(set(old["date"]))]
+                    if rows.empty:
+                        continue
+                keep = "last" if mode == "upsert" else "first"
+                rows = pd.concat([old, rows], ignore_index=True).drop_duplicates(subset="date", keep=keep)
+            self._write_partition(path, rows.sort_values("date"))
+            touched.append(month)
+        return touched
+
+    def upsert(self, city: str, daily):
+        return self.write(city, daily, mode="upsert")
+
+    def append(self, city: str, daily):
+        return self.write(city, daily, mode="append")
+
+    def read(self, city=None, columns=None, start=None, end=None):
+        """Read daily rows, loading only ``columns`` and the partitions in range.
+
+        ``city`` may be a name or a list of names; the ``city`` column is
+        included only when several cities are read. Rows are sorted by
+        (city, date) with ``date`` as ``datetime64``.
+        """
+        cities = [city] if isinstance(city, str) else list(city or self.cities())
+        want = list(columns) if columns else None
+        if want is not None and "date" not in want:
+            want = ["date"] + want
+        frames = []
+        for name in cities:
+            paths = [self.partition_path(name, m) for m in self.months(name)
+                     if (start is None or m >= _month_key(pd.Timestamp(start)))
+                     and (end is None or m <= _month_key(pd.Timestamp(end)))]
+            if not paths:
+                continue
+            df = pd.concat([pq.read_table(p, columns=want).to_pandas() for p in paths], ignore_index=True)
+            if len(cities) > 1:
+                df.insert(0, "city", name)
+            frames.append(df)
+        if not frames:
+            cols = (["city"] if len(cities) > 1 else []) + (want or list(DAILY_COLUMNS))
+            return pd.DataFrame(columns=cols)
+        df = pd.concat(frames, ignore_index=True)
+        df["date"] = pd.to_datetime(df["date"])
+        if start is not None:
+            df = df[df["date"] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df["date"] <= pd.Timestamp(end)]
+        if columns and "date" not in columns:
+            df = df.drop(columns="date")
+        return df.reset_index(drop=True)
+
+
+def read_daily(city=None, columns=None, start=None, end=None, root: str = STORE_DIR):
+    return DailyStore(root).read(city, columns, start, end)
+
+
+def import_csv(path: str, city: str, root: str = STORE_DIR):
+    """Load an existing ``daily_{city}.csv`` into the store (store rows win)."""
+    return DailyStore(root).append(city, pd.read_csv(path))
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(description="Import daily_{city}.csv files into the partitioned store")
+    p.add_argument("csv", nargs="+")
+    p.add_argument("--city", default=None, help="default: taken from daily_<city>.csv")
+    p.add_argument("--root", default=STORE_DIR)
+    args = p.parse_args()
+    for path in args.csv:
+        city = args.city or os.path.splitext(os.path.basename(path))[0].removeprefix("daily_")
+        months = import_csv(path, city, args.root)
+        print(f"{city}: wrote {len(months)} month partitions under {args.root}")
@@ -1,19 +1,36 @@
 import requests
 import pandas as pd
 import datetime
+import os
+import sys
+import threading
 import time
 
-API_KEY = "YOUR_OPENWEATHER_API_KEY"
+# The raw payload archive lives with the API so both write the same format
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from app.forecast_archive import ForecastArchive
+
+API_KEY = os.environ.get("OPENWEATHER_KEY", "YOUR_OPENWEATHER_API_KEY")
 BASE = "http://api.openweathermap.org/data/2.5/forecast"
 
+_archive = None
+_archive_lock = threading.Lock()
 
-def fetch_city(city, save_csv=True, outpath="../data/forecast_{city}.csv"):
-    params = {"q": city, "appid": API_KEY, "units": "metric"}
-    r = requests.get(BASE, params=params)
-    r.raise_for_status()
-    j = r.json()
+
+def archive_payload(payload, city):
+    """Append a raw payload to the shared forecast archive (data/forecast_archive)."""
+    global _archive
+    # ingest.py archives from several threads; two archives would append to the same segment
+    with _archive_lock:
+        if _archive is None:
+            _archive = ForecastArchive()
+    return _archive.append(payload, query_key="city:" + " ".join(city.lower().split()))
+
+
+def forecast_frame(payload):
+    """One row per 3-hour slot of an OpenWeather forecast payload."""
     rows = []
-    for item in j.get("list", []):
+    for item in payload.get("list", []):
         dt = datetime.datetime.fromtimestamp(item["dt"]) 
         rows.append({
             "dt": dt,
@@ -23,7 +40,26 @@ def fetch_city(city, save_csv=True, outpath="../data/forecast_{city}.csv"):
             "pressure": item.get("main", {}).get("pressure"),
             "wind_speed": item.get("wind", {}).get("speed"),
         })
-    df = pd.DataFrame(rows)
+    return pd.DataFrame(rows, columns=["dt", "temp", "humidity", "rain_3h", "pressure", "wind_speed"])
+
+
+def resolved_name(payload, city):
+    """The city name OpenWeather resolved ``city`` to ("London" for "London,GB"); the daily store key."""
+    return (payload.get("city") or {}).get("name") or city
+
+
+def fetch_payload(city, archive=True):
+    params = {"q": city, "appid": API_KEY, "units": "metric"}
+    r = requests.get(BASE, params=params)
+    r.raise_for_status()
+    payload = r.json()
+    if archive:
+        archive_payload(payload, city)
+    return payload
+
+
+def fetch_city(city, save_csv=True, outpath="../data/forecast_{city}.csv", archive=True):
+    df = forecast_frame(fetch_payload(city, archive))
     if save_csv:
         df.to_csv(outpath.format(city=city), index=False)
     return df
@@ -0,0 +1,204 @@
+"""Fetch forecasts for a list of cities concurrently and upsert them into the daily store.
+
+One process, one pooled HTTP client: requests are spread by a rate limiter
+that never exceeds the plan's calls per minute, payloads are aggregated in
+memory with ``daily_aggregate`` and written straight to ``DailyStore``.
+Raw payloads also go to the forecast archive (unless ``--no-archive``).
+Every finished city is appended to a JSONL checkpoint, so an interrupted run
+restarts with ``--resume`` and only retries what is missing or failed.
+
+    python ingest.py cities.txt --calls-per-minute 60
+    python ingest.py cities.txt --resume
+
+``cities.txt`` holds one OpenWeather query per line ("London" or
+"London,GB"); blank lines and lines starting with ``#`` are ignored.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import httpx
+
+from dataset_store import DATA_DIR, STORE_DIR, DailyStore
+from fetch_openweather import API_KEY, BASE, archive_payload, forecast_frame, resolved_name
+from preprocess import daily_aggregate
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+CHECKPOINT_PATH = os.path.join(DATA_DIR, "ingest_checkpoint.jsonl")
+
+
+def read_city_list(path):
+    with open(path, encoding="utf-8") as f:
+        cities = [line.strip() for line in f]
+    return list(dict.fromkeys(c for c in cities if c and not c.startswith("#")))
+
+
+class RateLimiter:
+    """Hands out evenly spaced call slots, ``calls_per_minute`` at most per minute."""
+
+    def __init__(self, calls_per_minute: float):
+        self.interval = 60.0 / calls_per_minute
+        self._next = time.monotonic()
+
+    async def acquire(self):
+        now = time.monotonic()
+        slot = max(self._next, now)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class Checkpoint:
+    """Append-only JSONL log of finished cities; the last line per city wins."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        state = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash
+                    state[rec["city"]] = rec
+        return state
+
+    def record(self, rec):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec) + "\n")
+
+
+class Ingestor:
+    def __init__(self, store, api_key=API_KEY, base_url=BASE, calls_per_minute=60.0, concurrency=16,
+                 max_retries=3, timeout_s=10.0, checkpoint=None, archive=True):
+        self.store = store
+        self.api_key = api_key
+        self.base_url = base_url
+        self.limiter = RateLimiter(calls_per_minute)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = httpx.Timeout(timeout_s)
+        self.checkpoint = checkpoint
+        self.archive = archive
+        self.calls = 0
+        self._store_locks = {}
+
+    async def _fetch(self, client, city):
+        params = {"q": city, "appid": self.api_key, "units": "metric"}
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            self.calls += 1
+            try:
+                r = await client.get(self.base_url, params=params)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(random.uniform(0, 2 ** attempt))
+                continue
+            if r.status_code in RETRY_STATUS and attempt < self.max_retries:
+                retry_after = r.headers.get("Retry-After")
+                await asyncio.sleep(float(retry_after) if retry_after and retry_after.isdigit()
+                                    else random.uniform(0, 2 ** attempt))
+                continue
+            r.raise_for_status()
+            return r.json()
+
+    async def _ingest_city(self, client, city):
+        t0 = time.perf_counter()
+        try:
+            payload = await self._fetch(client, city)
+            if self.archive:
+                await asyncio.to_thread(archive_payload, payload, city)
+            daily = daily_aggregate(forecast_frame(payload))
+            # Stored under the name OpenWeather resolved ("London" for "London,GB"), which is what the
+            # readers look up; the query itself only keys the checkpoint
+            name = resolved_name(payload, city)
+            # Parquet writes block; each city owns its own partitions so they can run side by side, but two
+            # queries resolving to the same city take turns
+            async with self._store_locks.setdefault(name, asyncio.Lock()):
+                months = await asyncio.to_thread(self.store.upsert, name, daily)
+            rec = {"city": city, "name": name, "status": "ok", "days": len(daily), "months": months}
+        except httpx.HTTPStatusError as e:
+            # Not str(e): it embeds the request URL and with it the API key
+            rec = {"city": city, "status": "failed", "http_status": e.response.status_code,
+                   "error": f"HTTP {e.response.status_code} {e.response.reason_phrase}"}
+        except Exception as e:
+            rec = {"city": city, "status": "failed", "http_status": None, "error": f"{type(e).__name__}: {e}"}
+        rec["elapsed_s"] = round(time.perf_counter() - t0, 3)
+        rec["finished_at"] = time.time()
+        if self.checkpoint is not None:
+            self.checkpoint.record(rec)
+        return rec
+
+    async def run(self, cities, progress_every=100):
+        queue = asyncio.Queue()
+        for city in cities:
+            queue.put_nowait(city)
+        results = []
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits) as client:
+            async def worker():
+                while not queue.empty():
+                    rec = await self._ingest_city(client, queue.get_nowait())
+                    results.append(rec)
+                    if progress_every and len(results) % progress_every == 0:
+                        failed = sum(r["status"] != "ok" for r in results)
+                        print(f"{len(results)}/{len(cities)} cities done, {failed} failed")
+
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(cities)) or 1)))
+        return results
+
+
+def main(args):
+    cities = read_city_list(args.cities)
+    os.makedirs(os.path.dirname(os.path.abspath(args.checkpoint)), exist_ok=True)
+    checkpoint = Checkpoint(args.checkpoint)
+    if args.resume:
+        done = {c for c, rec in checkpoint.load().items() if rec["status"] == "ok"}
+        skipped = [c for c in cities if c in done]
+        cities = [c for c in cities if c not in done]
+        print(f"Resuming: {len(skipped)} cities already ingested, {len(cities)} to go")
+    elif os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    ingestor = Ingestor(DailyStore(args.store), api_key=args.api_key, base_url=args.base_url,
+                        calls_per_minute=args.calls_per_minute, concurrency=args.concurrency,
+                        max_retries=args.max_retries, checkpoint=checkpoint, archive=not args.no_archive)
+    t0 = time.perf_counter()
+    results = asyncio.run(ingestor.run(cities, args.progress_every))
+    elapsed = time.perf_counter() - t0
+
+    failed = [r for r in results if r["status"] != "ok"]
+    print(f"Ingested {len(results) - len(failed)}/{len(results)} cities in {elapsed:.1f}s "
+          f"({ingestor.calls} calls, {ingestor.calls / elapsed * 60 if elapsed else 0:.0f}/min)")
+    if failed:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(failed, f, indent=2)
+        for r in failed[:20]:
+            print(f"  FAILED {r['city']}: {r['error']}")
+        print(f"{len(failed)} failures written to {args.report}; rerun with --resume to retry them")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Ingest forecasts for many cities into the daily store")
+    p.add_argument("cities", help="text file with one city query per line")
+    p.add_argument("--calls-per-minute", type=float, default=60.0, help="API plan limit")
+    p.add_argument("--concurrency", type=int, default=16, help="max requests in flight")
+    p.add_argument("--max-retries", type=int, default=3)
+    p.add_argument("--store", default=STORE_DIR)
+    p.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    p.add_argument("--resume", action="store_true", help="skip cities the checkpoint marks as done")
+    p.add_argument("--report", default=os.path.join(DATA_DIR, "ingest_failures.json"))
+    p.add_argument("--progress-every", type=int, default=100)
+    p.add_argument("--no-archive", action="store_true", help="don't keep raw payloads in the forecast archive")
+    p.add_argument("--api-key", default=API_KEY)
+    p.add_argument("--base-url", default=BASE)
+    raise SystemExit(main(p.parse_args()))
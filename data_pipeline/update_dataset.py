@@ -1,27 +1,32 @@
 import pandas as pd
 from preprocess import daily_aggregate
-import subprocess
-import sys
+from dataset_store import DailyStore, STORE_DIR
+from fetch_openweather import fetch_payload, forecast_frame, resolved_name
+import argparse
+import os
 
-city = sys.argv[1] if len(sys.argv) > 1 else "London"
+parser = argparse.ArgumentParser()
+parser.add_argument('city', nargs='?', default="London")
+parser.add_argument('--store', default=STORE_DIR, help="root of the partitioned daily store")
+parser.add_argument('--csv', action='store_true', help="also export the full history to ../data/daily_{city}.csv")
+args = parser.parse_args()
+city = args.city
 
-# 1. Fetch the latest forecast (runs your existing script)
-subprocess.run([sys.executable, "fetch_openweather.py", "--city", city], check=True)
+# 1. Fetch the latest forecast and aggregate it in memory (many cities: see ingest.py)
+payload = fetch_payload(city)
+# Stored under the resolved name ("London" for "London,GB"), which is what the API and backtest read
+city = resolved_name(payload, city)
+daily_new = daily_aggregate(forecast_frame(payload))
 
-# 2. Read the forecast CSV just created
-forecast_path = f"../data/forecast_{city}.csv"
-df_new = pd.read_csv(forecast_path)
-daily_new = daily_aggregate(df_new)
-
-# 3. Append or create the daily file
+# 2. Upsert into the store; only the months covered by the forecast are rewritten
+store = DailyStore(args.store)
 daily_path = f"../data/daily_{city}.csv"
-try:
-    old = pd.read_csv(daily_path)
-except FileNotFoundError:
-    old = pd.DataFrame(columns=daily_new.columns)
-
-combined = pd.concat([old, daily_new], ignore_index=True)
-combined = combined.drop_duplicates(subset='date').sort_values('date')
-combined.to_csv(daily_path, index=False)
+if not store.months(city) and os.path.exists(daily_path):
+    # First run against the store: bring the existing CSV history along
+    store.append(city, pd.read_csv(daily_path))
+touched = store.upsert(city, daily_new)
+print(f"Updated {city} months {', '.join(touched) or '(none)'} in {args.store}")
 
-print(f"Updated dataset saved to {daily_path}")
+if args.csv:
+    store.read(city).to_csv(daily_path, index=False, date_format='%Y-%m-%d')
+    print(f"Exported dataset to {daily_path}")
@@ -1,6 +1,7 @@
 import axios from 'axios'
 
-const API = axios.create({ baseURL: 'http://localhost:8000/api' })
+const API_BASE = 'http://localhost:8000/api'
+const API = axios.create({ baseURL: API_BASE })
 
 export async function predictRule(city, coords){
   const r = await API.post('/predict/rule', { city, ...(coords||{}) })
@@ -18,4 +19,33 @@ export async function predictXGB(city, coords){
 export async function fetchFeatures(city, coords){
   const r = await API.post('/features', { city, ...(coords||{}) })
   return r.data
+}
+
+// POST /predict/batch as NDJSON: calls onEvent for every event as it arrives
+// ("prediction" per city and model, "result" per city, then "end")
+export async function streamBatch(body, onEvent, signal){
+  const r = await fetch(`${API_BASE}/predict/batch?stream=ndjson`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'application/x-ndjson' },
+    body: JSON.stringify(body),
+    signal,
+  })
+  if(!r.ok){
+    const detail = await r.json().catch(() => ({}))
+    throw new Error(detail.detail || `Batch request failed (${r.status})`)
+  }
+  const reader = r.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ''
+  for(;;){
+    const { done, value } = await reader.read()
+    if(done) break
+    buffered += decoder.decode(value, { stream: true })
+    const lines = buffered.split('\n')
+    buffered = lines.pop()
+    for(const line of lines){
+      if(line.trim()) onEvent(JSON.parse(line))
+    }
+  }
+  if(buffered.trim()) onEvent(JSON.parse(buffered))
 }
\ No newline at end of file
@@ -1,54 +1,80 @@
 import React, { useEffect, useState } from 'react'
-import { predictRule, predictProphet, predictXGB, fetchFeatures } from '../apiClient'
+import { streamBatch, fetchFeatures } from '../apiClient'
 import ForecastChart from './ForecastChart'
 
+// Batch model name -> key the cards and ForecastChart read
+const RESULT_KEYS = { rule: 'rule', prophet: 'prophet', xgboost: 'xgb' }
+
+function PredictionCard({ title, result }) {
+  return (
+    <div className="card">
+      <h3>{title}</h3>
+      {!result ? (
+        <p className="loading">Loading…</p>
+      ) : result.error ? (
+        <p className="error">{title} prediction not available</p>
+      ) : (
+        <p className={result.safe_to_dry_outside ? 'safe' : 'not-safe'}>
+          {result.safe_to_dry_outside
+            ? '✅ Safe to dry clothes outside tomorrow.'
+            : '⚠️ Not safe to dry clothes outside tomorrow (rain expected).'}
+        </p>
+      )}
+      {result && <pre>{JSON.stringify(result, null, 2)}</pre>}
+    </div>
+  )
+}
+
 export default function ModelCompare({ city }) {
   const [results, setResults] = useState(null)
-  const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
   const [features, setFeatures] = useState(null)
   const [coords, setCoords] = useState(null)
 
   useEffect(() => {
+    const controller = new AbortController()
     async function go() {
-      setLoading(true)
       setError(null)
-      try {
-        // try to use last computed coords from features if available
-        const coordPayload =
-          coords || (features?.lat && features?.lon ? { lat: features.lat, lon: features.lon } : null)
+      setResults({})
+      // try to use last computed coords from features if available
+      const coordPayload =
+        coords || (features?.lat && features?.lon ? { lat: features.lat, lon: features.lon } : null)
 
-        const r1 = await predictRule(city, coordPayload)
-        let r2 = { error: 'not available' }
-        let r3 = { error: 'not available' }
-        try {
-          r2 = await predictProphet(city, coordPayload)
-        } catch (e) {}
-        try {
-          r3 = await predictXGB(city, coordPayload)
-        } catch (e) {}
-        try {
-          const f = await fetchFeatures(city, coordPayload)
+      fetchFeatures(city, coordPayload)
+        .then((f) => {
           setFeatures(f)
           setCoords({ lat: f.lat, lon: f.lon })
-        } catch (e) {}
-        setResults({ rule: r1, prophet: r2, xgb: r3 })
+        })
+        .catch(() => {})
+      try {
+        // One streamed batch call; each card fills in as soon as its model has run
+        await streamBatch(
+          { locations: [{ city, ...(coordPayload || {}) }], models: Object.keys(RESULT_KEYS) },
+          (event) => {
+            if (event.event === 'prediction') {
+              const p = event.prediction
+              const result = event.model === 'rule' && !p.error ? { ...p, tomorrow_rain_mm: p.predicted_rain_mm } : p
+              setResults((r) => ({ ...r, [RESULT_KEYS[event.model]]: { city: event.city, ...result } }))
+            } else if (event.event === 'result' && event.error) {
+              setError(event.error)
+            }
+          },
+          controller.signal
+        )
       } catch (e) {
-        setError(e.message || 'Failed to load predictions')
-      } finally {
-        setLoading(false)
+        if (e.name !== 'AbortError') setError(e.message || 'Failed to load predictions')
       }
     }
     go()
+    return () => controller.abort()
   }, [city])
 
-  if (loading) return <div className="loading">Loading predictions…</div>
   if (!results) return null
 
   return (
     <div className="model-compare">
       {/* Laundry tip banner */}
-      {results?.rule && (
+      {results.rule && !results.rule.error && (
         <div className="tip-banner">
           {results.rule.safe_to_dry_outside
             ? '🌞 Good weather ahead! Safe to dry clothes outside.'
@@ -88,37 +114,9 @@ export default function ModelCompare({ city }) {
 
       {/* Prediction cards */}
       <div className="cards">
-        <div className="card">
-          <h3>Rule-based</h3>
-          <p className={results.rule.safe_to_dry_outside ? 'safe' : 'not-safe'}>
-            {results.rule.safe_to_dry_outside
-              ? '✅ Safe to dry clothes outside tomorrow.'
-              : '⚠️ Not safe to dry clothes outside tomorrow (rain expected).'}
-          </p>
-          <pre>{JSON.stringify(results.rule, null, 2)}</pre>
-        </div>
-        <div className="card">
-          <h3>Prophet</h3>
-          <p className={results.prophet.safe_to_dry_outside ? 'safe' : 'not-safe'}>
-            {results.prophet.safe_to_dry_outside
-              ? '✅ Safe to dry clothes outside tomorrow.'
-              : '⚠️ Not safe to dry clothes outside tomorrow (rain expected).'}
-          </p>
-          <pre>{JSON.stringify(results.prophet, null, 2)}</pre>
-        </div>
-        <div className="card">
-          <h3>XGBoost</h3>
-          {results.xgb.error ? (
-            <p className="error">XGBoost prediction not available</p>
-          ) : (
-            <p className={results.xgb.safe_to_dry_outside ? 'safe' : 'not-safe'}>
-              {results.xgb.safe_to_dry_outside
-                ? '✅ Safe to dry clothes outside tomorrow.'
-                : '⚠️ Not safe to dry clothes outside tomorrow (rain expected).'}
-            </p>
-          )}
-          <pre>{JSON.stringify(results.xgb, null, 2)}</pre>
-        </div>
+        <PredictionCard title="Rule-based" result={results.rule} />
+        <PredictionCard title="Prophet" result={results.prophet} />
+        <PredictionCard title="XGBoost" result={results.xgb} />
       </div>
 
       {error && <div className="error">{error}</div>}
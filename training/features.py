@@ -1,14 +1,34 @@
 import pandas as pd
-from sklearn.model_selection import train_test_split
-
-def build_features(daily_df):
-    df = daily_df.copy()
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date')
-    for l in [1]:  # only one lag because data is small
-        df[f'rain_lag_{l}'] = df['rain_mm'].shift(l)
-    df['dayofyear'] = df['date'].dt.dayofyear
-    df = df.dropna()
-    X = df[[c for c in df.columns if c not in ['date', 'rain_mm']]]
-    y = df['rain_mm']
-    return train_test_split(X, y, test_size=0.2, random_state=42)
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data_pipeline'))
+from dataset_store import DAILY_COLUMNS, DailyStore, read_daily
+
+# The builder lives with the API so serving computes features with the same code
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from app.feature_builder import (DEFAULT_LAGS, DEFAULT_WINDOWS, LEGACY_SCHEMA, build_features, make_schema,
+                                 save_schema, time_folds, time_split)
+
+
+def load_daily(data, city='London', columns=None):
+    """Read a daily CSV, or ``city`` from the partitioned store if ``data`` is its directory,
+    loading only ``columns``."""
+    if os.path.isdir(data):
+        return read_daily(city, columns, root=data)
+    return pd.read_csv(data, usecols=columns)
+
+
+def load_daily_long(data, cities=None, columns=None):
+    """Long-format frame with a ``city`` column: ``cities`` (default: all) from the store,
+    or daily CSV files (city taken from ``daily_<city>.csv``)."""
+    if os.path.isdir(data):
+        cities = cities or DailyStore(data).cities()
+        df = read_daily(cities, columns, root=data)
+        if 'city' not in df.columns:  # the store adds it only for several cities
+            df.insert(0, 'city', cities[0] if cities else '')
+        return df
+    paths = [data] if isinstance(data, str) else list(data)
+    frames = [pd.read_csv(p, usecols=columns).assign(
+        city=os.path.splitext(os.path.basename(p))[0].removeprefix('daily_')) for p in paths]
+    return pd.concat(frames, ignore_index=True)
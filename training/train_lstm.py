@@ -5,20 +5,29 @@ from tensorflow.keras.layers import LSTM, Dense
 from tensorflow.keras.callbacks import EarlyStopping
 import argparse
 import os
+import sys
+
+# Share the NumPy runtime with the API so the exported file is read by the same code
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from app.lstm_runtime import LSTMRuntime
+from features import load_daily
 
 # -----------------------------
 # Parse arguments
 # -----------------------------
 parser = argparse.ArgumentParser(description="Train an LSTM model on daily rainfall data")
-parser.add_argument('--data', required=True, help="Path to daily CSV (with columns: date,rain_mm,...)")
+parser.add_argument('--data', required=True, help="Path to daily CSV (with columns: date,rain_mm,...) or the daily store directory")
+parser.add_argument('--city', default='London', help="City to read when --data is the daily store")
 parser.add_argument('--out', default='../backend/app/models/lstm_model.h5', help="Path to save trained model")
 parser.add_argument('--window', type=int, default=14, help="Number of days in input sequence window")
+parser.add_argument('--fast-out', default=None, help="NumPy export for the API (default: --out with .npz)")
+parser.add_argument('--tolerance', type=float, default=1e-4, help="max prediction difference allowed for the export")
 args = parser.parse_args()
 
 # -----------------------------
 # Load and prepare data
 # -----------------------------
-df = pd.read_csv(args.data)
+df = load_daily(args.data, args.city, ['date', 'rain_mm'])
 
 series = df['rain_mm'].values.astype(float)
 
@@ -63,3 +72,15 @@ model.fit(Xtr, ytr, validation_data=(Xv, yv), epochs=200, batch_size=16, callbac
 os.makedirs(os.path.dirname(args.out), exist_ok=True)
 model.save(args.out)
 print(f"✅ Saved LSTM model to {args.out}")
+
+# -----------------------------
+# Export weights for the API's NumPy runtime and check parity with Keras
+# -----------------------------
+fast_out = args.fast_out or os.path.splitext(args.out)[0] + '.npz'
+runtime = LSTMRuntime.from_keras(model)
+check = X[-256:].astype('float32')
+diff = float(np.max(np.abs(runtime.predict(check) - model.predict(check, verbose=0))))
+if diff > args.tolerance:
+    raise SystemExit(f"NumPy runtime differs from Keras by {diff:.3g} (> {args.tolerance}); not exported")
+runtime.save(fast_out)
+print(f"✅ Saved NumPy LSTM export to {fast_out} (max |diff| {diff:.3g})")
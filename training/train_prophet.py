@@ -1,15 +1,26 @@
 import pandas as pd
+import numpy as np
 from prophet import Prophet
 import joblib
 import argparse
+from features import load_daily
+import os
+import sys
+
+# Share the NumPy evaluator with the API so the exported file is read by the same code
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from app.prophet_fast import ProphetEvaluator
 
 parser = argparse.ArgumentParser()
-parser.add_argument('--data', required=True)  # path to daily csv
+parser.add_argument('--data', required=True)  # path to daily csv or the daily store directory
+parser.add_argument('--city', default='London')  # city to read from the store
 parser.add_argument('--out', default='../backend/app/models/prophet_model.joblib')
+parser.add_argument('--fast-out', default=None, help="NumPy export for the API (default: --out with .npz)")
+parser.add_argument('--tolerance', type=float, default=1e-6, help="max |yhat| difference allowed for the export")
 args = parser.parse_args()
 
 # Load and format
-raw = pd.read_csv(args.data)
+raw = load_daily(args.data, args.city, ['date', 'rain_mm'])
 raw['date'] = pd.to_datetime(raw['date'])
 df = raw[['date', 'rain_mm']].rename(columns={'date': 'ds', 'rain_mm': 'y'})
 
@@ -17,3 +28,14 @@ m = Prophet()
 m.fit(df)
 joblib.dump(m, args.out)
 print('Saved Prophet model to', args.out)
+
+# Export trend + seasonality for the API's fast path and check it against Prophet's yhat
+fast_out = args.fast_out or os.path.splitext(args.out)[0] + '.npz'
+evaluator = ProphetEvaluator.from_prophet(m)
+check = m.make_future_dataframe(periods=30)
+expected = m.predict(check)['yhat'].values
+diff = float(np.max(np.abs(evaluator.predict(check['ds'].values) - expected)))
+if diff > args.tolerance:
+    raise SystemExit(f'Fast evaluator differs from Prophet yhat by {diff:.3g} (> {args.tolerance}); not exported')
+evaluator.save(fast_out)
+print(f'Saved fast Prophet evaluator to {fast_out} (max |yhat diff| {diff:.3g})')
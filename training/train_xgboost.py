@@ -1,23 +1,44 @@
 import joblib
 import xgboost as xgb
-import pandas as pd
-from features import build_features
+from features import (DAILY_COLUMNS, DEFAULT_LAGS, DEFAULT_WINDOWS, build_features, load_daily_long, make_schema,
+                      save_schema, time_split)
 import argparse
+import time
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 import numpy as np
   
 parser = argparse.ArgumentParser()
-parser.add_argument('--data', required=True)
+parser.add_argument('--data', required=True)  # daily csv or the daily store directory
+parser.add_argument('--cities', nargs='+', default=None)  # cities to read from the store (default: all)
+parser.add_argument('--lags', type=int, nargs='*', default=list(DEFAULT_LAGS))  # days of rain lags
+parser.add_argument('--windows', type=int, nargs='*', default=list(DEFAULT_WINDOWS))  # rolling windows (days)
+parser.add_argument('--no-seasonal', action='store_true')  # drop the day-of-year sin/cos encoding
+parser.add_argument('--test-size', type=float, default=0.2)  # share of the latest dates held out
 parser.add_argument('--out', default='../backend/app/models/xgb_model.joblib')
 args = parser.parse_args()
 
-daily = pd.read_csv(args.data)
-X_train, X_test, y_train, y_test = build_features(daily)
+t0 = time.perf_counter()
+daily = load_daily_long(args.data, args.cities, list(DAILY_COLUMNS))
+schema = make_schema(args.lags, args.windows, seasonal=not args.no_seasonal)
+frame = build_features(daily, schema)
+frame = frame[frame['rain_mm'].notna()]
+train, test = time_split(frame, args.test_size)
+print(f'Built {len(schema["features"])} features for {len(frame)} rows '
+      f'({frame["city"].nunique()} cities) in {time.perf_counter() - t0:.2f}s')
+
+features = schema['features']
 model = xgb.XGBRegressor(n_estimators=200, random_state=42)
-model.fit(X_train, y_train)
+model.fit(train[features], train['rain_mm'])
+
+pred = model.predict(test[features])
+mae = float(mean_absolute_error(test['rain_mm'], pred))
+rmse = float(np.sqrt(mean_squared_error(test['rain_mm'], pred)))
+print('MAE:', mae)
+print('RMSE:', rmse)
+
+# Schema first: the API reloads when the model file changes and reads both then
+schema.update(cities=sorted(frame['city'].unique().tolist()), train_end=str(train['date'].max().date()),
+              test_start=str(test['date'].min().date()), metrics={'MAE': mae, 'RMSE': rmse})
+save_schema(schema, args.out)
 joblib.dump(model, args.out)
 print('Saved XGBoost model to', args.out)
-
-pred = model.predict(X_test)
-print('MAE:', mean_absolute_error(y_test, pred))
-print('RMSE:', np.sqrt(mean_squared_error(y_test, pred)))
@@ -0,0 +1,255 @@
+"""Hyperparameter search and training of per-city and pooled XGBoost models.
+
+For every scope (one model over all cities, and/or one per city) a random
+sample of ``--trials`` parameter sets is scored with expanding-window CV over
+dates (``time_folds``); each fit uses ``tree_method="hist"`` and stops early
+on its fold. The (scope, trial, fold) fits run in a process pool, each with
+one thread. The best set is refit on all pre-holdout dates with the mean
+best iteration and scored on the held-out latest dates.
+
+Artifacts go to ``--out-dir`` with their feature schema (metrics and
+parameters included), and ``registry.json`` there lists every model and the
+best one per city (its own model or the pooled one, by holdout MAE).
+
+    python train_xgboost_search.py --data ../data/daily --scope both --trials 20 --workers 8
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features import (DAILY_COLUMNS, DEFAULT_LAGS, DEFAULT_WINDOWS, build_features, load_daily_long, make_schema,
+                      save_schema, time_folds)
+
+SEARCH_SPACE = {
+    'max_depth': [3, 4, 6, 8],
+    'learning_rate': [0.02, 0.05, 0.1, 0.2],
+    'min_child_weight': [1, 3, 10],
+    'subsample': [0.7, 0.85, 1.0],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+    'reg_lambda': [0.5, 1.0, 5.0],
+}
+POOLED = 'pooled'
+
+
+def sample_params(trials, seed):
+    rng = random.Random(seed)
+    seen, out = set(), []
+    while len(out) < trials and len(seen) < np.prod([len(v) for v in SEARCH_SPACE.values()]):
+        params = {k: rng.choice(v) for k, v in SEARCH_SPACE.items()}
+        key = tuple(params.values())
+        if key not in seen:
+            seen.add(key)
+            out.append(params)
+    return out
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    return resource.getrusage(who).ru_maxrss / 1024  # Linux reports KiB
+
+
+_frame = None
+
+
+def _init_worker(frame_path):
+    global _frame
+    _frame = pd.read_parquet(frame_path)
+
+
+@functools.lru_cache(maxsize=None)
+def _scope_rows(scope, cutoff):
+    rows = _frame if scope == POOLED else _frame[_frame['city'] == scope]
+    return rows[rows['date'] < cutoff].reset_index(drop=True)
+
+
+def _model(params, n_estimators, early_stopping_rounds=None):
+    import xgboost as xgb
+    return xgb.XGBRegressor(tree_method='hist', n_jobs=1, random_state=42, n_estimators=n_estimators,
+                            early_stopping_rounds=early_stopping_rounds, **params)
+
+
+def cv_fit(job):
+    """One (scope, trial, fold) fit with early stopping on the fold; runs in a worker."""
+    t0 = time.perf_counter()
+    train = _scope_rows(job['scope'], job['cutoff'])
+    folds = list(time_folds(train, job['n_splits'], job['gap_days']))
+    out = {k: job[k] for k in ('scope', 'trial', 'fold')}
+    if job['fold'] >= len(folds):
+        out['error'] = f'only {len(folds)} folds'
+        return out
+    tr, va = folds[job['fold']]
+    X, y = train[job['features']], train['rain_mm']
+    model = _model(job['params'], job['max_estimators'], job['early_stopping_rounds'])
+    model.fit(X.iloc[tr], y.iloc[tr], eval_set=[(X.iloc[va], y.iloc[va])], verbose=False)
+    pred = model.predict(X.iloc[va], iteration_range=(0, model.best_iteration + 1))
+    out.update(mae=float(np.abs(pred - y.iloc[va].to_numpy()).mean()), best_iteration=int(model.best_iteration),
+               elapsed_s=time.perf_counter() - t0, peak_rss_mb=peak_rss_mb())
+    return out
+
+
+def final_fit(job):
+    """Refit the winning parameters on every pre-holdout date of the scope; runs in a worker."""
+    t0 = time.perf_counter()
+    train = _scope_rows(job['scope'], job['cutoff'])
+    model = _model(job['params'], job['n_estimators'])
+    model.fit(train[job['features']], train['rain_mm'], verbose=False)
+    return {'scope': job['scope'], 'model': model, 'train_rows': len(train), 'elapsed_s': time.perf_counter() - t0,
+            'peak_rss_mb': peak_rss_mb()}
+
+
+def holdout_metrics(actual, pred, threshold):
+    err = pred - actual
+    return {'n': int(len(actual)), 'MAE': float(np.abs(err).mean()), 'RMSE': float(np.sqrt((err ** 2).mean())),
+            'accuracy': float(((actual <= threshold) == (pred <= threshold)).mean())}
+
+
+def artifact_name(scope):
+    return POOLED if scope == POOLED else 'city-' + urllib.parse.quote(scope, safe='')
+
+
+def main(args):
+    t_start = time.perf_counter()
+    daily = load_daily_long(args.data, args.cities, list(DAILY_COLUMNS))
+    schema = make_schema(args.lags, args.windows, seasonal=not args.no_seasonal)
+    frame = build_features(daily, schema)
+    frame = frame[frame['rain_mm'].notna()].reset_index(drop=True)
+    features = schema['features']
+    dates = np.sort(frame['date'].unique())
+    cutoff = pd.Timestamp(dates[int(len(dates) * (1 - args.test_size))])
+    cities = sorted(frame['city'].unique())
+    rows_per_city = frame['city'].value_counts()
+    scopes = [POOLED] if args.scope in ('pooled', 'both') else []
+    if args.scope in ('city', 'both'):
+        scopes += [c for c in cities if rows_per_city[c] >= args.min_city_rows]
+    print(f'{len(frame)} rows, {len(cities)} cities, {len(features)} features, holdout from {cutoff.date()}; '
+          f'built in {time.perf_counter() - t_start:.1f}s')
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    # Workers read the frame once each instead of receiving it with every job
+    tmp_dir = tempfile.TemporaryDirectory(prefix='xgb-search-')
+    frame_path = os.path.join(tmp_dir.name, 'frame.parquet')
+    trials = sample_params(args.trials, args.seed)
+    base = {'cutoff': cutoff, 'features': features, 'n_splits': args.folds, 'gap_days': args.gap_days,
+            'max_estimators': args.max_estimators, 'early_stopping_rounds': args.early_stopping_rounds}
+    jobs = [dict(base, scope=s, trial=t, fold=f, params=trials[t])
+            for s in scopes for t in range(len(trials)) for f in range(args.folds)]
+
+    runs = {s: {'cv': []} for s in scopes}
+    try:
+        frame.to_parquet(frame_path, index=False)
+        with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(frame_path,)) as pool:
+            for i, fut in enumerate(as_completed([pool.submit(cv_fit, j) for j in jobs]), 1):
+                res = fut.result()
+                if 'error' not in res:
+                    runs[res['scope']]['cv'].append(res)
+                if i % args.progress_every == 0 or i == len(jobs):
+                    print(f'{i}/{len(jobs)} CV fits done')
+
+            finals = []
+            for scope in scopes:
+                by_trial = {}
+                for res in runs[scope]['cv']:
+                    by_trial.setdefault(res['trial'], []).append(res)
+                scored = {t: rs for t, rs in by_trial.items() if len(rs) == args.folds}
+                if not scored:
+                    print(f'{scope}: not enough history for {args.folds} folds, skipped')
+                    continue
+                best = min(scored, key=lambda t: np.mean([r['mae'] for r in scored[t]]))
+                runs[scope].update(best_trial=best, cv_mae=float(np.mean([r['mae'] for r in scored[best]])),
+                                   n_estimators=int(np.mean([r['best_iteration'] for r in scored[best]])) + 1)
+                finals.append(pool.submit(final_fit, dict(base, scope=scope, params=trials[best],
+                                                          n_estimators=runs[scope]['n_estimators'])))
+            fitted = [f.result() for f in as_completed(finals)]
+    finally:
+        tmp_dir.cleanup()
+
+    test = frame[frame['date'] >= cutoff]
+    registry_path = os.path.join(args.out_dir, 'registry.json')
+    registry = {'models': {}, 'best_by_city': {}}
+    if os.path.exists(registry_path):
+        with open(registry_path) as f:
+            registry = json.load(f)
+    for res in sorted(fitted, key=lambda r: r['scope'] != POOLED):
+        scope, run = res['scope'], runs[res['scope']]
+        rows = test if scope == POOLED else test[test['city'] == scope]
+        pred = res['model'].predict(rows[features])
+        actual = rows['rain_mm'].to_numpy()
+        name = artifact_name(scope)
+        city_mae = {city: float(np.abs(pred[idx] - actual[idx]).mean())
+                    for city, idx in rows.groupby('city').indices.items()}
+        cv_fits = run['cv']
+        meta = {
+            'scope': scope, 'cities': cities if scope == POOLED else [scope], 'params': trials[run['best_trial']],
+            'n_estimators': run['n_estimators'], 'train_end': str((cutoff - pd.Timedelta(days=1)).date()),
+            'metrics': {'cv_mae': run['cv_mae'], **holdout_metrics(actual, pred, args.threshold)},
+            'trained_at': time.time(), 'train_rows': res['train_rows'],
+            # Search + refit time summed over workers; memory is the largest worker that ran one of its fits
+            'fit_s': round(sum(r['elapsed_s'] for r in cv_fits) + res['elapsed_s'], 2),
+            'peak_rss_mb': round(max([r['peak_rss_mb'] for r in cv_fits] + [res['peak_rss_mb']]), 1),
+        }
+        path = os.path.join(args.out_dir, name + '.joblib')
+        save_schema(dict(schema, **meta), path)  # before the model: the API reloads on the model file
+        joblib.dump(res['model'], path)
+        registry['models'][name] = {'path': os.path.basename(path), **{k: meta[k] for k in (
+            'scope', 'cities', 'params', 'n_estimators', 'metrics', 'trained_at', 'fit_s', 'peak_rss_mb')}, 'city_mae': city_mae}
+        m = meta['metrics']
+        print(f'{name:<24} cv MAE {run["cv_mae"]:.3f}  holdout MAE {m["MAE"]:.3f} RMSE {m["RMSE"]:.3f} '
+              f'acc {m["accuracy"]:.3f}  {meta["n_estimators"]} trees  {meta["fit_s"]}s fitting  '
+              f'{meta["peak_rss_mb"]} MB peak')
+
+    # Per city, this run's model with the lowest holdout MAE there. Earlier runs used other holdout windows
+    # and feature schemas, so their MAEs are not comparable; cities this run did not score keep their choice.
+    candidates = {}
+    for res in fitted:
+        for city, mae in registry['models'][artifact_name(res['scope'])]['city_mae'].items():
+            candidates.setdefault(city, {})[artifact_name(res['scope'])] = mae
+    best_by_city = {**registry.get('best_by_city', {}),
+                    **{city: min(maes, key=maes.get) for city, maes in candidates.items()}}
+    registry['best_by_city'] = dict(sorted(best_by_city.items()))
+    run = {'finished_at': time.time(), 'scopes': len(fitted), 'trials': len(trials), 'folds': args.folds,
+           'workers': args.workers or os.cpu_count(), 'wall_s': round(time.perf_counter() - t_start, 2),
+           'peak_rss_mb_driver': round(peak_rss_mb(), 1),
+           'peak_rss_mb_worker': round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1)}
+    registry['runs'] = (registry.get('runs', []) + [run])[-20:]
+    registry['updated_at'] = run['finished_at']
+    with open(registry_path + '.tmp', 'w') as f:
+        json.dump(registry, f, indent=2)
+    os.replace(registry_path + '.tmp', registry_path)
+    own = sum(1 for n in registry['best_by_city'].values() if n != POOLED)
+    print(f'{len(fitted)} models written to {args.out_dir}; {own}/{len(registry["best_by_city"])} cities '
+          f'prefer their own model')
+    print(f'Total {run["wall_s"]}s wall; peak memory {run["peak_rss_mb_driver"]:.0f} MB driver, '
+          f'{run["peak_rss_mb_worker"]:.0f} MB largest worker')
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description='Parallel hyperparameter search for per-city and pooled XGBoost models')
+    p.add_argument('--data', required=True, help='daily store directory or daily CSV')
+    p.add_argument('--cities', nargs='+', default=None, help='default: every city in the store')
+    p.add_argument('--scope', choices=('pooled', 'city', 'both'), default='both')
+    p.add_argument('--trials', type=int, default=20, help='parameter sets sampled from SEARCH_SPACE')
+    p.add_argument('--folds', type=int, default=4)
+    p.add_argument('--gap-days', type=int, default=0, help='days left out between CV train and validation')
+    p.add_argument('--test-size', type=float, default=0.2, help='share of the latest dates held out')
+    p.add_argument('--max-estimators', type=int, default=2000)
+    p.add_argument('--early-stopping-rounds', type=int, default=50)
+    p.add_argument('--min-city-rows', type=int, default=120, help='fewer rows: the city only gets the pooled model')
+    p.add_argument('--lags', type=int, nargs='*', default=list(DEFAULT_LAGS))
+    p.add_argument('--windows', type=int, nargs='*', default=list(DEFAULT_WINDOWS))
+    p.add_argument('--no-seasonal', action='store_true')
+    p.add_argument('--threshold', type=float, default=1.0, help='rain (mm) at or below which a day is safe')
+    p.add_argument('--workers', type=int, default=None, help='processes (default: CPU count)')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--progress-every', type=int, default=100)
+    p.add_argument('--out-dir', default='../backend/app/models/xgb')
+    main(p.parse_args())